@@ -102,7 +102,7 @@ def _dummy_load_admin_setting(key, default=None):
     elif key in ["Maps_api_key", "bing_maps_api_key", "osm_nominatim_email"]: return ""
     return default
 def _dummy_save_admin_setting(key, value): return False
-def _dummy_list_products(category: Optional[str] = None) -> List[Dict[str, Any]]: return []
+def _dummy_list_products(category: Optional[str] = None, include_image: bool = False) -> List[Dict[str, Any]]: return []
 def _dummy_add_product(product_data: Dict[str, Any]) -> Optional[int]: return None
 def _dummy_update_product(product_id: Union[int, float], product_data: Dict[str, Any]) -> bool: return False
 def _dummy_delete_product(product_id: Union[int, float]) -> bool: return False
@@ -144,6 +144,20 @@ _add_company_document_safe: Callable = _dummy_add_company_document
 _list_company_documents_safe: Callable = _dummy_list_company_documents
 _delete_company_document_safe: Callable = _dummy_delete_company_document
 
+def _clear_pdf_ui_template_cache() -> None:
+    # Die PDF-UI cached die Vorlagenlisten; nach Änderungen hier sofort neu laden lassen
+    try:
+        from pdf_ui import clear_pdf_template_cache
+        clear_pdf_template_cache()
+    except Exception: pass
+
+def _clear_pdf_ui_company_docs_cache() -> None:
+    # Ebenso die gecachte Dokumentenliste der PDF-Auswahl nach Upload/Löschen verwerfen
+    try:
+        from pdf_ui import clear_company_docs_cache
+        clear_company_docs_cache()
+    except Exception: pass
+
 ADMIN_TAB_KEYS_DEFINITION_GLOBAL = [
     "admin_tab_company_management_new", "admin_tab_product_management", "admin_tab_general_settings",
     "admin_tab_price_matrix", "admin_tab_tariff_management", "admin_tab_pdf_design",
@@ -372,6 +386,7 @@ def render_company_crud_tab(
                             file_bytes_doc_crud
                         )
                         if doc_id_db_crud:
+                            _clear_pdf_ui_company_docs_cache()
                             st.success(get_text_local("admin_success_doc_uploaded_param","Dokument '{doc_name}' erfolgreich hochgeladen.").format(doc_name=doc_display_name_val_crud)) # Text-Key
                             st.session_state.selected_page_key_sui = "admin" 
                             st.rerun() 
@@ -394,6 +409,7 @@ def render_company_crud_tab(
                     if cols_doc_display_crud[3].button("🗑️", key=delete_doc_btn_key_list_crud, help="Dokument löschen"):
                         if st.session_state.get(confirm_delete_doc_session_key_crud, False): 
                             if db_delete_company_document_func(doc_id_list_crud):
+                                _clear_pdf_ui_company_docs_cache()
                                 st.success(get_text_local("admin_success_doc_deleted_param","Dokument '{doc_name}' gelöscht.").format(doc_name=doc_item_crud.get('display_name'))) # Text-Key
                                 if confirm_delete_doc_session_key_crud in st.session_state:
                                     del st.session_state[confirm_delete_doc_session_key_crud]
@@ -696,7 +712,7 @@ def render_product_management(
     st.markdown("---"); st.subheader(get_text_local("admin_current_products_header_display", "Produkte in Datenbank (gefiltert)"))
     selected_category_filter_disp_list = st.selectbox(get_text_local("admin_select_category_label_display", "Angezeigte Produktkategorie"), options=[get_text_local("all_categories", "Alle")] + product_categories_manual_list, key="product_cat_select_display_list_man_v15_final_key_filter") 
     filter_cat_disp_list_val = None if selected_category_filter_disp_list == get_text_local("all_categories", "Alle") else selected_category_filter_disp_list
-    all_products_list_display_val = list_products_func(category=filter_cat_disp_list_val)
+    all_products_list_display_val = list_products_func(category=filter_cat_disp_list_val, include_image=True) # Liste zeigt Vorschaubilder
     if not all_products_list_display_val: st.info(get_text_local("product_info_no_products_for_filter","Keine Produkte zum Anzeigen gefunden für die aktuelle Filterauswahl."))
     else:
         list_cols_h = st.columns([0.4, 2, 0.8, 0.8, 1, 0.8, 0.4, 0.4]); list_headers = ["ID", "Modell", "Bild", "Datenblatt?", "Kategorie", "Preis (€)", "📝", "🗑️"]
@@ -1095,6 +1111,7 @@ def manage_templates_local(template_type_key: str, template_list_setting_key: st
                     else: temp_templates_list.append(new_template_entry)
                     if valid_to_save:
                         if _save_admin_setting_safe(template_list_setting_key, temp_templates_list):
+                            _clear_pdf_ui_template_cache()
                             st.success(get_text_local("admin_template_saved_success", "Vorlage gespeichert.")); st.session_state.selected_page_key_sui = "admin"; st.rerun()
                         else: st.error(get_text_local("admin_template_save_error", "Fehler beim Speichern der Vorlage."))
     if st.session_state[edit_mode_session_key] and st.session_state[edit_index_session_key] != -1:
@@ -1107,6 +1124,7 @@ def manage_templates_local(template_type_key: str, template_list_setting_key: st
                     try: 
                         del temp_templates_list_del[st.session_state[edit_index_session_key]]
                         if _save_admin_setting_safe(template_list_setting_key, temp_templates_list_del):
+                            _clear_pdf_ui_template_cache()
                             st.success(get_text_local("admin_template_deleted_success", "Vorlage gelöscht.")); 
                             if confirm_delete_session_key in st.session_state: del st.session_state[confirm_delete_session_key]
                             st.session_state[edit_mode_session_key] = False; st.session_state[edit_index_session_key] = -1
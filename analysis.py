@@ -963,7 +963,9 @@ def render_analysis(texts: Dict[str, str], results: Optional[Dict[str, Any]] = N
 
 
     global pv_visuals_module
-    if pv_visuals_module:
+    if pv_visuals_module and hasattr(pv_visuals_module, 'render_all_pv_visuals'):
+        pv_visuals_module.render_all_pv_visuals(results_for_display, texts) # Alle drei Diagramme, PNG-Export gesammelt/parallel
+    elif pv_visuals_module:
         if hasattr(pv_visuals_module, 'render_yearly_production_pv_data'): pv_visuals_module.render_yearly_production_pv_data(results_for_display, texts); st.markdown("---")
         if hasattr(pv_visuals_module, 'render_break_even_pv_data'): pv_visuals_module.render_break_even_pv_data(results_for_display, texts); st.markdown("---")
         if hasattr(pv_visuals_module, 'render_amortisation_pv_data'): pv_visuals_module.render_amortisation_pv_data(results_for_display, texts); st.markdown("---")
@@ -119,10 +119,28 @@ def get_pdf_template_by_name(template_type: str, name: str) -> Optional[Dict[str
         if conn: 
             conn.close()
 
+def _checkpoint_and_close_db_connections(remove_wal_files: bool = False) -> None:
+    # product_db hält WAL-Verbindungen im Pool offen: vor Kopieren/Ersetzen/Löschen der DB-Datei den Pool schließen und
+    # das WAL in die Hauptdatei zurückschreiben, sonst fehlen Commits im Backup bzw. veraltete -wal/-shm bleiben liegen
+    try:
+        from product_db import close_connection_pool
+        close_connection_pool()
+    except Exception as e: print(f"DB: Verbindungspool konnte nicht geschlossen werden: {e}")
+    if os.path.exists(DB_PATH):
+        try:
+            conn = sqlite3.connect(DB_PATH)
+            try: conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally: conn.close()
+        except sqlite3.Error as e: print(f"DB Fehler wal_checkpoint: {e}")
+    if remove_wal_files:
+        for wal_suffix in ("-wal", "-shm"):
+            if os.path.exists(DB_PATH + wal_suffix): os.remove(DB_PATH + wal_suffix)
+
 def backup_database(backup_path: str) -> bool:
     try:
         import shutil
         if os.path.exists(DB_PATH):
+            _checkpoint_and_close_db_connections()
             shutil.copy2(DB_PATH, backup_path)
             print(f"DB: Backup erfolgreich erstellt: {backup_path}")
             return True
@@ -137,6 +155,7 @@ def restore_database(backup_path: str) -> bool:
     try:
         import shutil
         if os.path.exists(backup_path):
+            _checkpoint_and_close_db_connections(remove_wal_files=True)
             shutil.copy2(backup_path, DB_PATH)
             print(f"DB: Wiederherstellung erfolgreich von: {backup_path}")
             return True
@@ -381,6 +400,7 @@ def cleanup_orphaned_files() -> Dict[str, Any]:
 def reset_database() -> bool:
     try:
         # Datenbankdatei löschen
+        _checkpoint_and_close_db_connections(remove_wal_files=True)
         if os.path.exists(DB_PATH):
             os.remove(DB_PATH)
             print(f"DB: Datenbankdatei {DB_PATH} gelöscht")
@@ -9,15 +9,25 @@ Datum: 2025-06-03
 from __future__ import annotations
 
 import base64
+import hashlib
 import io
 import math
+import re
 import traceback
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union, Callable
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union, Callable
 import os
 
 _REPORTLAB_AVAILABLE = False
 _PYPDF_AVAILABLE = False
+_PIKEPDF_AVAILABLE = False
+_FITZ_AVAILABLE = False
+_PIL_AVAILABLE = False
 
 try:
     from reportlab.lib import colors
@@ -64,12 +74,73 @@ except Exception as e_pypdf_import:
         def write(self, stream): pass
     _PYPDF_AVAILABLE = False
 
+try:
+    import pikepdf
+    _PIKEPDF_AVAILABLE = True
+except ImportError:
+    pass
+except Exception as e_pikepdf_import:
+    pass
+
+try:
+    from PIL import Image as PILImage
+    _PIL_AVAILABLE = True
+except ImportError:
+    pass
+
+try:
+    import pymupdf as fitz # PyMuPDF >= 1.24 (der Modulname 'fitz' ist dort veraltet)
+    _FITZ_AVAILABLE = True
+except ImportError:
+    try:
+        import fitz # Ältere PyMuPDF-Versionen
+        _FITZ_AVAILABLE = True
+    except ImportError:
+        pass
+except Exception as e_fitz_import:
+    pass
+
+# Bevorzugtes Backend zum Anhängen von Datenblättern/Firmendokumenten (None = kein Merge möglich)
+_PDF_MERGE_BACKEND: Optional[str] = "fitz" if _FITZ_AVAILABLE else "pikepdf" if _PIKEPDF_AVAILABLE else "pypdf" if _PYPDF_AVAILABLE else None
+
 _PDF_GENERATOR_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 _MAIN_APP_BASE_DIR = os.path.dirname(_PDF_GENERATOR_BASE_DIR)
 PRODUCT_DATASHEETS_BASE_DIR_PDF_GEN = os.path.join(_MAIN_APP_BASE_DIR, "data", "product_datasheets")
 COMPANY_DOCS_BASE_DIR_PDF_GEN = os.path.join(_MAIN_APP_BASE_DIR, "data", "company_docs")
 
 
+# ERWEITERUNG: Vollständige Liste der Diagramme für PDF-Auswahl (Abschnitt "Visualizations").
+# Diese Map sollte idealerweise mit `chart_key_to_friendly_name_map` aus `pdf_ui.py` synchronisiert werden.
+# Modulkonstante (schreibgeschützt), damit sie nicht bei jedem Angebot neu aufgebaut wird.
+CHARTS_CONFIG_FOR_PDF: Mapping[str, Mapping[str, str]] = MappingProxyType({
+    'monthly_prod_cons_chart_bytes': MappingProxyType({"title_key": "pdf_chart_title_monthly_comp_pdf", "default_title": "Monatl. Produktion/Verbrauch (2D)"}),
+    'cost_projection_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_cost_projection", "default_title": "Stromkosten-Hochrechnung (2D)"}),
+    'cumulative_cashflow_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_cum_cashflow", "default_title": "Kumulierter Cashflow (2D)"}),
+    'consumption_coverage_pie_chart_bytes': MappingProxyType({"title_key": "pdf_chart_title_consumption_coverage_pdf", "default_title": "Deckung Gesamtverbrauch (Jahr 1)"}),
+    'pv_usage_pie_chart_bytes': MappingProxyType({"title_key": "pdf_chart_title_pv_usage_pdf", "default_title": "Nutzung PV-Strom (Jahr 1)"}),
+    'daily_production_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_daily_3d", "default_title": "Tagesproduktion (3D)"}),
+    'weekly_production_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_weekly_3d", "default_title": "Wochenproduktion (3D)"}),
+    'yearly_production_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_yearly_3d_bar", "default_title": "Jahresproduktion (3D-Balken)"}),
+    'project_roi_matrix_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_roi_matrix_3d", "default_title": "Projektrendite-Matrix (3D)"}),
+    'feed_in_revenue_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_feedin_3d", "default_title": "Einspeisevergütung (3D)"}),
+    'prod_vs_cons_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_prodcons_3d", "default_title": "Verbr. vs. Prod. (3D)"}),
+    'tariff_cube_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_tariffcube_3d", "default_title": "Tarifvergleich (3D)"}),
+    'co2_savings_value_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_co2value_3d", "default_title": "CO2-Ersparnis vs. Wert (3D)"}),
+    'investment_value_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_investval_3D", "default_title": "Investitionsnutzwert (3D)"}),
+    'storage_effect_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_storageeff_3d", "default_title": "Speicherwirkung (3D)"}),
+    'selfuse_stack_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_selfusestack_3d", "default_title": "Eigenverbr. vs. Einspeis. (3D)"}),
+    'cost_growth_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_costgrowth_3d", "default_title": "Stromkostensteigerung (3D)"}),
+    'selfuse_ratio_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_selfuseratio_3d", "default_title": "Eigenverbrauchsgrad (3D)"}),
+    'roi_comparison_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_roicompare_3d", "default_title": "ROI-Vergleich (3D)"}),
+    'scenario_comparison_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_scenariocomp_3d", "default_title": "Szenarienvergleich (3D)"}),
+    'tariff_comparison_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_tariffcomp_3d", "default_title": "Vorher/Nachher Stromkosten (3D)"}),
+    'income_projection_switcher_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_incomeproj_3d", "default_title": "Einnahmenprognose (3D)"}),
+    'yearly_production_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_pvvis_yearly", "default_title": "PV Visuals: Jahresproduktion"}),
+    'break_even_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_pvvis_breakeven", "default_title": "PV Visuals: Break-Even"}),
+    'amortisation_chart_bytes': MappingProxyType({"title_key": "pdf_chart_label_pvvis_amort", "default_title": "PV Visuals: Amortisation"}),
+})
+_PDF_CHART_KEYS = frozenset(CHARTS_CONFIG_FOR_PDF)
+
 def get_text(texts_dict: Dict[str, str], key: str, fallback_text_value: Optional[str] = None) -> str:
     if not isinstance(texts_dict, dict): return fallback_text_value if fallback_text_value is not None else key
     if fallback_text_value is None: fallback_text_value = key.replace("_", " ").title() + " (PDF-Text fehlt)"
@@ -194,31 +265,96 @@ def _update_styles_with_dynamic_colors(design_settings: Dict[str, str]):
     ])
 
 
-def _get_image_flowable(image_data_input: Optional[Union[str, bytes]], desired_width: float, texts: Dict[str, str], caption_text_key: Optional[str] = None, max_height: Optional[float] = None, align: str = 'CENTER') -> List[Any]:
-    flowables: List[Any] = []
-    if not _REPORTLAB_AVAILABLE: return flowables
-    img_data_bytes: Optional[bytes] = None
-
+def _decode_image_data(image_data_input: Optional[Union[str, bytes]]) -> Optional[bytes]:
     if isinstance(image_data_input, str) and image_data_input.strip().lower() not in ["", "none", "null", "nan"]:
         try:
             if image_data_input.startswith('data:image'): image_data_input = image_data_input.split(',', 1)[1]
-            img_data_bytes = base64.b64decode(image_data_input)
-        except Exception: img_data_bytes = None 
-    elif isinstance(image_data_input, bytes): img_data_bytes = image_data_input
+            return base64.b64decode(image_data_input)
+        except Exception: return None
+    elif isinstance(image_data_input, bytes): return image_data_input
+    return None
+
+# Ein ImageReader pro eindeutigem Bildinhalt: ReportLab dekodiert die Pixeldaten (getRGBData) dann nur einmal,
+# auch wenn Logo/Diagramm mehrfach gezeichnet werden. Schwache Referenzen -> Einträge verschwinden mit dem letzten Flowable.
+_IMAGE_READER_CACHE: "weakref.WeakValueDictionary[bytes, Any]" = weakref.WeakValueDictionary()
+
+def _create_image_reader(img_data_bytes: bytes) -> Any:
+    # PNG & Co. einmalig vollständig mit Pillow dekodieren, damit später kein erneutes Entpacken nötig ist.
+    # JPEGs bleiben dateibasiert, da ReportLab sie unverändert (ohne Neukodierung) einbettet.
+    if _PIL_AVAILABLE:
+        pil_img = PILImage.open(io.BytesIO(img_data_bytes))
+        if pil_img.format != 'JPEG':
+            pil_img.load()
+            return ImageReader(pil_img)
+    return ImageReader(io.BytesIO(img_data_bytes))
+
+def _get_cached_image_reader(img_data_bytes: bytes, cache_key: Optional[bytes] = None) -> Any:
+    # cache_key: vom Aufrufer vorab berechneter Digest (z.B. SHA-256 der Titelbild-Vorlage) -> Bild wird nicht erneut gehasht
+    if cache_key is None: cache_key = hashlib.blake2b(img_data_bytes, digest_size=16).digest()
+    img_reader = _IMAGE_READER_CACHE.get(cache_key)
+    if img_reader is None:
+        img_reader = _create_image_reader(img_data_bytes)
+        _IMAGE_READER_CACHE[cache_key] = img_reader
+    return img_reader
+
+def _fit_image_size(img_reader: Any, desired_width: float, max_height: Optional[float] = None) -> Tuple[float, float]:
+    iw, ih = img_reader.getSize()
+    if iw <= 0 or ih <= 0: raise ValueError(f"Ungültige Bilddimensionen: w={iw}, h={ih}")
+    aspect = ih / float(iw)
+    img_w_final, img_h_final = desired_width, desired_width * aspect
+    if max_height and img_h_final > max_height: img_h_final = max_height; img_w_final = img_h_final / aspect
+    return img_w_final, img_h_final
+
+if _REPORTLAB_AVAILABLE:
+    class _SharedReaderImage(Image):
+        """Image-Flowable, das einen gemeinsam genutzten ImageReader (siehe _get_cached_image_reader) zeichnet, statt pro Flowable einen eigenen anzulegen."""
+        def __init__(self, img_reader: Any, width: float, height: float, hAlign: str = 'CENTER'):
+            Flowable.__init__(self)
+            self.img_reader = img_reader
+            self.filename = repr(img_reader); self._drawing = None; self._mask = 'auto'
+            self.imageWidth, self.imageHeight = img_reader.getSize()
+            self.drawWidth, self.drawHeight = width, height
+            self.hAlign = hAlign
+
+        def draw(self):
+            self.canv.drawImage(self.img_reader, getattr(self, '_offs_x', 0), getattr(self, '_offs_y', 0), self.drawWidth, self.drawHeight, mask=self._mask)
+
+# Diagramme kommen meist deutlich größer als ihre Darstellungsbreite (Plotly/Kaleido-Export) und als PNG.
+# Einmal pro Inhalt und Zielbreite auf ~150 dpi verkleinern und als JPEG (q=85) kodieren: ReportLab bettet JPEGs
+# unverändert ein, das spart Speicher während doc.build() und Größe des fertigen PDFs.
+_CHART_TARGET_DPI = 150
+
+@lru_cache(maxsize=32)
+def _downscaled_chart_bytes(img_data_bytes: bytes, target_px: int) -> bytes:
+    pil_img = PILImage.open(io.BytesIO(img_data_bytes))
+    pil_img.thumbnail((target_px, target_px), PILImage.LANCZOS)
+    if pil_img.mode in ('RGBA', 'LA', 'P'): # Transparenz auf weißen Hintergrund legen statt schwarz werden zu lassen
+        rgba_img = pil_img.convert('RGBA')
+        rgb_img = PILImage.new('RGB', rgba_img.size, (255, 255, 255)); rgb_img.paste(rgba_img, mask=rgba_img.getchannel('A'))
+    else: rgb_img = pil_img.convert('RGB')
+    out_buffer = io.BytesIO()
+    rgb_img.save(out_buffer, 'JPEG', quality=85, optimize=True)
+    jpeg_bytes = out_buffer.getvalue()
+    return jpeg_bytes if len(jpeg_bytes) < len(img_data_bytes) else img_data_bytes
+
+def _downscale_chart_image(img_data_bytes: bytes, display_width: float) -> bytes:
+    if not _PIL_AVAILABLE: return img_data_bytes
+    try:
+        return _downscaled_chart_bytes(img_data_bytes, int(display_width * _CHART_TARGET_DPI / 72))
+    except Exception as e_downscale:
+        return img_data_bytes
+
+def _get_image_flowable(image_data_input: Optional[Union[str, bytes]], desired_width: float, texts: Dict[str, str], caption_text_key: Optional[str] = None, max_height: Optional[float] = None, align: str = 'CENTER', cache_key: Optional[bytes] = None) -> List[Any]:
+    flowables: List[Any] = []
+    if not _REPORTLAB_AVAILABLE: return flowables
+    img_data_bytes = _decode_image_data(image_data_input)
     
     if img_data_bytes:
         try:
             if not img_data_bytes: raise ValueError("Bilddaten sind leer nach Verarbeitung.")
-            img_file_like = io.BytesIO(img_data_bytes)
-            img_reader = ImageReader(img_file_like)
-            iw, ih = img_reader.getSize()
-            if iw <= 0 or ih <= 0: raise ValueError(f"Ungültige Bilddimensionen: w={iw}, h={ih}")
-            aspect = ih / float(iw) if iw > 0 else 1.0
-            img_h_calc = desired_width * aspect; img_w_final, img_h_final = desired_width, img_h_calc
-            if max_height and img_h_calc > max_height: img_h_final = max_height; img_w_final = img_h_final / aspect if aspect > 0 else desired_width
-            
-            img = Image(io.BytesIO(img_data_bytes), width=img_w_final, height=img_h_final)
-            img.hAlign = align.upper(); flowables.append(img)
+            img_reader = _get_cached_image_reader(img_data_bytes, cache_key)
+            img_w_final, img_h_final = _fit_image_size(img_reader, desired_width, max_height)
+            flowables.append(_SharedReaderImage(img_reader, img_w_final, img_h_final, hAlign=align.upper()))
             if caption_text_key:
                 caption_text = get_text(texts, caption_text_key, "")
                 if caption_text and not caption_text.startswith(caption_text_key) and not caption_text.endswith("(PDF-Text fehlt)"):
@@ -234,18 +370,20 @@ def _get_image_flowable(image_data_input: Optional[Union[str, bytes]], desired_w
             flowables.append(Paragraph(f"<i>({caption_text_fb}: {get_text(texts, 'image_not_available_pdf', 'Bild nicht verfügbar')})</i>", STYLES['ImageCaption']))
     return flowables
 
-def page_layout_handler(canvas_obj: canvas.Canvas, doc_template: SimpleDocTemplate, texts_ref: Dict[str, str], company_info_ref: Dict, company_logo_base64_ref: Optional[str], offer_number_ref: str, page_width_ref: float, page_height_ref: float, margin_left_ref: float, margin_right_ref: float, margin_top_ref: float, margin_bottom_ref: float, doc_width_ref: float, doc_height_ref: float):
+def page_layout_handler(canvas_obj: canvas.Canvas, doc_template: SimpleDocTemplate, texts_ref: Dict[str, str], company_info_ref: Dict, company_logo_base64_ref: Optional[Union[str, bytes]], offer_number_ref: str, page_width_ref: float, page_height_ref: float, margin_left_ref: float, margin_right_ref: float, margin_top_ref: float, margin_bottom_ref: float, doc_width_ref: float, doc_height_ref: float, company_logo_reader_ref: Optional[Any] = None):
     canvas_obj.saveState()
     current_chapter_title = getattr(canvas_obj, 'current_chapter_title_for_header', '')
     page_num = canvas_obj.getPageNumber()
 
     if company_logo_base64_ref and page_num > 1:
         try:
-            logo_flowables_footer = _get_image_flowable(company_logo_base64_ref, 1.8*cm, texts_ref, max_height=1.0*cm, align='LEFT')
-            if logo_flowables_footer and isinstance(logo_flowables_footer[0], Image):
-                logo_img_footer: Image = logo_flowables_footer[0]
-                logo_bytes_for_draw = base64.b64decode(company_logo_base64_ref.split(',',1)[1]) if ',' in company_logo_base64_ref and len(company_logo_base64_ref.split(',',1)) > 1 else base64.b64decode(company_logo_base64_ref)
-                canvas_obj.drawImage(ImageReader(io.BytesIO(logo_bytes_for_draw)), margin_left_ref, margin_bottom_ref * 0.35, width=logo_img_footer.drawWidth, height=logo_img_footer.drawHeight, mask='auto', preserveAspectRatio=True)
+            logo_reader_footer = company_logo_reader_ref
+            if logo_reader_footer is None:
+                logo_bytes_footer = _decode_image_data(company_logo_base64_ref)
+                logo_reader_footer = _get_cached_image_reader(logo_bytes_footer) if logo_bytes_footer else None
+            if logo_reader_footer is not None:
+                logo_w_footer, logo_h_footer = _fit_image_size(logo_reader_footer, 1.8*cm, 1.0*cm)
+                canvas_obj.drawImage(logo_reader_footer, margin_left_ref, margin_bottom_ref * 0.35, width=logo_w_footer, height=logo_h_footer, mask='auto', preserveAspectRatio=True)
         except Exception: 
             pass
     
@@ -296,9 +434,18 @@ def _generate_complete_salutation_line(customer_data: Dict, texts: Dict[str, str
         return get_text(texts, 'salutation_generic_fallback', 'Sehr geehrte Damen und Herren,')
 
 
+# Alle bekannten Platzhalter in einem vorkompilierten Muster: ein Durchlauf über den Text statt eines replace() pro Platzhalter
+_PLACEHOLDER_KEYS = (
+    "[VollständigeAnrede]", "[Ihr Name/Firmenname]", "[Angebotsnummer]", "[Datum]", "[KundenNachname]", "[KundenVorname]",
+    "[KundenAnredeFormell]", "[KundenTitel]", "[KundenStrasseNr]", "[KundenPLZOrt]", "[KundenFirmenname]",
+    "[AnlagenleistungkWp]", "[GesamtinvestitionBrutto]", "[FinanziellerVorteilJahr1]",
+)
+_PLACEHOLDER_RE = re.compile("|".join(map(re.escape, _PLACEHOLDER_KEYS)))
+
 def _replace_placeholders(text_template: str, customer_data: Dict, company_info: Dict, offer_number: str, texts_dict: Dict[str, str], analysis_results_for_placeholder: Optional[Dict[str, Any]] = None) -> str:
     if text_template is None: text_template = ""
     processed_text = str(text_template)
+    if '[' not in processed_text: return processed_text
     now_date_str = datetime.now().strftime('%d.%m.%Y')
     complete_salutation_line = _generate_complete_salutation_line(customer_data, texts_dict)
 
@@ -325,9 +472,8 @@ def _replace_placeholders(text_template: str, customer_data: Dict, company_info:
         annual_benefit_yr1_val = analysis_results_for_placeholder.get('annual_financial_benefit_year1')
         ersatz_dict["[FinanziellerVorteilJahr1]"] = format_kpi_value(annual_benefit_yr1_val, "€", texts_dict=texts_dict, na_text_key="value_not_calculated_short") if annual_benefit_yr1_val is not None else get_text(texts_dict, "value_not_calculated_short", "k.B.")
 
-    for placeholder, value_repl in ersatz_dict.items():
-        processed_text = processed_text.replace(placeholder, str(value_repl))
-    return processed_text
+    # Platzhalter ohne Wert (z.B. Kennzahlen ohne Analyseergebnisse) bleiben unverändert stehen
+    return _PLACEHOLDER_RE.sub(lambda m: str(ersatz_dict.get(m.group(), m.group())), processed_text)
 
 def _get_next_offer_number(texts: Dict[str,str], load_admin_setting_func: Callable, save_admin_setting_func: Callable) -> str:
     try:
@@ -412,6 +558,10 @@ def _prepare_simulation_table_for_pdf(analysis_results: Dict[str, Any], texts: D
         sim_data_for_pdf_final.append(ellipsis_row_pdf)
     return sim_data_for_pdf_final
 
+def _paragraph_rows(pairs: List[Any], style_a: Any, style_b: Any) -> List[List[Any]]:
+    """Baut zweispaltige Tabellenzeilen (Label/Wert) aus bereits formatierten String-Paaren."""
+    return [[Paragraph(a, style_a), Paragraph(b, style_b)] for a, b in pairs]
+
 def _create_product_table_with_image(details_data_prod: List[List[Any]], product_image_flowables_prod: List[Any], available_width: float) -> List[Any]:
     if not _REPORTLAB_AVAILABLE: return []
     story_elements: List[Any] = []
@@ -451,7 +601,7 @@ def _add_product_details_to_story(
         return
 
     story.append(Paragraph(component_name_text, STYLES.get('ComponentTitle')))
-    details_data_prod: List[List[Any]] = [] 
+    detail_pairs_prod: List[Tuple[str, str]] = []
 
     default_fields_prod = [
         ('brand', 'product_brand'), ('model_name', 'product_model'),
@@ -497,7 +647,8 @@ def _add_product_details_to_story(
             elif key_prod == 'weight_kg': unit_prod, prec_prod = "kg", 1
             
             value_str_prod = format_kpi_value(value_prod, unit=unit_prod, precision=prec_prod, texts_dict=texts, na_text_key="value_not_available_short_pdf")
-            details_data_prod.append([Paragraph(str(label_prod), STYLES.get('TableLabel')), Paragraph(str(value_str_prod), STYLES.get('TableText'))])
+            detail_pairs_prod.append((str(label_prod), str(value_str_prod)))
+    details_data_prod = _paragraph_rows(detail_pairs_prod, STYLES.get('TableLabel'), STYLES.get('TableText'))
 
     product_image_flowables_prod: List[Any] = []
     if include_product_images:
@@ -515,12 +666,171 @@ def _add_product_details_to_story(
     story.append(Spacer(1, 0.5*cm))
 
 
+# --- Dynamische Sektionen: eine Funktion pro Sektion ---
+# section_ctx enthält die von allen Sektionen gemeinsam genutzten Angebotsdaten (siehe generate_offer_pdf),
+# unter 'styles' auch die einmal pro Angebot gebundenen Paragraph-Styles.
+def _emit_project_overview(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    pv_details_pdf = section_ctx['pv_details']; current_analysis_results_pdf = section_ctx['analysis_results']; available_width_content = section_ctx['available_width']
+    styles = section_ctx['styles']; S_SST, S_TL, S_TT = styles['SubSectionTitle'], styles['TableLabel'], styles['TableText']
+    if pv_details_pdf.get('visualize_roof_in_pdf_satellite', False) and pv_details_pdf.get('satellite_image_base64_data'):
+        story.append(Paragraph(get_text(texts,"satellite_image_header_pdf","Satellitenansicht Objekt"), S_SST))
+        sat_img_flowables = _get_image_flowable(pv_details_pdf['satellite_image_base64_data'], available_width_content * 0.8, texts, caption_text_key="satellite_image_caption_pdf", max_height=10*cm)
+        if sat_img_flowables: story.extend(sat_img_flowables); story.append(Spacer(1, 0.5*cm))
+
+    overview_data_content_pdf = [
+        [get_text(texts,"anlage_size_label_pdf", "Anlagengröße"),format_kpi_value(current_analysis_results_pdf.get('anlage_kwp'),"kWp",texts_dict=texts, na_text_key="value_not_available_short_pdf")],
+        [get_text(texts,"module_quantity_label_pdf","Anzahl Module"),str(pv_details_pdf.get('module_quantity', get_text(texts, "value_not_available_short_pdf")))],
+        [get_text(texts,"annual_pv_production_kwh_pdf", "Jährliche PV-Produktion (ca.)"),format_kpi_value(current_analysis_results_pdf.get('annual_pv_production_kwh'),"kWh",precision=0,texts_dict=texts, na_text_key="value_not_available_short_pdf")],
+        [get_text(texts,"self_supply_rate_percent_pdf", "Autarkiegrad (ca.)"),format_kpi_value(current_analysis_results_pdf.get('self_supply_rate_percent'),"%",precision=1,texts_dict=texts, na_text_key="value_not_available_short_pdf")],
+    ]
+    if pv_details_pdf.get('include_storage'):
+         overview_data_content_pdf.extend([[get_text(texts,"selected_storage_capacity_label_pdf", "Speicherkapazität"),format_kpi_value(pv_details_pdf.get('selected_storage_storage_power_kw'),"kWh",texts_dict=texts, na_text_key="value_not_available_short_pdf")]])
+    if overview_data_content_pdf:
+        # Alle Einträge sind bereits Strings (get_text/format_kpi_value/str), daher kein str() pro Zelle
+        overview_table_data_styled_content_pdf = _paragraph_rows(overview_data_content_pdf, S_TL, S_TT)
+        overview_table_content_pdf = Table(overview_table_data_styled_content_pdf,colWidths=[available_width_content*0.5,available_width_content*0.5])
+        overview_table_content_pdf.setStyle(TABLE_STYLE_DEFAULT); story.append(overview_table_content_pdf)
+
+def _emit_technical_components(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    pv_details_pdf = section_ctx['pv_details']; available_width_content = section_ctx['available_width']; get_product_by_id_func = section_ctx['get_product_by_id_func']; include_product_images_opt = section_ctx['include_product_images']; include_optional_component_details_opt = section_ctx['include_optional_component_details']
+    styles = section_ctx['styles']; S_NL, S_SST = styles['NormalLeft'], styles['SubSectionTitle']
+    story.append(Paragraph(get_text(texts, "pdf_components_intro", "Nachfolgend die Details zu den Kernkomponenten Ihrer Anlage:"), S_NL))
+    story.append(Spacer(1, 0.3*cm))
+
+    main_components = [
+        (pv_details_pdf.get("selected_module_id"), get_text(texts, "pdf_component_module_title", "PV-Module")),
+        (pv_details_pdf.get("selected_inverter_id"), get_text(texts, "pdf_component_inverter_title", "Wechselrichter")),
+    ]
+    if pv_details_pdf.get("include_storage"):
+        main_components.append((pv_details_pdf.get("selected_storage_id"), get_text(texts, "pdf_component_storage_title", "Batteriespeicher")))
+
+    for comp_id, comp_title in main_components:
+        if comp_id: _add_product_details_to_story(story, comp_id, comp_title, texts, available_width_content, get_product_by_id_func, include_product_images_opt)
+
+    # ERWEITERUNG: Optionale Komponenten / Zubehör
+    if pv_details_pdf.get('include_additional_components', False) and include_optional_component_details_opt:
+        story.append(Paragraph(get_text(texts, "pdf_additional_components_header_pdf", "Optionale Komponenten"), S_SST))
+        optional_comps_map = {
+            'selected_wallbox_id': get_text(texts, "pdf_component_wallbox_title", "Wallbox"),
+            'selected_ems_id': get_text(texts, "pdf_component_ems_title", "Energiemanagementsystem"),
+            'selected_optimizer_id': get_text(texts, "pdf_component_optimizer_title", "Leistungsoptimierer"),
+            'selected_carport_id': get_text(texts, "pdf_component_carport_title", "Solarcarport"),
+            'selected_notstrom_id': get_text(texts, "pdf_component_emergency_power_title", "Notstromversorgung"),
+            'selected_tierabwehr_id': get_text(texts, "pdf_component_animal_defense_title", "Tierabwehrschutz")
+        }
+        any_optional_component_rendered = False
+        for key, title in optional_comps_map.items():
+            opt_comp_id = pv_details_pdf.get(key)
+            if opt_comp_id: 
+                _add_product_details_to_story(story, opt_comp_id, title, texts, available_width_content, get_product_by_id_func, include_product_images_opt)
+                any_optional_component_rendered = True
+        if not any_optional_component_rendered:
+            story.append(Paragraph(get_text(texts, "pdf_no_optional_components_selected_for_details", "Keine optionalen Komponenten für Detailanzeige ausgewählt."), S_NL))
+
+def _emit_cost_details(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    current_analysis_results_pdf = section_ctx['analysis_results']; available_width_content = section_ctx['available_width']; styles = section_ctx['styles']
+    cost_table_data_final_pdf = _prepare_cost_table_for_pdf(current_analysis_results_pdf, texts)
+    if cost_table_data_final_pdf:
+        cost_table_obj_final_pdf = Table(cost_table_data_final_pdf, colWidths=[available_width_content*0.6, available_width_content*0.4])
+        cost_table_obj_final_pdf.setStyle(TABLE_STYLE_DEFAULT); story.append(cost_table_obj_final_pdf)
+        if current_analysis_results_pdf.get('base_matrix_price_netto', 0.0) == 0 and current_analysis_results_pdf.get('cost_storage_aufpreis_product_db_netto', 0.0) > 0: story.append(Spacer(1,0.2*cm)); story.append(Paragraph(get_text(texts, "analysis_storage_cost_note_single_price_pdf", "<i>Hinweis: Speicherkosten als Einzelposten, da kein Matrix-Pauschalpreis.</i>"), styles['TableTextSmall']))
+        elif current_analysis_results_pdf.get('base_matrix_price_netto', 0.0) > 0 and current_analysis_results_pdf.get('cost_storage_aufpreis_product_db_netto', 0.0) > 0 : story.append(Spacer(1,0.2*cm)); story.append(Paragraph(get_text(texts, "analysis_storage_cost_note_matrix_pdf", "<i>Hinweis: Speicherkosten als Aufpreis, da Matrixpreis 'Ohne Speicher' verwendet wurde.</i>"), styles['TableTextSmall']))
+
+def _emit_economics(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    current_analysis_results_pdf = section_ctx['analysis_results']; available_width_content = section_ctx['available_width']
+    styles = section_ctx['styles']; S_TL = styles['TableLabel']
+    eco_kpi_data_for_pdf_table = [
+        [get_text(texts, "total_investment_brutto_pdf", "Gesamtinvestition (Brutto)"), format_kpi_value(current_analysis_results_pdf.get('total_investment_brutto'), "€", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
+        [get_text(texts, "annual_financial_benefit_pdf", "Finanzieller Vorteil (Jahr 1, ca.)"), format_kpi_value(current_analysis_results_pdf.get('annual_financial_benefit_year1'), "€", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
+        [get_text(texts, "amortization_time_years_pdf", "Amortisationszeit (ca.)"), format_kpi_value(current_analysis_results_pdf.get('amortization_time_years'), "Jahre", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
+        [get_text(texts, "simple_roi_percent_label_pdf", "Einfache Rendite (Jahr 1, ca.)"), format_kpi_value(current_analysis_results_pdf.get('simple_roi_percent'), "%", precision=1, texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
+        [get_text(texts, "lcoe_euro_per_kwh_label_pdf", "Stromgestehungskosten (LCOE, ca.)"), format_kpi_value(current_analysis_results_pdf.get('lcoe_euro_per_kwh'), "€/kWh", precision=3, texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
+        [get_text(texts, "npv_over_years_pdf", "Kapitalwert über Laufzeit (NPV, ca.)"), format_kpi_value(current_analysis_results_pdf.get('npv_value'), "€", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
+        [get_text(texts, "irr_percent_pdf", "Interner Zinsfuß (IRR, ca.)"), format_kpi_value(current_analysis_results_pdf.get('irr_percent'), "%", precision=1, texts_dict=texts, na_text_key="value_not_calculated_short_pdf")]
+    ]
+    if eco_kpi_data_for_pdf_table:
+        eco_kpi_table_styled_content = _paragraph_rows(eco_kpi_data_for_pdf_table, S_TL, styles['TableNumber'])
+        eco_table_object = Table(eco_kpi_table_styled_content, colWidths=[available_width_content*0.6, available_width_content*0.4])
+        eco_table_object.setStyle(TABLE_STYLE_DEFAULT); story.append(eco_table_object)
+
+def _emit_simulation_details(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    current_analysis_results_pdf = section_ctx['analysis_results']
+    styles = section_ctx['styles']; S_NL = styles['NormalLeft']
+    sim_table_data_content_pdf = _prepare_simulation_table_for_pdf(current_analysis_results_pdf, texts, num_years_to_show=10)
+    if len(sim_table_data_content_pdf) > 1:
+        sim_table_obj_final_pdf = Table(sim_table_data_content_pdf, colWidths=None)
+        sim_table_obj_final_pdf.setStyle(DATA_TABLE_STYLE); story.append(sim_table_obj_final_pdf)
+    else: story.append(Paragraph(get_text(texts, "pdf_simulation_data_not_available", "Simulationsdetails nicht ausreichend für Tabellendarstellung."), S_NL))
+
+def _emit_co2_savings(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    current_analysis_results_pdf = section_ctx['analysis_results']
+    styles = section_ctx['styles']; S_NL = styles['NormalLeft']
+    co2_savings_val = current_analysis_results_pdf.get('annual_co2_savings_kg', 0.0)
+    co2_text = get_text(texts, "pdf_annual_co2_savings_param_pdf", "Durch Ihre neue Photovoltaikanlage vermeiden Sie jährlich ca. <b>{co2_savings_kg_formatted} kg CO₂</b>. Dies entspricht der Bindungskapazität von etwa <b>{trees_equiv:.0f} Bäumen</b> oder der Vermeidung von ca. <b>{car_km_equiv:.0f} Autokilometern</b>.").format(
+        co2_savings_kg_formatted=format_kpi_value(co2_savings_val, "", precision=0, texts_dict=texts),
+        trees_equiv=current_analysis_results_pdf.get('co2_equivalent_trees_per_year', 0.0),
+        car_km_equiv=current_analysis_results_pdf.get('co2_equivalent_car_km_per_year', 0.0)
+    )
+    story.append(Paragraph(co2_text, S_NL))
+
+def _emit_visualizations(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    current_analysis_results_pdf = section_ctx['analysis_results']; available_width_content = section_ctx['available_width']; inclusion_options = section_ctx['inclusion_options']
+    styles = section_ctx['styles']; S_NL, S_CL = styles['NormalLeft'], styles['NormalCenter']
+    story.append(Paragraph(get_text(texts, "pdf_visualizations_intro", "Die folgenden Diagramme visualisieren die Ergebnisse Ihrer Photovoltaikanlage und deren Wirtschaftlichkeit:"), S_NL))
+    story.append(Spacer(1, 0.3 * cm))
+
+    charts_added_count = 0
+    selected_charts_for_pdf_opt = inclusion_options.get("selected_charts_for_pdf") or []
+    # Ohne Diagramm-Bytes in den Analyseergebnissen wird die Diagramm-Schleife komplett übersprungen
+    present_chart_keys_pdf = _PDF_CHART_KEYS.intersection(current_analysis_results_pdf)
+
+    if present_chart_keys_pdf:
+        # Nur die (meist wenigen) ausgewählten Diagramme durchlaufen, in der Reihenfolge der Nutzerauswahl
+        selected_present_chart_keys = [k for k in dict.fromkeys(selected_charts_for_pdf_opt) if k in present_chart_keys_pdf]
+        for chart_key in selected_present_chart_keys:
+            config = CHARTS_CONFIG_FOR_PDF[chart_key]
+            chart_image_bytes = current_analysis_results_pdf.get(chart_key)
+            if chart_image_bytes and isinstance(chart_image_bytes, bytes):
+                chart_display_title = get_text(texts, config["title_key"], config["default_title"])
+                story.append(Paragraph(chart_display_title, styles['ChartTitle']))
+                chart_image_bytes = _downscale_chart_image(chart_image_bytes, available_width_content * 0.9)
+                img_flowables_chart = _get_image_flowable(chart_image_bytes, available_width_content * 0.9, texts, max_height=12*cm, align='CENTER')
+                if img_flowables_chart: story.extend(img_flowables_chart); story.append(Spacer(1, 0.7*cm)); charts_added_count += 1
+                else: story.append(Paragraph(get_text(texts, "pdf_chart_load_error_placeholder_param", f"(Fehler beim Laden: {chart_display_title})"), S_CL)); story.append(Spacer(1, 0.5*cm))
+    if charts_added_count == 0 and selected_charts_for_pdf_opt : # Wenn Charts ausgewählt wurden, aber keine gerendert werden konnten
+         story.append(Paragraph(get_text(texts, "pdf_selected_charts_not_renderable", "Ausgewählte Diagramme konnten nicht geladen/angezeigt werden."), S_CL))
+    elif not selected_charts_for_pdf_opt : # Wenn gar keine Charts ausgewählt wurden
+         story.append(Paragraph(get_text(texts, "pdf_no_charts_selected_for_section", "Keine Diagramme für diese Sektion ausgewählt."), S_CL))
+
+def _emit_future_aspects(story: List[Any], texts: Dict[str, str], section_ctx: Dict[str, Any]) -> None:
+    pv_details_pdf = section_ctx['pv_details']; current_analysis_results_pdf = section_ctx['analysis_results']
+    styles = section_ctx['styles']; S_NL = styles['NormalLeft']
+    future_aspects_text = ""
+    if pv_details_pdf.get('future_ev'):
+        future_aspects_text += get_text(texts, "pdf_future_ev_text_param", "<b>E-Mobilität:</b> Die Anlage ist auf eine zukünftige Erweiterung um ein Elektrofahrzeug vorbereitet. Der prognostizierte PV-Anteil an der Fahrzeugladung beträgt ca. {eauto_pv_coverage_kwh:.0f} kWh/Jahr.").format(eauto_pv_coverage_kwh=current_analysis_results_pdf.get('eauto_ladung_durch_pv_kwh',0.0)) + "<br/>"
+    if pv_details_pdf.get('future_hp'):
+        future_aspects_text += get_text(texts, "pdf_future_hp_text_param", "<b>Wärmepumpe:</b> Die Anlage kann zur Unterstützung einer zukünftigen Wärmepumpe beitragen. Der geschätzte PV-Deckungsgrad für die Wärmepumpe liegt bei ca. {hp_pv_coverage_pct:.0f}%. ").format(hp_pv_coverage_pct=current_analysis_results_pdf.get('pv_deckungsgrad_wp_pct',0.0)) + "<br/>"
+    if not future_aspects_text: future_aspects_text = get_text(texts, "pdf_no_future_aspects_selected", "Keine spezifischen Zukunftsaspekte für dieses Angebot ausgewählt.")
+    story.append(Paragraph(future_aspects_text, S_NL))
+
+_SECTION_EMITTERS: Mapping[str, Callable[[List[Any], Dict[str, str], Dict[str, Any]], None]] = MappingProxyType({
+    "ProjectOverview": _emit_project_overview,
+    "TechnicalComponents": _emit_technical_components,
+    "CostDetails": _emit_cost_details,
+    "Economics": _emit_economics,
+    "SimulationDetails": _emit_simulation_details,
+    "CO2Savings": _emit_co2_savings,
+    "Visualizations": _emit_visualizations,
+    "FutureAspects": _emit_future_aspects,
+})
+
+
 def generate_offer_pdf(
     project_data: Dict[str, Any],
     analysis_results: Optional[Dict[str, Any]],
     company_info: Dict[str, Any],
     company_logo_base64: Optional[str],
-    selected_title_image_b64: Optional[str],
+    selected_title_image_b64: Optional[Union[str, bytes]], # Base64-String oder bereits dekodierte Bilddaten
     selected_offer_title_text: str,
     selected_cover_letter_text: str,
     sections_to_include: Optional[List[str]],
@@ -531,7 +841,8 @@ def generate_offer_pdf(
     get_product_by_id_func: Callable, 
     db_list_company_documents_func: Callable[[int, Optional[str]], List[Dict[str, Any]]],
     active_company_id: Optional[int],
-    texts: Dict[str, str]
+    texts: Dict[str, str],
+    selected_title_image_digest: Optional[bytes] = None
 ) -> Optional[bytes]:
 
     if not _REPORTLAB_AVAILABLE:
@@ -543,6 +854,17 @@ def generate_offer_pdf(
     if isinstance(design_settings, dict):
         _update_styles_with_dynamic_colors(design_settings)
 
+    # Häufig genutzte Styles einmalig binden (die Farb-Aktualisierung oben ändert die Objekte in-place); die Sektionen lesen sie aus section_ctx['styles']
+    bound_styles = {n: STYLES.get(n) for n in ('NormalLeft', 'NormalRight', 'NormalCenter', 'SectionTitle', 'SubSectionTitle', 'TableLabel', 'TableText', 'TableTextSmall', 'TableNumber', 'ChartTitle')}
+    S_NL, S_NR, S_ST = bound_styles['NormalLeft'], bound_styles['NormalRight'], bound_styles['SectionTitle']
+
+    # Logo nur einmal dekodieren; Deckblatt und Fußzeile jeder Seite teilen sich denselben ImageReader.
+    # Der Reader wird der Fußzeile über layout_callback_kwargs_build übergeben; damit bleibt auch der
+    # (schwach referenzierte) Cache-Eintrag für den gesamten Build am Leben.
+    company_logo_bytes = _decode_image_data(company_logo_base64)
+    try: company_logo_reader = _get_cached_image_reader(company_logo_bytes) if company_logo_bytes else None
+    except Exception: company_logo_reader = None
+
     main_offer_buffer = io.BytesIO()
     offer_number_final = _get_next_offer_number(texts, load_admin_setting_func, save_admin_setting_func)
 
@@ -560,66 +882,74 @@ def generate_offer_pdf(
     
     current_project_data_pdf = project_data if isinstance(project_data, dict) else {}
     current_analysis_results_pdf = analysis_results if isinstance(analysis_results, dict) else {}
-    customer_pdf = current_project_data_pdf.get("customer_data", {})
+    customer_pdf = current_project_data_pdf.get("customer_data") or {} # auch bei explizitem None
     pv_details_pdf = current_project_data_pdf.get("project_details", {})
     available_width_content = doc.width
 
+    # Häufig benötigte Firmen-/Kundenfelder einmalig auslesen (Deckblatt + Anschreiben)
+    ci_name = company_info.get('name', '')
+    ci_street = company_info.get('street', '')
+    ci_zip = company_info.get('zip_code', '')
+    ci_city = company_info.get('city', '')
+    cu_salutation, cu_title = customer_pdf.get('salutation', ''), customer_pdf.get('title', '')
+    cu_first_name, cu_last_name = customer_pdf.get('first_name', ''), customer_pdf.get('last_name', '')
+    cu_company_name = customer_pdf.get('company_name')
+    cu_address, cu_house_number = customer_pdf.get('address', ''), customer_pdf.get('house_number', '')
+    cu_zip, cu_city = customer_pdf.get('zip_code', ''), customer_pdf.get('city', '')
+
+    # Datum wird in Deckblatt und Anschreiben benötigt -> einmalig berechnen
+    today_str = datetime.now().strftime('%d.%m.%Y')
+
     # --- Deckblatt ---
     try:
         if selected_title_image_b64:
-            img_flowables_title = _get_image_flowable(selected_title_image_b64, doc.width, texts, max_height=doc.height / 1.8, align='CENTER')
+            img_flowables_title = _get_image_flowable(selected_title_image_b64, doc.width, texts, max_height=doc.height / 1.8, align='CENTER', cache_key=selected_title_image_digest)
             if img_flowables_title: story.extend(img_flowables_title); story.append(Spacer(1, 0.5 * cm))
 
-        if include_company_logo_opt and company_logo_base64:
-            logo_flowables_deckblatt = _get_image_flowable(company_logo_base64, 6*cm, texts, max_height=3*cm, align='CENTER')
+        if include_company_logo_opt and company_logo_bytes:
+            logo_flowables_deckblatt = _get_image_flowable(company_logo_bytes, 6*cm, texts, max_height=3*cm, align='CENTER')
             if logo_flowables_deckblatt: story.extend(logo_flowables_deckblatt); story.append(Spacer(1, 0.5 * cm))
 
         offer_title_processed_pdf = _replace_placeholders(selected_offer_title_text, customer_pdf, company_info, offer_number_final, texts, current_analysis_results_pdf)
         story.append(Paragraph(offer_title_processed_pdf, STYLES.get('OfferTitle')))
         
-        company_info_html_pdf = "<br/>".join(filter(None, [
-            f"<b>{company_info.get('name', '')}</b>", company_info.get("street", ""),
-            f"{company_info.get('zip_code', '')} {company_info.get('city', '')}".strip(),
-            (f"{get_text(texts, 'pdf_phone_label_short', 'Tel.')}: {company_info.get('phone', '')}" if company_info.get('phone') else None),
-            (f"{get_text(texts, 'pdf_email_label_short', 'Mail')}: {company_info.get('email', '')}" if company_info.get('email') else None),
-            (f"{get_text(texts, 'pdf_website_label_short', 'Web')}: {company_info.get('website', '')}" if company_info.get('website') else None),
-            (f"{get_text(texts, 'pdf_taxid_label', 'StNr/USt-ID')}: {company_info.get('tax_id', '')}" if company_info.get('tax_id') else None),
-        ]))
+        ci_phone, ci_email, ci_website, ci_tax_id = company_info.get('phone'), company_info.get('email'), company_info.get('website'), company_info.get('tax_id')
+        phone_line = f"{get_text(texts, 'pdf_phone_label_short', 'Tel.')}: {ci_phone}" if ci_phone else None
+        email_line = f"{get_text(texts, 'pdf_email_label_short', 'Mail')}: {ci_email}" if ci_email else None
+        web_line = f"{get_text(texts, 'pdf_website_label_short', 'Web')}: {ci_website}" if ci_website else None
+        tax_line = f"{get_text(texts, 'pdf_taxid_label', 'StNr/USt-ID')}: {ci_tax_id}" if ci_tax_id else None
+        company_info_html_pdf = "<br/>".join(x for x in (f"<b>{ci_name}</b>", ci_street, f"{ci_zip} {ci_city}".strip(), phone_line, email_line, web_line, tax_line) if x)
         story.append(Paragraph(company_info_html_pdf, STYLES.get('CompanyInfoDeckblatt')))
         
-        customer_name_display_pdf = f"{customer_pdf.get('salutation','')} {customer_pdf.get('title','')} {customer_pdf.get('first_name','')} {customer_pdf.get('last_name','')}".replace(" None ", " ").replace("  ", " ").strip()
-        if not customer_name_display_pdf: customer_name_display_pdf = customer_pdf.get("company_name", get_text(texts, "customer_name_fallback_pdf", "Interessent"))
-
-        customer_address_block_pdf_lines = [customer_name_display_pdf]
-        if customer_pdf.get("company_name") and customer_name_display_pdf != customer_pdf.get("company_name"):
-            customer_address_block_pdf_lines.append(str(customer_pdf.get("company_name")))
-        customer_address_block_pdf_lines.extend([
-            f"{str(customer_pdf.get('address',''))} {str(customer_pdf.get('house_number','',))}".strip(),
-            f"{str(customer_pdf.get('zip_code',''))} {str(customer_pdf.get('city','',))}".strip()
-        ])
-        customer_address_block_pdf = "<br/>".join(filter(None, customer_address_block_pdf_lines))
+        customer_name_display_pdf = f"{cu_salutation} {cu_title} {cu_first_name} {cu_last_name}".replace(" None ", " ").replace("  ", " ").strip()
+        if not customer_name_display_pdf: customer_name_display_pdf = cu_company_name or get_text(texts, "customer_name_fallback_pdf", "Interessent")
+
+        customer_company_line = str(cu_company_name) if cu_company_name and customer_name_display_pdf != cu_company_name else None
+        customer_street_line = f"{cu_address} {cu_house_number}".strip()
+        customer_city_line = f"{cu_zip} {cu_city}".strip()
+        customer_address_block_pdf = "<br/>".join(x for x in (customer_name_display_pdf, customer_company_line, customer_street_line, customer_city_line) if x)
         story.append(Paragraph(customer_address_block_pdf, STYLES.get("CustomerAddress")))
         
         story.append(Spacer(1, 0.2 * cm))
-        story.append(Paragraph(f"{get_text(texts, 'pdf_offer_number_label', 'Angebotsnummer')}: <b>{offer_number_final}</b>", STYLES.get('NormalRight')))
-        story.append(Paragraph(f"{get_text(texts, 'pdf_offer_date_label', 'Datum')}: {datetime.now().strftime('%d.%m.%Y')}", STYLES.get('NormalRight')))
+        story.append(Paragraph(f"{get_text(texts, 'pdf_offer_number_label', 'Angebotsnummer')}: <b>{offer_number_final}</b>", S_NR))
+        story.append(Paragraph(f"{get_text(texts, 'pdf_offer_date_label', 'Datum')}: {today_str}", S_NR))
         story.append(PageBreak())
     except Exception as e_cover:
-        story.append(Paragraph(f"Fehler bei Erstellung des Deckblatts: {e_cover}", STYLES.get('NormalLeft')))
+        story.append(Paragraph(f"Fehler bei Erstellung des Deckblatts: {e_cover}", S_NL))
         story.append(PageBreak())
 
     # --- Anschreiben ---
     try:
         story.append(SetCurrentChapterTitle(get_text(texts, "pdf_chapter_title_cover_letter", "Anschreiben")))
-        company_sender_address_lines = [company_info.get("name", ""), company_info.get("street", ""), f"{company_info.get('zip_code','')} {company_info.get('city','')}".strip()]
-        story.append(Paragraph("<br/>".join(filter(None,company_sender_address_lines)), STYLES.get('NormalLeft'))) 
+        company_sender_address_pdf = "<br/>".join(x for x in (ci_name, ci_street, f"{ci_zip} {ci_city}".strip()) if x)
+        story.append(Paragraph(company_sender_address_pdf, S_NL)) 
         story.append(Spacer(1, 1.5*cm))
-        story.append(Paragraph(customer_address_block_pdf, STYLES.get('NormalLeft')))
+        story.append(Paragraph(customer_address_block_pdf, S_NL))
         story.append(Spacer(1, 1*cm))
-        story.append(Paragraph(datetime.now().strftime('%d.%m.%Y'), STYLES.get('NormalRight')))
+        story.append(Paragraph(today_str, S_NR))
         story.append(Spacer(1, 0.5*cm))
         offer_subject_text = get_text(texts, "pdf_offer_subject_line_param", "Ihr persönliches Angebot für eine Photovoltaikanlage, Nr. {offer_number}").format(offer_number=offer_number_final)
-        story.append(Paragraph(f"<b>{offer_subject_text}</b>", STYLES.get('NormalLeft')))
+        story.append(Paragraph(f"<b>{offer_subject_text}</b>", S_NL))
         story.append(Spacer(1, 0.5*cm))
 
         cover_letter_processed_pdf = _replace_placeholders(selected_cover_letter_text, customer_pdf, company_info, offer_number_final, texts, current_analysis_results_pdf)
@@ -630,12 +960,12 @@ def generate_offer_pdf(
             else: 
                 story.append(Spacer(1, 0.2*cm)) 
         story.append(Spacer(1, 1*cm))
-        story.append(Paragraph(get_text(texts, "pdf_closing_greeting", "Mit freundlichen Grüßen"), STYLES.get('NormalLeft')))
+        story.append(Paragraph(get_text(texts, "pdf_closing_greeting", "Mit freundlichen Grüßen"), S_NL))
         story.append(Spacer(1, 0.3*cm))
-        story.append(Paragraph(str(company_info.get("name", "")), STYLES.get('NormalLeft')))
+        story.append(Paragraph(str(ci_name), S_NL))
         story.append(PageBreak())
     except Exception as e_letter:
-        story.append(Paragraph(f"Fehler bei Erstellung des Anschreibens: {e_letter}", STYLES.get('NormalLeft')))
+        story.append(Paragraph(f"Fehler bei Erstellung des Anschreibens: {e_letter}", S_NL))
         story.append(PageBreak())
 
     # --- Dynamische Sektionen ---
@@ -661,272 +991,251 @@ def generate_offer_pdf(
         ("FutureAspects", "pdf_chapter_title_future_aspects", "8. Zukunftsaspekte & Erweiterungen"),
     ]
 
+    section_ctx = {
+        'pv_details': pv_details_pdf, 'analysis_results': current_analysis_results_pdf,
+        'available_width': available_width_content, 'get_product_by_id_func': get_product_by_id_func,
+        'include_product_images': include_product_images_opt,
+        'include_optional_component_details': include_optional_component_details_opt,
+        'inclusion_options': inclusion_options, 'styles': bound_styles,
+    }
     current_section_counter_pdf = 1
     for section_key_current, title_text_key_current, default_title_current in ordered_section_definitions_pdf:
-        if section_key_current in active_sections_set_pdf:
-            try:
-                chapter_title_for_header_current = section_chapter_titles_map.get(section_key_current, default_title_current.split('. ',1)[-1] if '. ' in default_title_current else default_title_current)
-                story.append(SetCurrentChapterTitle(chapter_title_for_header_current))
-                numbered_title_current = f"{current_section_counter_pdf}. {get_text(texts, title_text_key_current, default_title_current.split('. ',1)[-1] if '. ' in default_title_current else default_title_current)}"
-                story.append(Paragraph(numbered_title_current, STYLES.get('SectionTitle')))
-                story.append(Spacer(1, 0.2 * cm))
-
-                if section_key_current == "ProjectOverview":
-                    if pv_details_pdf.get('visualize_roof_in_pdf_satellite', False) and pv_details_pdf.get('satellite_image_base64_data'):
-                        story.append(Paragraph(get_text(texts,"satellite_image_header_pdf","Satellitenansicht Objekt"), STYLES.get('SubSectionTitle')))
-                        sat_img_flowables = _get_image_flowable(pv_details_pdf['satellite_image_base64_data'], available_width_content * 0.8, texts, caption_text_key="satellite_image_caption_pdf", max_height=10*cm)
-                        if sat_img_flowables: story.extend(sat_img_flowables); story.append(Spacer(1, 0.5*cm))
-                    
-                    overview_data_content_pdf = [
-                        [get_text(texts,"anlage_size_label_pdf", "Anlagengröße"),format_kpi_value(current_analysis_results_pdf.get('anlage_kwp'),"kWp",texts_dict=texts, na_text_key="value_not_available_short_pdf")],
-                        [get_text(texts,"module_quantity_label_pdf","Anzahl Module"),str(pv_details_pdf.get('module_quantity', get_text(texts, "value_not_available_short_pdf")))],
-                        [get_text(texts,"annual_pv_production_kwh_pdf", "Jährliche PV-Produktion (ca.)"),format_kpi_value(current_analysis_results_pdf.get('annual_pv_production_kwh'),"kWh",precision=0,texts_dict=texts, na_text_key="value_not_available_short_pdf")],
-                        [get_text(texts,"self_supply_rate_percent_pdf", "Autarkiegrad (ca.)"),format_kpi_value(current_analysis_results_pdf.get('self_supply_rate_percent'),"%",precision=1,texts_dict=texts, na_text_key="value_not_available_short_pdf")],
-                    ]
-                    if pv_details_pdf.get('include_storage'):
-                         overview_data_content_pdf.extend([[get_text(texts,"selected_storage_capacity_label_pdf", "Speicherkapazität"),format_kpi_value(pv_details_pdf.get('selected_storage_storage_power_kw'),"kWh",texts_dict=texts, na_text_key="value_not_available_short_pdf")]])
-                    if overview_data_content_pdf:
-                        overview_table_data_styled_content_pdf = [[Paragraph(str(cell[0]),STYLES.get('TableLabel')),Paragraph(str(cell[1]),STYLES.get('TableText'))] for cell in overview_data_content_pdf]
-                        overview_table_content_pdf = Table(overview_table_data_styled_content_pdf,colWidths=[available_width_content*0.5,available_width_content*0.5])
-                        overview_table_content_pdf.setStyle(TABLE_STYLE_DEFAULT); story.append(overview_table_content_pdf)
-
-                elif section_key_current == "TechnicalComponents":
-                    story.append(Paragraph(get_text(texts, "pdf_components_intro", "Nachfolgend die Details zu den Kernkomponenten Ihrer Anlage:"), STYLES.get('NormalLeft')))
-                    story.append(Spacer(1, 0.3*cm))
-                    
-                    main_components = [
-                        (pv_details_pdf.get("selected_module_id"), get_text(texts, "pdf_component_module_title", "PV-Module")),
-                        (pv_details_pdf.get("selected_inverter_id"), get_text(texts, "pdf_component_inverter_title", "Wechselrichter")),
-                    ]
-                    if pv_details_pdf.get("include_storage"):
-                        main_components.append((pv_details_pdf.get("selected_storage_id"), get_text(texts, "pdf_component_storage_title", "Batteriespeicher")))
-                    
-                    for comp_id, comp_title in main_components:
-                        if comp_id: _add_product_details_to_story(story, comp_id, comp_title, texts, available_width_content, get_product_by_id_func, include_product_images_opt)
-
-                    # ERWEITERUNG: Optionale Komponenten / Zubehör
-                    if pv_details_pdf.get('include_additional_components', False) and include_optional_component_details_opt:
-                        story.append(Paragraph(get_text(texts, "pdf_additional_components_header_pdf", "Optionale Komponenten"), STYLES.get('SubSectionTitle')))
-                        optional_comps_map = {
-                            'selected_wallbox_id': get_text(texts, "pdf_component_wallbox_title", "Wallbox"),
-                            'selected_ems_id': get_text(texts, "pdf_component_ems_title", "Energiemanagementsystem"),
-                            'selected_optimizer_id': get_text(texts, "pdf_component_optimizer_title", "Leistungsoptimierer"),
-                            'selected_carport_id': get_text(texts, "pdf_component_carport_title", "Solarcarport"),
-                            'selected_notstrom_id': get_text(texts, "pdf_component_emergency_power_title", "Notstromversorgung"),
-                            'selected_tierabwehr_id': get_text(texts, "pdf_component_animal_defense_title", "Tierabwehrschutz")
-                        }
-                        any_optional_component_rendered = False
-                        for key, title in optional_comps_map.items():
-                            opt_comp_id = pv_details_pdf.get(key)
-                            if opt_comp_id: 
-                                _add_product_details_to_story(story, opt_comp_id, title, texts, available_width_content, get_product_by_id_func, include_product_images_opt)
-                                any_optional_component_rendered = True
-                        if not any_optional_component_rendered:
-                            story.append(Paragraph(get_text(texts, "pdf_no_optional_components_selected_for_details", "Keine optionalen Komponenten für Detailanzeige ausgewählt."), STYLES.get('NormalLeft')))
-
-
-                elif section_key_current == "CostDetails":
-                    cost_table_data_final_pdf = _prepare_cost_table_for_pdf(current_analysis_results_pdf, texts)
-                    if cost_table_data_final_pdf:
-                        cost_table_obj_final_pdf = Table(cost_table_data_final_pdf, colWidths=[available_width_content*0.6, available_width_content*0.4])
-                        cost_table_obj_final_pdf.setStyle(TABLE_STYLE_DEFAULT); story.append(cost_table_obj_final_pdf)
-                        if current_analysis_results_pdf.get('base_matrix_price_netto', 0.0) == 0 and current_analysis_results_pdf.get('cost_storage_aufpreis_product_db_netto', 0.0) > 0: story.append(Spacer(1,0.2*cm)); story.append(Paragraph(get_text(texts, "analysis_storage_cost_note_single_price_pdf", "<i>Hinweis: Speicherkosten als Einzelposten, da kein Matrix-Pauschalpreis.</i>"), STYLES.get('TableTextSmall')))
-                        elif current_analysis_results_pdf.get('base_matrix_price_netto', 0.0) > 0 and current_analysis_results_pdf.get('cost_storage_aufpreis_product_db_netto', 0.0) > 0 : story.append(Spacer(1,0.2*cm)); story.append(Paragraph(get_text(texts, "analysis_storage_cost_note_matrix_pdf", "<i>Hinweis: Speicherkosten als Aufpreis, da Matrixpreis 'Ohne Speicher' verwendet wurde.</i>"), STYLES.get('TableTextSmall')))
-
-                elif section_key_current == "Economics":
-                    eco_kpi_data_for_pdf_table = [
-                        [get_text(texts, "total_investment_brutto_pdf", "Gesamtinvestition (Brutto)"), format_kpi_value(current_analysis_results_pdf.get('total_investment_brutto'), "€", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
-                        [get_text(texts, "annual_financial_benefit_pdf", "Finanzieller Vorteil (Jahr 1, ca.)"), format_kpi_value(current_analysis_results_pdf.get('annual_financial_benefit_year1'), "€", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
-                        [get_text(texts, "amortization_time_years_pdf", "Amortisationszeit (ca.)"), format_kpi_value(current_analysis_results_pdf.get('amortization_time_years'), "Jahre", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
-                        [get_text(texts, "simple_roi_percent_label_pdf", "Einfache Rendite (Jahr 1, ca.)"), format_kpi_value(current_analysis_results_pdf.get('simple_roi_percent'), "%", precision=1, texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
-                        [get_text(texts, "lcoe_euro_per_kwh_label_pdf", "Stromgestehungskosten (LCOE, ca.)"), format_kpi_value(current_analysis_results_pdf.get('lcoe_euro_per_kwh'), "€/kWh", precision=3, texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
-                        [get_text(texts, "npv_over_years_pdf", "Kapitalwert über Laufzeit (NPV, ca.)"), format_kpi_value(current_analysis_results_pdf.get('npv_value'), "€", texts_dict=texts, na_text_key="value_not_calculated_short_pdf")],
-                        [get_text(texts, "irr_percent_pdf", "Interner Zinsfuß (IRR, ca.)"), format_kpi_value(current_analysis_results_pdf.get('irr_percent'), "%", precision=1, texts_dict=texts, na_text_key="value_not_calculated_short_pdf")]
-                    ]
-                    if eco_kpi_data_for_pdf_table:
-                        eco_kpi_table_styled_content = [[Paragraph(str(cell[0]), STYLES.get('TableLabel')), Paragraph(str(cell[1]), STYLES.get('TableNumber'))] for cell in eco_kpi_data_for_pdf_table]
-                        eco_table_object = Table(eco_kpi_table_styled_content, colWidths=[available_width_content*0.6, available_width_content*0.4])
-                        eco_table_object.setStyle(TABLE_STYLE_DEFAULT); story.append(eco_table_object)
-
-                elif section_key_current == "SimulationDetails":
-                    sim_table_data_content_pdf = _prepare_simulation_table_for_pdf(current_analysis_results_pdf, texts, num_years_to_show=10)
-                    if len(sim_table_data_content_pdf) > 1:
-                        sim_table_obj_final_pdf = Table(sim_table_data_content_pdf, colWidths=None)
-                        sim_table_obj_final_pdf.setStyle(DATA_TABLE_STYLE); story.append(sim_table_obj_final_pdf)
-                    else: story.append(Paragraph(get_text(texts, "pdf_simulation_data_not_available", "Simulationsdetails nicht ausreichend für Tabellendarstellung."), STYLES.get('NormalLeft')))
-
-                elif section_key_current == "CO2Savings":
-                    co2_savings_val = current_analysis_results_pdf.get('annual_co2_savings_kg', 0.0)
-                    co2_text = get_text(texts, "pdf_annual_co2_savings_param_pdf", "Durch Ihre neue Photovoltaikanlage vermeiden Sie jährlich ca. <b>{co2_savings_kg_formatted} kg CO₂</b>. Dies entspricht der Bindungskapazität von etwa <b>{trees_equiv:.0f} Bäumen</b> oder der Vermeidung von ca. <b>{car_km_equiv:.0f} Autokilometern</b>.").format(
-                        co2_savings_kg_formatted=format_kpi_value(co2_savings_val, "", precision=0, texts_dict=texts),
-                        trees_equiv=current_analysis_results_pdf.get('co2_equivalent_trees_per_year', 0.0),
-                        car_km_equiv=current_analysis_results_pdf.get('co2_equivalent_car_km_per_year', 0.0)
-                    )
-                    story.append(Paragraph(co2_text, STYLES.get('NormalLeft')))
-
-                elif section_key_current == "Visualizations":
-                    story.append(Paragraph(get_text(texts, "pdf_visualizations_intro", "Die folgenden Diagramme visualisieren die Ergebnisse Ihrer Photovoltaikanlage und deren Wirtschaftlichkeit:"), STYLES.get('NormalLeft')))
-                    story.append(Spacer(1, 0.3 * cm))
-                    
-                    # ERWEITERUNG: Vollständige Liste der Diagramme für PDF-Auswahl
-                    # Diese Map sollte idealerweise mit `chart_key_to_friendly_name_map` aus `pdf_ui.py` synchronisiert werden.
-                    charts_config_for_pdf_generator = {
-                        'monthly_prod_cons_chart_bytes': {"title_key": "pdf_chart_title_monthly_comp_pdf", "default_title": "Monatl. Produktion/Verbrauch (2D)"},
-                        'cost_projection_chart_bytes': {"title_key": "pdf_chart_label_cost_projection", "default_title": "Stromkosten-Hochrechnung (2D)"},
-                        'cumulative_cashflow_chart_bytes': {"title_key": "pdf_chart_label_cum_cashflow", "default_title": "Kumulierter Cashflow (2D)"},
-                        'consumption_coverage_pie_chart_bytes': {"title_key": "pdf_chart_title_consumption_coverage_pdf", "default_title": "Deckung Gesamtverbrauch (Jahr 1)"},
-                        'pv_usage_pie_chart_bytes': {"title_key": "pdf_chart_title_pv_usage_pdf", "default_title": "Nutzung PV-Strom (Jahr 1)"},
-                        'daily_production_switcher_chart_bytes': {"title_key": "pdf_chart_label_daily_3d", "default_title": "Tagesproduktion (3D)"},
-                        'weekly_production_switcher_chart_bytes': {"title_key": "pdf_chart_label_weekly_3d", "default_title": "Wochenproduktion (3D)"},
-                        'yearly_production_switcher_chart_bytes': {"title_key": "pdf_chart_label_yearly_3d_bar", "default_title": "Jahresproduktion (3D-Balken)"},
-                        'project_roi_matrix_switcher_chart_bytes': {"title_key": "pdf_chart_label_roi_matrix_3d", "default_title": "Projektrendite-Matrix (3D)"},
-                        'feed_in_revenue_switcher_chart_bytes': {"title_key": "pdf_chart_label_feedin_3d", "default_title": "Einspeisevergütung (3D)"},
-                        'prod_vs_cons_switcher_chart_bytes': {"title_key": "pdf_chart_label_prodcons_3d", "default_title": "Verbr. vs. Prod. (3D)"},
-                        'tariff_cube_switcher_chart_bytes': {"title_key": "pdf_chart_label_tariffcube_3d", "default_title": "Tarifvergleich (3D)"},
-                        'co2_savings_value_switcher_chart_bytes': {"title_key": "pdf_chart_label_co2value_3d", "default_title": "CO2-Ersparnis vs. Wert (3D)"},
-                        'investment_value_switcher_chart_bytes': {"title_key": "pdf_chart_label_investval_3D", "default_title": "Investitionsnutzwert (3D)"},
-                        'storage_effect_switcher_chart_bytes': {"title_key": "pdf_chart_label_storageeff_3d", "default_title": "Speicherwirkung (3D)"},
-                        'selfuse_stack_switcher_chart_bytes': {"title_key": "pdf_chart_label_selfusestack_3d", "default_title": "Eigenverbr. vs. Einspeis. (3D)"},
-                        'cost_growth_switcher_chart_bytes': {"title_key": "pdf_chart_label_costgrowth_3d", "default_title": "Stromkostensteigerung (3D)"},
-                        'selfuse_ratio_switcher_chart_bytes': {"title_key": "pdf_chart_label_selfuseratio_3d", "default_title": "Eigenverbrauchsgrad (3D)"},
-                        'roi_comparison_switcher_chart_bytes': {"title_key": "pdf_chart_label_roicompare_3d", "default_title": "ROI-Vergleich (3D)"},
-                        'scenario_comparison_switcher_chart_bytes': {"title_key": "pdf_chart_label_scenariocomp_3d", "default_title": "Szenarienvergleich (3D)"},
-                        'tariff_comparison_switcher_chart_bytes': {"title_key": "pdf_chart_label_tariffcomp_3d", "default_title": "Vorher/Nachher Stromkosten (3D)"},
-                        'income_projection_switcher_chart_bytes': {"title_key": "pdf_chart_label_incomeproj_3d", "default_title": "Einnahmenprognose (3D)"},
-                        'yearly_production_chart_bytes': {"title_key": "pdf_chart_label_pvvis_yearly", "default_title": "PV Visuals: Jahresproduktion"},
-                        'break_even_chart_bytes': {"title_key": "pdf_chart_label_pvvis_breakeven", "default_title": "PV Visuals: Break-Even"},
-                        'amortisation_chart_bytes': {"title_key": "pdf_chart_label_pvvis_amort", "default_title": "PV Visuals: Amortisation"},
-                    }
-                    charts_added_count = 0
-                    selected_charts_for_pdf_opt = inclusion_options.get("selected_charts_for_pdf", [])
-                    
-                    for chart_key, config in charts_config_for_pdf_generator.items():
-                        if chart_key not in selected_charts_for_pdf_opt:
-                            continue # Überspringe dieses Diagramm, wenn nicht vom Nutzer ausgewählt
-
-                        chart_image_bytes = current_analysis_results_pdf.get(chart_key)
-                        if chart_image_bytes and isinstance(chart_image_bytes, bytes):
-                            chart_display_title = get_text(texts, config["title_key"], config["default_title"])
-                            story.append(Paragraph(chart_display_title, STYLES.get('ChartTitle')))
-                            img_flowables_chart = _get_image_flowable(chart_image_bytes, available_width_content * 0.9, texts, max_height=12*cm, align='CENTER')
-                            if img_flowables_chart: story.extend(img_flowables_chart); story.append(Spacer(1, 0.7*cm)); charts_added_count += 1
-                            else: story.append(Paragraph(get_text(texts, "pdf_chart_load_error_placeholder_param", f"(Fehler beim Laden: {chart_display_title})"), STYLES.get('NormalCenter'))); story.append(Spacer(1, 0.5*cm))
-                    if charts_added_count == 0 and selected_charts_for_pdf_opt : # Wenn Charts ausgewählt wurden, aber keine gerendert werden konnten
-                         story.append(Paragraph(get_text(texts, "pdf_selected_charts_not_renderable", "Ausgewählte Diagramme konnten nicht geladen/angezeigt werden."), STYLES.get('NormalCenter')))
-                    elif not selected_charts_for_pdf_opt : # Wenn gar keine Charts ausgewählt wurden
-                         story.append(Paragraph(get_text(texts, "pdf_no_charts_selected_for_section", "Keine Diagramme für diese Sektion ausgewählt."), STYLES.get('NormalCenter')))
-
-
-                elif section_key_current == "FutureAspects":
-                    future_aspects_text = ""
-                    if pv_details_pdf.get('future_ev'):
-                        future_aspects_text += get_text(texts, "pdf_future_ev_text_param", "<b>E-Mobilität:</b> Die Anlage ist auf eine zukünftige Erweiterung um ein Elektrofahrzeug vorbereitet. Der prognostizierte PV-Anteil an der Fahrzeugladung beträgt ca. {eauto_pv_coverage_kwh:.0f} kWh/Jahr.").format(eauto_pv_coverage_kwh=current_analysis_results_pdf.get('eauto_ladung_durch_pv_kwh',0.0)) + "<br/>"
-                    if pv_details_pdf.get('future_hp'):
-                        future_aspects_text += get_text(texts, "pdf_future_hp_text_param", "<b>Wärmepumpe:</b> Die Anlage kann zur Unterstützung einer zukünftigen Wärmepumpe beitragen. Der geschätzte PV-Deckungsgrad für die Wärmepumpe liegt bei ca. {hp_pv_coverage_pct:.0f}%. ").format(hp_pv_coverage_pct=current_analysis_results_pdf.get('pv_deckungsgrad_wp_pct',0.0)) + "<br/>"
-                    if not future_aspects_text: future_aspects_text = get_text(texts, "pdf_no_future_aspects_selected", "Keine spezifischen Zukunftsaspekte für dieses Angebot ausgewählt.")
-                    story.append(Paragraph(future_aspects_text, STYLES.get('NormalLeft')))
-
-                story.append(Spacer(1, 0.5*cm)); current_section_counter_pdf +=1
-            except Exception as e_section:
-                story.append(Paragraph(f"Fehler in Sektion '{default_title_current}': {e_section}", STYLES.get('NormalLeft')))
-                story.append(Spacer(1, 0.5*cm)); current_section_counter_pdf +=1
+        if section_key_current not in active_sections_set_pdf: continue
+        # Ein try pro Sektion um den gesamten Aufruf: ein Fehler betrifft nur diese Sektion, die übrigen werden weiter erzeugt
+        try:
+            chapter_title_for_header_current = section_chapter_titles_map.get(section_key_current, default_title_current.split('. ',1)[-1] if '. ' in default_title_current else default_title_current)
+            story.append(SetCurrentChapterTitle(chapter_title_for_header_current))
+            numbered_title_current = f"{current_section_counter_pdf}. {get_text(texts, title_text_key_current, default_title_current.split('. ',1)[-1] if '. ' in default_title_current else default_title_current)}"
+            story.append(Paragraph(numbered_title_current, S_ST))
+            story.append(Spacer(1, 0.2 * cm))
+            _SECTION_EMITTERS[section_key_current](story, texts, section_ctx)
+        except Exception as e_section:
+            story.append(Paragraph(f"Fehler in Sektion '{default_title_current}': {e_section}", S_NL))
+        story.append(Spacer(1, 0.5*cm)); current_section_counter_pdf +=1
     
-    main_pdf_bytes: Optional[bytes] = None
     try:
         layout_callback_kwargs_build = {
             'texts_ref': texts, 'company_info_ref': company_info,
-            'company_logo_base64_ref': company_logo_base64 if include_company_logo_opt else None,
+            'company_logo_base64_ref': company_logo_bytes if include_company_logo_opt else None,
+            'company_logo_reader_ref': company_logo_reader if include_company_logo_opt else None,
             'offer_number_ref': offer_number_final, 'page_width_ref': doc.pagesize[0], 
             'page_height_ref': doc.pagesize[1],'margin_left_ref': doc.leftMargin, 
             'margin_right_ref': doc.rightMargin,'margin_top_ref': doc.topMargin, 
             'margin_bottom_ref': doc.bottomMargin,'doc_width_ref': doc.width, 'doc_height_ref': doc.height
         }
         doc.build(story, canvasmaker=lambda *args, **kwargs_c: PageNumCanvas(*args, onPage_callback=page_layout_handler, callback_kwargs=layout_callback_kwargs_build, **kwargs_c))
-        main_pdf_bytes = main_offer_buffer.getvalue()
     except Exception as e_build_pdf:
-        return _create_plaintext_pdf_fallback(project_data, analysis_results, texts, company_info, selected_offer_title_text, selected_cover_letter_text)
-    finally:
         main_offer_buffer.close()
+        return _create_plaintext_pdf_fallback(project_data, analysis_results, texts, company_info, selected_offer_title_text, selected_cover_letter_text)
 
-    if not main_pdf_bytes: return None
-
-    if not (include_all_documents_opt and _PYPDF_AVAILABLE):
-        return main_pdf_bytes
-
-    paths_to_append: List[str] = []
-    # Produktdatenblätter (Hauptkomponenten UND Zubehör)
-    product_ids_for_datasheets = list(filter(None, [
-        pv_details_pdf.get("selected_module_id"),
-        pv_details_pdf.get("selected_inverter_id"),
-        pv_details_pdf.get("selected_storage_id") if pv_details_pdf.get("include_storage") else None
-    ]))
-    if pv_details_pdf.get('include_additional_components', False): # Nur wenn Zubehör überhaupt aktiv ist
-        for opt_id_key in ['selected_wallbox_id', 'selected_ems_id', 'selected_optimizer_id', 'selected_carport_id', 'selected_notstrom_id', 'selected_tierabwehr_id']:
-            comp_id_val = pv_details_pdf.get(opt_id_key)
-            if comp_id_val: product_ids_for_datasheets.append(comp_id_val)
-    
-    # Duplikate entfernen, falls ein Produkt mehrfach auftaucht (unwahrscheinlich, aber sicher)
-    product_ids_for_datasheets = list(set(product_ids_for_datasheets))
+    # Der ReportLab-Puffer bleibt bis nach dem Zusammenführen offen: die Merge-Backends lesen direkt daraus,
+    # eine Kopie über getvalue() entsteht nur, wenn das Hauptdokument unverändert zurückgegeben wird.
+    try:
+        if not main_offer_buffer.getbuffer().nbytes: return None # getbuffer() ohne Kopie, Sicht wird sofort wieder freigegeben
 
+        if not (include_all_documents_opt and _PDF_MERGE_BACKEND):
+            return main_offer_buffer.getvalue()
 
-    for prod_id in product_ids_for_datasheets:
-        product_info = get_product_by_id_func(prod_id) 
-        if product_info and product_info.get("datasheet_link_db_path"):
-            relative_datasheet_path = product_info["datasheet_link_db_path"]
-            full_datasheet_path = os.path.join(PRODUCT_DATASHEETS_BASE_DIR_PDF_GEN, relative_datasheet_path)
-            if os.path.exists(full_datasheet_path): paths_to_append.append(full_datasheet_path)
+        paths_to_append: List[str] = []
+        # Produktdatenblätter (Hauptkomponenten UND Zubehör)
+        product_ids_for_datasheets = list(filter(None, [
+            pv_details_pdf.get("selected_module_id"),
+            pv_details_pdf.get("selected_inverter_id"),
+            pv_details_pdf.get("selected_storage_id") if pv_details_pdf.get("include_storage") else None
+        ]))
+        if pv_details_pdf.get('include_additional_components', False): # Nur wenn Zubehör überhaupt aktiv ist
+            for opt_id_key in ['selected_wallbox_id', 'selected_ems_id', 'selected_optimizer_id', 'selected_carport_id', 'selected_notstrom_id', 'selected_tierabwehr_id']:
+                comp_id_val = pv_details_pdf.get(opt_id_key)
+                if comp_id_val: product_ids_for_datasheets.append(comp_id_val)
+    
+        # Duplikate entfernen, falls ein Produkt mehrfach auftaucht (unwahrscheinlich, aber sicher).
+        # dict.fromkeys erhält die Reihenfolge -> Datenblätter werden deterministisch angehängt.
+        product_ids_for_datasheets = list(dict.fromkeys(product_ids_for_datasheets))
+        products_for_datasheets = {prod_id: get_product_by_id_func(prod_id) for prod_id in product_ids_for_datasheets}
+
+        datasheet_file_index = _directory_file_index(PRODUCT_DATASHEETS_BASE_DIR_PDF_GEN)
+        for prod_id, product_info in products_for_datasheets.items():
+            if product_info and product_info.get("datasheet_link_db_path"):
+                full_datasheet_path = _resolve_indexed_file(PRODUCT_DATASHEETS_BASE_DIR_PDF_GEN, datasheet_file_index, product_info["datasheet_link_db_path"])
+                if full_datasheet_path: paths_to_append.append(full_datasheet_path)
             
-    # Firmendokumente
-    if company_document_ids_to_include_opt and active_company_id is not None and callable(db_list_company_documents_func):
-        all_company_docs_for_active_co = db_list_company_documents_func(active_company_id, None) # doc_type=None für alle
-        for doc_info in all_company_docs_for_active_co:
-            if doc_info.get('id') in company_document_ids_to_include_opt:
-                relative_doc_path = doc_info.get("relative_db_path") 
-                if relative_doc_path: 
-                    full_doc_path = os.path.join(COMPANY_DOCS_BASE_DIR_PDF_GEN, relative_doc_path)
-                    if os.path.exists(full_doc_path): paths_to_append.append(full_doc_path)
+        # Firmendokumente
+        if company_document_ids_to_include_opt and active_company_id is not None and callable(db_list_company_documents_func):
+            wanted_doc_ids = frozenset(company_document_ids_to_include_opt or ()) # O(1)-Prüfung statt Listensuche pro Dokument
+            all_company_docs_for_active_co = db_list_company_documents_func(active_company_id, None) # doc_type=None für alle
+            company_docs_file_index = _directory_file_index(COMPANY_DOCS_BASE_DIR_PDF_GEN)
+            for doc_info in all_company_docs_for_active_co:
+                if doc_info.get('id') in wanted_doc_ids:
+                    relative_doc_path = doc_info.get("relative_db_path") 
+                    if relative_doc_path: 
+                        full_doc_path = _resolve_indexed_file(COMPANY_DOCS_BASE_DIR_PDF_GEN, company_docs_file_index, relative_doc_path)
+                        if full_doc_path: paths_to_append.append(full_doc_path)
                     
-    if not paths_to_append: return main_pdf_bytes
+        if not paths_to_append: return main_offer_buffer.getvalue()
+
+        try:
+            return _merge_pdfs(main_offer_buffer, paths_to_append)
+        except Exception as e_merge_final:
+            return main_offer_buffer.getvalue()
+    finally:
+        main_offer_buffer.close()
+
+# Dateiindex je Basisverzeichnis (Datenblätter, Firmendokumente): {relativer Pfad: voller Pfad}.
+# Wird einmal per os.scandir aufgebaut und bei geänderter mtime des Basisverzeichnisses neu erstellt,
+# sodass die Anhang-Prüfungen pro Angebot Dict-Lookups statt einzelner stat-Aufrufe sind.
+# Neue Dateien in Unterordnern ändern die mtime der Basis nicht -> bei Fehltreffern wird einmal direkt geprüft.
+_DIRECTORY_FILE_INDEX: Dict[str, tuple] = {}
 
-    pdf_writer = PdfWriter()
+def _scan_directory_files(base_dir: str) -> Dict[str, str]:
+    file_index: Dict[str, str] = {}
+    pending_dirs = [base_dir]
+    while pending_dirs:
+        try:
+            with os.scandir(pending_dirs.pop()) as dir_entries:
+                for entry in dir_entries:
+                    if entry.is_dir(): pending_dirs.append(entry.path)
+                    elif entry.is_file(): file_index[os.path.normpath(os.path.relpath(entry.path, base_dir))] = entry.path
+        except OSError as e_scan:
+            pass
+    return file_index
+
+def _directory_file_index(base_dir: str) -> Dict[str, str]:
+    try:
+        base_mtime = os.stat(base_dir).st_mtime
+    except OSError:
+        return {}
+    cached_index = _DIRECTORY_FILE_INDEX.get(base_dir)
+    if cached_index and cached_index[0] == base_mtime: return cached_index[1]
+    file_index = _scan_directory_files(base_dir)
+    _DIRECTORY_FILE_INDEX[base_dir] = (base_mtime, file_index)
+    return file_index
+
+def _resolve_indexed_file(base_dir: str, file_index: Dict[str, str], relative_path: str) -> Optional[str]:
+    index_key = os.path.normpath(relative_path)
+    full_path = file_index.get(index_key)
+    if full_path: return full_path
+    candidate_path = Path(base_dir, relative_path)
+    if candidate_path.is_file(): # Nachzügler seit dem letzten Scan
+        full_path = str(candidate_path)
+        file_index[index_key] = full_path
+        return full_path
+    return None
+
+@lru_cache(maxsize=128)
+def _cached_source_pdf_bytes(pdf_path: str, mtime: float, size: int) -> bytes:
+    # Datenblätter/Firmendokumente werden über mehrere Angebote hinweg wiederverwendet.
+    # (mtime, size) im Schlüssel sorgt dafür, dass geänderte Dateien neu eingelesen werden.
+    # Gecacht werden nur die (unveränderlichen) Rohbytes: Streamlit-Sessions laufen in eigenen Threads,
+    # geteilte fitz/pikepdf/pypdf-Dokumentobjekte wären dort nicht sicher -> pro Merge frisch öffnen.
+    with open(pdf_path, 'rb') as f_src: return f_src.read()
+
+def _get_source_pdf(pdf_path: str) -> Any:
+    stat_result = os.stat(pdf_path)
+    pdf_data = _cached_source_pdf_bytes(pdf_path, stat_result.st_mtime, stat_result.st_size)
+    if _PDF_MERGE_BACKEND == "fitz": return fitz.open("pdf", pdf_data)
+    if _PDF_MERGE_BACKEND == "pikepdf": return pikepdf.Pdf.open(io.BytesIO(pdf_data))
+    return PdfReader(io.BytesIO(pdf_data))
+
+def _try_get_source_pdf(pdf_path: str) -> Optional[Any]:
     try:
-        main_offer_reader = PdfReader(io.BytesIO(main_pdf_bytes))
-        for page in main_offer_reader.pages: pdf_writer.add_page(page)
-    except Exception as e_read_main:
-        return main_pdf_bytes 
+        return _get_source_pdf(pdf_path)
+    except Exception as e_read_ds:
+        return None
 
-    for pdf_path in paths_to_append:
+def _load_source_pdfs(paths_to_append: List[str]) -> List[Any]:
+    # Einlesen/Parsen der Anhänge überlappt in Threads (I/O + zlib geben die GIL frei);
+    # das eigentliche Anhängen erfolgt danach seriell, da die Writer nicht threadsicher sind.
+    # PyMuPDF unterstützt generell keine Nutzung aus mehreren Threads -> dort immer seriell.
+    if len(paths_to_append) <= 1 or _PDF_MERGE_BACKEND == "fitz":
+        source_pdfs = [_try_get_source_pdf(p) for p in paths_to_append]
+    else:
+        with ThreadPoolExecutor(max_workers=min(4, len(paths_to_append))) as executor:
+            source_pdfs = list(executor.map(_try_get_source_pdf, paths_to_append))
+    return [src for src in source_pdfs if src is not None]
+
+def _merge_pdfs(main_pdf_buffer: io.BytesIO, paths_to_append: List[str]) -> bytes:
+    # main_pdf_buffer ist der (noch offene) ReportLab-Ausgabepuffer; er wird nur gelesen, nicht geschlossen
+    if _PDF_MERGE_BACKEND == "fitz": return _merge_pdfs_fitz(main_pdf_buffer, paths_to_append)
+    main_pdf_buffer.seek(0)
+    if _PDF_MERGE_BACKEND == "pikepdf": return _merge_pdfs_pikepdf(main_pdf_buffer, paths_to_append)
+    return _merge_pdfs_pypdf(main_pdf_buffer, paths_to_append)
+
+def _merge_pdfs_fitz(main_pdf_buffer: io.BytesIO, paths_to_append: List[str]) -> bytes:
+    # MuPDF kopiert die Objekte in C, ohne Python-Wrapper pro Objekt anzulegen.
+    # getbuffer() liefert eine Sicht auf den Pufferinhalt ohne Kopie; sie muss vor dem Schließen des Puffers freigegeben sein.
+    with main_pdf_buffer.getbuffer() as main_pdf_view:
+        merged_doc = fitz.open("pdf", main_pdf_view)
         try:
-            datasheet_reader = PdfReader(pdf_path)
-            for page in datasheet_reader.pages: pdf_writer.add_page(page)
-        except Exception as e_append_ds:
-            pass 
+            for source_doc in _load_source_pdfs(paths_to_append):
+                try:
+                    merged_doc.insert_pdf(source_doc)
+                except Exception as e_append_ds:
+                    pass
+                finally:
+                    source_doc.close()
+            return merged_doc.tobytes(garbage=3, deflate=True)
+        finally:
+            merged_doc.close()
+
+def _merge_pdfs_pikepdf(main_pdf_buffer: io.BytesIO, paths_to_append: List[str]) -> bytes:
+    # pikepdf übernimmt die Seiten samt Objekten direkt, ohne jede Seite in Python neu aufzubauen
+    final_buffer = io.BytesIO()
+    source_pdfs = _load_source_pdfs(paths_to_append)
+    try:
+        with pikepdf.Pdf.open(main_pdf_buffer) as merged_pdf:
+            for source_pdf in source_pdfs:
+                try:
+                    merged_pdf.pages.extend(source_pdf.pages)
+                except Exception as e_append_ds:
+                    pass
+            # Objekt-Streams + (Neu-)Komprimierung aller generisch kodierten Streams: deutlich kleinere Ausgabe bei vielen Datenblättern
+            merged_pdf.save(final_buffer, linearize=False, compress_streams=True, object_stream_mode=pikepdf.ObjectStreamMode.generate, stream_decode_level=pikepdf.StreamDecodeLevel.generalized)
+        return final_buffer.getvalue()
+    finally:
+        for source_pdf in source_pdfs: source_pdf.close() # Quellen erst nach save() schließen, die Seiten verweisen darauf
+        final_buffer.close()
+
+def _append_pdf_to_writer(pdf_writer: PdfWriter, source: Any) -> None:
+    if hasattr(pdf_writer, 'append'): pdf_writer.append(source) # Schneller Merge-Pfad (pypdf >= 3)
+    else:
+        source_reader = source if isinstance(source, PdfReader) else PdfReader(source)
+        for page in source_reader.pages: pdf_writer.add_page(page)
 
+def _merge_pdfs_pypdf(main_pdf_buffer: io.BytesIO, paths_to_append: List[str]) -> bytes:
+    try:
+        # Hauptdokument als Ganzes übernehmen statt es durch die Seiten-Merge-Logik zu schicken
+        pdf_writer = PdfWriter(clone_from=main_pdf_buffer)
+    except TypeError: # pypdf/PyPDF2-Versionen ohne clone_from
+        main_pdf_buffer.seek(0)
+        pdf_writer = PdfWriter()
+        _append_pdf_to_writer(pdf_writer, main_pdf_buffer)
+    for source_reader in _load_source_pdfs(paths_to_append):
+        try:
+            _append_pdf_to_writer(pdf_writer, source_reader)
+        except Exception as e_append_ds:
+            pass
     final_buffer = io.BytesIO()
     try:
         pdf_writer.write(final_buffer)
-        final_pdf_bytes = final_buffer.getvalue()
-        return final_pdf_bytes
-    except Exception as e_write_final:
-        return main_pdf_bytes 
+        return final_buffer.getvalue()
     finally:
         final_buffer.close()
 
 def _create_plaintext_pdf_fallback(project_data: Dict[str, Any], analysis_results: Optional[Dict[str, Any]], texts: Dict[str, str], company_info: Dict[str, Any], pdf_offer_title_template: str, pdf_cover_letter_text: str) -> bytes:
-    buffer_fallback = io.StringIO()
-    buffer_fallback.write(f"{get_text(texts, 'pdf_plaintext_title_pdf', 'PV-Angebot (Textversion)')}\n{'='*40}\n\n")
+    parts: List[str] = []
+    parts.append(f"{get_text(texts, 'pdf_plaintext_title_pdf', 'PV-Angebot (Textversion)')}\n{'='*40}\n\n")
     customer_fb = project_data.get("customer_data", {})
     calc_res_fb = analysis_results if isinstance(analysis_results, dict) else {}
-    buffer_fallback.write(f"{get_text(texts, 'pdf_offer_title_label_fb', 'Angebotstitel')}: {pdf_offer_title_template}\n")
-    buffer_fallback.write(f"{get_text(texts, 'pdf_date_label_fb', 'Datum')}: {datetime.now().strftime('%d.%m.%Y')}\n\n")
-    buffer_fallback.write(f"{get_text(texts, 'pdf_company_label_fb', 'Firma')}: {company_info.get('name', 'N/A')}\n")
+    parts.append(f"{get_text(texts, 'pdf_offer_title_label_fb', 'Angebotstitel')}: {pdf_offer_title_template}\n")
+    parts.append(f"{get_text(texts, 'pdf_date_label_fb', 'Datum')}: {datetime.now().strftime('%d.%m.%Y')}\n\n")
+    parts.append(f"{get_text(texts, 'pdf_company_label_fb', 'Firma')}: {company_info.get('name', 'N/A')}\n")
     anschreiben_fb = _replace_placeholders(pdf_cover_letter_text, customer_fb, company_info, "FALLBACK_NR", texts, calc_res_fb)
-    buffer_fallback.write(f"\n{get_text(texts, 'pdf_cover_letter_label_fb', 'Anschreiben')}:\n{anschreiben_fb}\n\n")
-    buffer_fallback.write(f"\n--- {get_text(texts, 'pdf_section_title_overview_fb', 'Projektübersicht')} ---\n")
+    parts.append(f"\n{get_text(texts, 'pdf_cover_letter_label_fb', 'Anschreiben')}:\n{anschreiben_fb}\n\n")
+    parts.append(f"\n--- {get_text(texts, 'pdf_section_title_overview_fb', 'Projektübersicht')} ---\n")
     anlage_kwp_fb_val = calc_res_fb.get('anlage_kwp')
-    buffer_fallback.write(f"{get_text(texts, 'anlage_size_label_pdf_fb', 'Anlagengröße')}: {format_kpi_value(anlage_kwp_fb_val, 'kWp', texts_dict=texts, na_text_key='value_not_available_short_pdf')}\n")
-    buffer_fallback.write(f"\n({get_text(texts, 'pdf_plaintext_fallback_note', 'Dies ist eine vereinfachte Textversion des Angebots aufgrund eines Fehlers bei der PDF-Erstellung.')})\n")
-    return buffer_fallback.getvalue().encode('utf-8')
+    parts.append(f"{get_text(texts, 'anlage_size_label_pdf_fb', 'Anlagengröße')}: {format_kpi_value(anlage_kwp_fb_val, 'kWp', texts_dict=texts, na_text_key='value_not_available_short_pdf')}\n")
+    parts.append(f"\n({get_text(texts, 'pdf_plaintext_fallback_note', 'Dies ist eine vereinfachte Textversion des Angebots aufgrund eines Fehlers bei der PDF-Erstellung.')})\n")
+    return "".join(parts).encode('utf-8')
 
 # Änderungshistorie
 # 2025-06-03, Gemini Ultra: PageNumCanvas.save() korrigiert, um Duplizierung des PDF-Inhalts zu verhindern.
@@ -9,8 +9,12 @@ Datum: 2025-06-03
 # Modul für die Angebotsausgabe (PDF)
 
 import streamlit as st
-from typing import Dict, Any, Optional, List, Callable
+from typing import Dict, Any, Optional, List, Callable, Tuple
 import base64
+import hashlib
+import logging
+import secrets
+import tempfile
 import traceback
 import os
 
@@ -42,12 +46,122 @@ try:
 except (ImportError, ModuleNotFoundError): pass
 except Exception: pass
 
+# PV-Visuals exportieren ihre PNGs erst bei Bedarf (vorgemerkt unter pv_visuals.PENDING_EXPORTS_KEY_PV_VIZ)
+_PV_VIZ_PENDING_KEY = "pv_visuals_pending_chart_exports"
+def _dummy_export_pending_pv_visuals_charts(analysis_results: Dict[str, Any]) -> int: return 0
+_export_pending_pv_visuals_charts_safe = _dummy_export_pending_pv_visuals_charts
+try:
+    from pv_visuals import PENDING_EXPORTS_KEY_PV_VIZ as _PV_VIZ_PENDING_KEY, export_pending_pv_visuals_charts
+    _export_pending_pv_visuals_charts_safe = export_pending_pv_visuals_charts
+except (ImportError, ModuleNotFoundError): pass
+except Exception: pass
+
+# Diagramm-Schlüssel -> (Text-Key, Fallback) für die PDF-Diagrammauswahl; Reihenfolge = Anzeigereihenfolge
+_CHART_KEY_TO_TEXT_KEY: Tuple[Tuple[str, str, str], ...] = (
+    ('monthly_prod_cons_chart_bytes', 'pdf_chart_label_monthly_compare', "Monatl. Produktion/Verbrauch (2D)"),
+    ('cost_projection_chart_bytes', 'pdf_chart_label_cost_projection', "Stromkosten-Hochrechnung (2D)"),
+    ('cumulative_cashflow_chart_bytes', 'pdf_chart_label_cum_cashflow', "Kumulierter Cashflow (2D)"),
+    ('consumption_coverage_pie_chart_bytes', 'pdf_chart_label_consum_coverage_pie', "Verbrauchsdeckung (Kreis)"),
+    ('pv_usage_pie_chart_bytes', 'pdf_chart_label_pv_usage_pie', "PV-Nutzung (Kreis)"),
+    ('daily_production_switcher_chart_bytes', 'pdf_chart_label_daily_3d', "Tagesproduktion (3D)"),
+    ('weekly_production_switcher_chart_bytes', 'pdf_chart_label_weekly_3d', "Wochenproduktion (3D)"),
+    ('yearly_production_switcher_chart_bytes', 'pdf_chart_label_yearly_3d_bar', "Jahresproduktion (3D-Balken)"),
+    ('project_roi_matrix_switcher_chart_bytes', 'pdf_chart_label_roi_matrix_3d', "Projektrendite-Matrix (3D)"),
+    ('feed_in_revenue_switcher_chart_bytes', 'pdf_chart_label_feedin_3d', "Einspeisevergütung (3D)"),
+    ('prod_vs_cons_switcher_chart_bytes', 'pdf_chart_label_prodcons_3d', "Verbr. vs. Prod. (3D)"),
+    ('tariff_cube_switcher_chart_bytes', 'pdf_chart_label_tariffcube_3d', "Tarifvergleich (3D)"),
+    ('co2_savings_value_switcher_chart_bytes', 'pdf_chart_label_co2value_3d', "CO2-Ersparnis vs. Wert (3D)"),
+    ('investment_value_switcher_chart_bytes', 'pdf_chart_label_investval_3D', "Investitionsnutzwert (3D)"),
+    ('storage_effect_switcher_chart_bytes', 'pdf_chart_label_storageeff_3d', "Speicherwirkung (3D)"),
+    ('selfuse_stack_switcher_chart_bytes', 'pdf_chart_label_selfusestack_3d', "Eigenverbr. vs. Einspeis. (3D)"),
+    ('cost_growth_switcher_chart_bytes', 'pdf_chart_label_costgrowth_3d', "Stromkostensteigerung (3D)"),
+    ('selfuse_ratio_switcher_chart_bytes', 'pdf_chart_label_selfuseratio_3d', "Eigenverbrauchsgrad (3D)"),
+    ('roi_comparison_switcher_chart_bytes', 'pdf_chart_label_roicompare_3d', "ROI-Vergleich (3D)"),
+    ('scenario_comparison_switcher_chart_bytes', 'pdf_chart_label_scenariocomp_3d', "Szenarienvergleich (3D)"),
+    ('tariff_comparison_switcher_chart_bytes', 'pdf_chart_label_tariffcomp_3d', "Vorher/Nachher Stromkosten (3D)"),
+    ('income_projection_switcher_chart_bytes', 'pdf_chart_label_incomeproj_3d', "Einnahmenprognose (3D)"),
+    ('yearly_production_chart_bytes', 'pdf_chart_label_pvvis_yearly', "PV Visuals: Jahresproduktion"),
+    ('break_even_chart_bytes', 'pdf_chart_label_pvvis_breakeven', "PV Visuals: Break-Even"),
+    ('amortisation_chart_bytes', 'pdf_chart_label_pvvis_amort', "PV Visuals: Amortisation"),
+)
+
 # --- Hilfsfunktionen ---
+def _decode_title_image(image_b64: str) -> Optional[bytes]:
+    try:
+        if image_b64.startswith('data:image'): image_b64 = image_b64.split(',', 1)[1]
+        return base64.b64decode(image_b64)
+    except Exception: return None # Generator dekodiert dann selbst bzw. meldet "Bild nicht verfügbar"
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_pdf_templates(_load_fn: Callable[[str, Any], Any]):
+    # Vorlagen (inkl. großer Base64-Titelbilder) nicht bei jedem Rerun neu aus der Admin-DB laden/dekodieren.
+    # _load_fn mit Unterstrich -> wird von Streamlit nicht gehasht. Invalidierung über clear_pdf_template_cache().
+    title_image_templates = _load_fn('pdf_title_image_templates', [])
+    offer_title_templates = _load_fn('pdf_offer_title_templates', [])
+    cover_letter_templates = _load_fn('pdf_cover_letter_templates', [])
+    if not isinstance(title_image_templates, list): title_image_templates = []
+    if not isinstance(offer_title_templates, list): offer_title_templates = []
+    if not isinstance(cover_letter_templates, list): cover_letter_templates = []
+    # SHA-256 je Titelbild einmal beim Laden: der PDF-Generator verwendet den Digest als Bild-Cache-Schlüssel, statt die
+    # (oft mehrere MB großen) Base64-Daten bei jeder Erstellung erneut zu hashen. Dekodiert wird nur das gewählte Bild beim
+    # Erstellen; dekodierte Bytes im Cache-Ergebnis würden bei jedem Rerun als zweite Kopie mit entpickelt.
+    title_image_templates = [
+        dict(t, _sha=hashlib.sha256(t['data'].encode('ascii', 'ignore')).digest()) if isinstance(t, dict) and isinstance(t.get('data'), str) else t
+        for t in title_image_templates
+    ]
+    return title_image_templates, offer_title_templates, cover_letter_templates
+
+def _template_name_index(templates: List[Any]) -> Dict[str, int]:
+    return {t['name']: i for i, t in enumerate(templates) if isinstance(t, dict) and t.get('name')}
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _load_pdf_template_indexes(_load_fn: Callable[[str, Any], Any]) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int]]:
+    # Name -> Listenposition je Vorlagentyp; die Auswahlfelder brauchen nur die Namen, Daten/Texte werden erst beim Erstellen geholt
+    title_image_templates, offer_title_templates, cover_letter_templates = _load_pdf_templates(_load_fn)
+    return _template_name_index(title_image_templates), _template_name_index(offer_title_templates), _template_name_index(cover_letter_templates)
+
+def _template_field(templates: List[Any], name_index: Dict[str, int], name: Optional[str], field: str) -> Any:
+    idx = name_index.get(name) if name is not None else None
+    return templates[idx].get(field) if idx is not None else None
+
+def clear_pdf_template_cache() -> None:
+    _load_pdf_templates.clear()
+    _load_pdf_template_indexes.clear()
+
+@st.cache_data(ttl=120, show_spinner=False)
+def _list_company_docs_cached(_list_fn: Callable[[int, Optional[str]], List[Dict[str, Any]]], company_id: int) -> List[Dict[str, Any]]:
+    # Eine DB-Abfrage pro Firmenwechsel statt pro Checkbox-Klick; Invalidierung über clear_company_docs_cache()
+    return _list_fn(company_id, None)
+
+def clear_company_docs_cache() -> None:
+    _list_company_docs_cached.clear()
+
+@st.cache_resource(show_spinner=False)
+def _pdf_download_dir() -> tempfile.TemporaryDirectory:
+    # Ein Temp-Verzeichnis pro Prozess für erzeugte PDFs; wird beim Beenden automatisch entfernt
+    return tempfile.TemporaryDirectory(prefix="pdf_ui_downloads_")
+
+def _write_pdf_download_file(pdf_bytes: bytes) -> str:
+    # Vorherige Datei dieser Sitzung entfernen, damit pro Nutzer höchstens ein PDF auf der Platte liegt
+    previous_path = st.session_state.pop('pdf_download_last_path_v1', None)
+    if previous_path:
+        try: os.remove(previous_path)
+        except OSError: pass
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir=_pdf_download_dir().name) as pdf_file: pdf_file.write(pdf_bytes)
+    st.session_state.pdf_download_last_path_v1 = pdf_file.name
+    return pdf_file.name
+
 def get_text_pdf_ui(texts_dict: Dict[str, str], key: str, fallback_text: Optional[str] = None) -> str:
     if not isinstance(texts_dict, dict):
         return fallback_text if fallback_text is not None else key.replace("_", " ").title() + " (Texte fehlen)"
     return texts_dict.get(key, fallback_text if fallback_text is not None else key.replace("_", " ").title() + " (Text-Key fehlt)")
 
+def _minimal_ok(project_data: Optional[Dict[str, Any]]) -> bool:
+    # Module (ID oder Name), Wechselrichter (ID oder Name) und Modulanzahl müssen vorhanden sein
+    if not project_data or not isinstance(project_data, dict): return False
+    pdet = project_data.get('project_details') or {}
+    return bool(pdet.get('module_quantity') and (pdet.get('selected_module_id') or pdet.get('selected_module_name')) and (pdet.get('selected_inverter_id') or pdet.get('selected_inverter_name')))
+
 # --- Haupt-Render-Funktion für die PDF UI ---
 def render_pdf_ui(
     texts: Dict[str, str],
@@ -61,25 +175,21 @@ def render_pdf_ui(
     db_list_company_documents_func: Callable[[int, Optional[str]], List[Dict[str, Any]]] = _dummy_list_company_documents
 ):
     # ... (Rest der Funktion bleibt wie in der vorherigen Antwort bis zum if submitted_generate_pdf Block) ...
-    st.header(get_text_pdf_ui(texts, "menu_item_doc_output", "Angebotsausgabe (PDF)"))
+    # Texte einmal binden: alle Aufrufe unten haben einen Fallback, daher genügt dict.get ohne isinstance-Prüfung je Label
+    _t: Callable[[str, str], str] = texts.get if isinstance(texts, dict) else (lambda key, fallback_text=None: get_text_pdf_ui(texts, key, fallback_text))
+    st.header(_t("menu_item_doc_output", "Angebotsausgabe (PDF)"))
 
     if 'pdf_generating_lock_v1' not in st.session_state:
         st.session_state.pdf_generating_lock_v1 = False
 
-    minimal_data_ok = True
-    if not project_data or not isinstance(project_data, dict): project_data = {}; minimal_data_ok = False
-    customer_data_pdf = project_data.get('customer_data', {})
-    project_details_pdf = project_data.get('project_details', {})
-    if not (project_details_pdf.get('module_quantity') and \
-            (project_details_pdf.get('selected_module_id') or project_details_pdf.get('selected_module_name')) and \
-            (project_details_pdf.get('selected_inverter_id') or project_details_pdf.get('selected_inverter_name'))):
-        minimal_data_ok = False
-    if not minimal_data_ok:
-        st.info(get_text_pdf_ui(texts, "pdf_creation_minimal_data_missing_info", "Minimale Projektdaten (Module, Wechselrichter, Menge) für die PDF-Erstellung fehlen. Bitte vervollständigen Sie die Eingaben."))
+    # Früher Abbruch vor Firmen-Lookup und Vorlagen-Laden
+    if not _minimal_ok(project_data):
+        st.info(_t("pdf_creation_minimal_data_missing_info", "Minimale Projektdaten (Module, Wechselrichter, Menge) für die PDF-Erstellung fehlen. Bitte vervollständigen Sie die Eingaben."))
         return
+    customer_data_pdf = project_data.get('customer_data') or {}
     if not analysis_results or not isinstance(analysis_results, dict):
         analysis_results = {} 
-        st.info(get_text_pdf_ui(texts, "pdf_creation_no_analysis_for_pdf_info", "Analyseergebnisse sind unvollständig oder nicht vorhanden. Einige PDF-Inhalte könnten fehlen."))
+        st.info(_t("pdf_creation_no_analysis_for_pdf_info", "Analyseergebnisse sind unvollständig oder nicht vorhanden. Einige PDF-Inhalte könnten fehlen."))
 
     active_company = get_active_company_details_func()
     company_info_for_pdf = {}
@@ -94,21 +204,15 @@ def render_pdf_ui(
         st.warning("Keine aktive Firma ausgewählt. PDF verwendet Fallback-Daten für Firmeninformationen."); company_info_for_pdf = {"name": "Ihre Firma (Fallback)"}; active_company_id_for_docs = 0
 
     try:
-        title_image_templates = load_admin_setting_func('pdf_title_image_templates', [])
-        offer_title_templates = load_admin_setting_func('pdf_offer_title_templates', [])
-        cover_letter_templates = load_admin_setting_func('pdf_cover_letter_templates', [])
-        if not isinstance(title_image_templates, list): title_image_templates = []
-        if not isinstance(offer_title_templates, list): offer_title_templates = []
-        if not isinstance(cover_letter_templates, list): cover_letter_templates = []
+        title_image_templates, offer_title_templates, cover_letter_templates = _load_pdf_templates(load_admin_setting_func)
+        title_image_index, offer_title_index, cover_letter_index = _load_pdf_template_indexes(load_admin_setting_func)
     except Exception as e_load_tpl:
-        st.error(f"Fehler Laden PDF-Vorlagen: {e_load_tpl}"); title_image_templates, offer_title_templates, cover_letter_templates = [], [], []
+        st.error(f"Fehler Laden PDF-Vorlagen: {e_load_tpl}"); title_image_templates, offer_title_templates, cover_letter_templates = [], [], []; title_image_index, offer_title_index, cover_letter_index = {}, {}, {}
 
     if "selected_title_image_name_doc_output" not in st.session_state: st.session_state.selected_title_image_name_doc_output = None
-    if "selected_title_image_b64_data_doc_output" not in st.session_state: st.session_state.selected_title_image_b64_data_doc_output = None
     if "selected_offer_title_name_doc_output" not in st.session_state: st.session_state.selected_offer_title_name_doc_output = None
-    if "selected_offer_title_text_content_doc_output" not in st.session_state: st.session_state.selected_offer_title_text_content_doc_output = ""
     if "selected_cover_letter_name_doc_output" not in st.session_state: st.session_state.selected_cover_letter_name_doc_output = None
-    if "selected_cover_letter_text_content_doc_output" not in st.session_state: st.session_state.selected_cover_letter_text_content_doc_output = ""
+    # Im Session-State stehen nur die Vorlagennamen; Bilddaten/Texte werden erst beim Erstellen aus den (gecachten) Vorlagen geholt
 
     if 'pdf_inclusion_options' not in st.session_state:
         st.session_state.pdf_inclusion_options = {
@@ -120,158 +224,152 @@ def render_pdf_ui(
             "include_optional_component_details": True
         }
     if "pdf_selected_main_sections" not in st.session_state:
-         st.session_state.pdf_selected_main_sections = ["ProjectOverview", "TechnicalComponents", "CostDetails", "Economics", "SimulationDetails", "CO2Savings", "Visualizations", "FutureAspects"]
+         st.session_state.pdf_selected_main_sections = ("ProjectOverview", "TechnicalComponents", "CostDetails", "Economics", "SimulationDetails", "CO2Savings", "Visualizations", "FutureAspects")
 
     submit_button_disabled = st.session_state.pdf_generating_lock_v1
 
     with st.form(key="pdf_generation_form_v12_final_locked_options", clear_on_submit=False):
-        st.subheader(get_text_pdf_ui(texts, "pdf_config_header", "PDF-Konfiguration"))
+        st.subheader(_t("pdf_config_header", "PDF-Konfiguration"))
 
         with st.container(): # Vorlagenauswahl
-            st.markdown("**" + get_text_pdf_ui(texts, "pdf_template_selection_info", "Vorlagen für das Angebot auswählen") + "**")
-            title_image_options = {t.get('name', f"Bild {i+1}"): t.get('data') for i, t in enumerate(title_image_templates) if isinstance(t,dict) and t.get('name')}
-            if not title_image_options: title_image_options = {get_text_pdf_ui(texts, "no_title_images_available", "Keine Titelbilder verfügbar"): None}
-            title_image_keys = list(title_image_options.keys())
+            st.markdown("**" + _t("pdf_template_selection_info", "Vorlagen für das Angebot auswählen") + "**")
+            title_image_keys = list(title_image_index) or [_t("no_title_images_available", "Keine Titelbilder verfügbar")]
             idx_title_img = 0
             if st.session_state.selected_title_image_name_doc_output in title_image_keys: idx_title_img = title_image_keys.index(st.session_state.selected_title_image_name_doc_output)
             elif title_image_keys: st.session_state.selected_title_image_name_doc_output = title_image_keys[0] 
-            selected_title_image_name = st.selectbox(get_text_pdf_ui(texts, "pdf_select_title_image", "Titelbild auswählen"), options=title_image_keys, index=idx_title_img, key="pdf_title_image_select_v12_form")
+            selected_title_image_name = st.selectbox(_t("pdf_select_title_image", "Titelbild auswählen"), options=title_image_keys, index=idx_title_img, key="pdf_title_image_select_v12_form")
             st.session_state.selected_title_image_name_doc_output = selected_title_image_name
-            st.session_state.selected_title_image_b64_data_doc_output = title_image_options.get(selected_title_image_name)
 
-            offer_title_options = {t.get('name', f"Titel {i+1}"): t.get('content') for i, t in enumerate(offer_title_templates) if isinstance(t,dict) and t.get('name')}
-            if not offer_title_options: offer_title_options = {get_text_pdf_ui(texts, "no_offer_titles_available", "Keine Angebotstitel verfügbar"): "Standard Angebotstitel"}
-            offer_title_keys = list(offer_title_options.keys())
+            offer_title_keys = list(offer_title_index) or [_t("no_offer_titles_available", "Keine Angebotstitel verfügbar")]
             idx_offer_title = 0
             if st.session_state.selected_offer_title_name_doc_output in offer_title_keys: idx_offer_title = offer_title_keys.index(st.session_state.selected_offer_title_name_doc_output)
             elif offer_title_keys: st.session_state.selected_offer_title_name_doc_output = offer_title_keys[0]
-            selected_offer_title_name = st.selectbox(get_text_pdf_ui(texts, "pdf_select_offer_title", "Überschrift/Titel auswählen"), options=offer_title_keys, index=idx_offer_title, key="pdf_offer_title_select_v12_form")
+            selected_offer_title_name = st.selectbox(_t("pdf_select_offer_title", "Überschrift/Titel auswählen"), options=offer_title_keys, index=idx_offer_title, key="pdf_offer_title_select_v12_form")
             st.session_state.selected_offer_title_name_doc_output = selected_offer_title_name
-            st.session_state.selected_offer_title_text_content_doc_output = offer_title_options.get(selected_offer_title_name, "")
 
-            cover_letter_options = {t.get('name', f"Anschreiben {i+1}"): t.get('content') for i, t in enumerate(cover_letter_templates) if isinstance(t,dict) and t.get('name')}
-            if not cover_letter_options: cover_letter_options = {get_text_pdf_ui(texts, "no_cover_letters_available", "Keine Anschreiben verfügbar"): "Standard Anschreiben"}
-            cover_letter_keys = list(cover_letter_options.keys())
+            cover_letter_keys = list(cover_letter_index) or [_t("no_cover_letters_available", "Keine Anschreiben verfügbar")]
             idx_cover_letter = 0
             if st.session_state.selected_cover_letter_name_doc_output in cover_letter_keys: idx_cover_letter = cover_letter_keys.index(st.session_state.selected_cover_letter_name_doc_output)
             elif cover_letter_keys: st.session_state.selected_cover_letter_name_doc_output = cover_letter_keys[0]
-            selected_cover_letter_name = st.selectbox(get_text_pdf_ui(texts, "pdf_select_cover_letter", "Anschreiben auswählen"), options=cover_letter_keys, index=idx_cover_letter, key="pdf_cover_letter_select_v12_form")
+            selected_cover_letter_name = st.selectbox(_t("pdf_select_cover_letter", "Anschreiben auswählen"), options=cover_letter_keys, index=idx_cover_letter, key="pdf_cover_letter_select_v12_form")
             st.session_state.selected_cover_letter_name_doc_output = selected_cover_letter_name
-            st.session_state.selected_cover_letter_text_content_doc_output = cover_letter_options.get(selected_cover_letter_name, "")
         st.markdown("---")
 
-        st.markdown("**" + get_text_pdf_ui(texts, "pdf_content_selection_info", "Inhalte für das PDF auswählen") + "**")
-        col_pdf_content1, col_pdf_content2, col_pdf_content3 = st.columns(3)
+        st.markdown("**" + _t("pdf_content_selection_info", "Inhalte für das PDF auswählen") + "**")
+        # Tabs statt drei Spalten: zusammen mit den Multiselects bleibt die Zahl der Widgets pro Rerun klein
+        tab_pdf_branding, tab_pdf_sections, tab_pdf_charts = st.tabs([
+            _t("pdf_options_column_branding", "Branding & Dokumente"),
+            _t("pdf_options_column_main_sections", "Hauptsektionen"),
+            _t("pdf_options_column_charts", "Diagramme & Visualisierungen"),
+        ])
 
-        with col_pdf_content1:
-            st.markdown("**" + get_text_pdf_ui(texts, "pdf_options_column_branding", "Branding & Dokumente") + "**")
-            st.session_state.pdf_inclusion_options["include_company_logo"] = st.checkbox(get_text_pdf_ui(texts, "pdf_include_company_logo_label", "Firmenlogo anzeigen?"), value=st.session_state.pdf_inclusion_options.get("include_company_logo", True), key="pdf_cb_logo_v12_form")
-            st.session_state.pdf_inclusion_options["include_product_images"] = st.checkbox(get_text_pdf_ui(texts, "pdf_include_product_images_label", "Produktbilder anzeigen? (Haupt & Zubehör)"), value=st.session_state.pdf_inclusion_options.get("include_product_images", True), key="pdf_cb_prod_img_v12_form")
-            st.session_state.pdf_inclusion_options["include_optional_component_details"] = st.checkbox(get_text_pdf_ui(texts, "pdf_include_optional_component_details_label", "Details zu optionalen Komponenten anzeigen?"), value=st.session_state.pdf_inclusion_options.get("include_optional_component_details", True), key="pdf_cb_opt_comp_details_v12_form")
-            st.session_state.pdf_inclusion_options["include_all_documents"] = st.checkbox(get_text_pdf_ui(texts, "pdf_include_product_datasheets_label", "Datenblätter (Haupt & Zubehör) & Firmendokumente anhängen?"), value=st.session_state.pdf_inclusion_options.get("include_all_documents", False), key="pdf_cb_all_docs_v12_form")
+        # Widget-Werte nur in lokalen Variablen sammeln; pdf_inclusion_options wird erst beim Absenden als Ganzes neu geschrieben
+        inclusion_opts_state = st.session_state.pdf_inclusion_options
+        with tab_pdf_branding:
+            inc_logo = st.checkbox(_t("pdf_include_company_logo_label", "Firmenlogo anzeigen?"), value=inclusion_opts_state.get("include_company_logo", True), key="pdf_cb_logo_v12_form")
+            inc_prod_img = st.checkbox(_t("pdf_include_product_images_label", "Produktbilder anzeigen? (Haupt & Zubehör)"), value=inclusion_opts_state.get("include_product_images", True), key="pdf_cb_prod_img_v12_form")
+            inc_opt_details = st.checkbox(_t("pdf_include_optional_component_details_label", "Details zu optionalen Komponenten anzeigen?"), value=inclusion_opts_state.get("include_optional_component_details", True), key="pdf_cb_opt_comp_details_v12_form")
+            inc_all_docs = st.checkbox(_t("pdf_include_product_datasheets_label", "Datenblätter (Haupt & Zubehör) & Firmendokumente anhängen?"), value=inclusion_opts_state.get("include_all_documents", False), key="pdf_cb_all_docs_v12_form")
 
-            st.markdown("**" + get_text_pdf_ui(texts, "pdf_options_select_company_docs", "Zusätzliche Firmendokumente") + "**")
-            selected_doc_ids_for_pdf_temp_ui_col1 = []
+            st.markdown("**" + _t("pdf_options_select_company_docs", "Zusätzliche Firmendokumente") + "**")
+            selected_doc_ids_col1 = inclusion_opts_state.get("company_document_ids_to_include", []) # Unverändert, falls keine Auswahl angezeigt wird
             if active_company_id_for_docs is not None and isinstance(active_company_id_for_docs, int):
-                company_docs_list = db_list_company_documents_func(active_company_id_for_docs, None)
+                company_docs_list = _list_company_docs_cached(db_list_company_documents_func, active_company_id_for_docs)
                 if company_docs_list:
-                    for doc_item in company_docs_list:
-                        if isinstance(doc_item, dict) and 'id' in doc_item:
-                            doc_id_item = doc_item['id']
-                            doc_label_item = f"{doc_item.get('display_name', doc_item.get('file_name', 'Unbenannt'))} ({doc_item.get('document_type')})"
-                            is_doc_checked_by_default_col1 = doc_id_item in st.session_state.pdf_inclusion_options.get("company_document_ids_to_include", [])
-                            if st.checkbox(doc_label_item, value=is_doc_checked_by_default_col1, key=f"pdf_cb_company_doc_{doc_id_item}_v12_form"):
-                                if doc_id_item not in selected_doc_ids_for_pdf_temp_ui_col1: selected_doc_ids_for_pdf_temp_ui_col1.append(doc_id_item)
-                    st.session_state.pdf_inclusion_options["company_document_ids_to_include"] = selected_doc_ids_for_pdf_temp_ui_col1
-                else: st.caption(get_text_pdf_ui(texts, "pdf_no_company_documents_available", "Keine spezifischen Dokumente für diese Firma hinterlegt."))
-            else: st.caption(get_text_pdf_ui(texts, "pdf_select_active_company_for_docs", "Aktive Firma nicht korrekt für Dokumentenauswahl gesetzt."))
-
-        with col_pdf_content2:
-            st.markdown("**" + get_text_pdf_ui(texts, "pdf_options_column_main_sections", "Hauptsektionen") + "**")
+                    doc_labels_col1 = {
+                        doc_item['id']: f"{doc_item.get('display_name', doc_item.get('file_name', 'Unbenannt'))} ({doc_item.get('document_type')})"
+                        for doc_item in company_docs_list if isinstance(doc_item, dict) and 'id' in doc_item
+                    }
+                    # Ein Auswahl-Widget statt einer Checkbox pro Dokument
+                    selected_doc_ids_col1 = st.multiselect(
+                        _t("pdf_select_company_docs", "Dokumente auswählen"), options=list(doc_labels_col1),
+                        default=[d for d in selected_doc_ids_col1 if d in doc_labels_col1],
+                        format_func=lambda d: doc_labels_col1.get(d, str(d)), key="pdf_company_docs_multiselect_v13_form"
+                    )
+                else: st.caption(_t("pdf_no_company_documents_available", "Keine spezifischen Dokumente für diese Firma hinterlegt."))
+            else: st.caption(_t("pdf_select_active_company_for_docs", "Aktive Firma nicht korrekt für Dokumentenauswahl gesetzt."))
+
+        with tab_pdf_sections:
             default_pdf_sections_map = {
-                "ProjectOverview": get_text_pdf_ui(texts, "pdf_section_title_projectoverview", "1. Projektübersicht"),
-                "TechnicalComponents": get_text_pdf_ui(texts, "pdf_section_title_technicalcomponents", "2. Systemkomponenten"),
-                "CostDetails": get_text_pdf_ui(texts, "pdf_section_title_costdetails", "3. Kostenaufstellung"),
-                "Economics": get_text_pdf_ui(texts, "pdf_section_title_economics", "4. Wirtschaftlichkeit"),
-                "SimulationDetails": get_text_pdf_ui(texts, "pdf_section_title_simulationdetails", "5. Simulation"),
-                "CO2Savings": get_text_pdf_ui(texts, "pdf_section_title_co2savings", "6. CO₂-Einsparung"),
-                "Visualizations": get_text_pdf_ui(texts, "pdf_section_title_visualizations", "7. Grafiken"),
-                "FutureAspects": get_text_pdf_ui(texts, "pdf_section_title_futureaspects", "8. Zukunftsaspekte")
+                "ProjectOverview": _t("pdf_section_title_projectoverview", "1. Projektübersicht"),
+                "TechnicalComponents": _t("pdf_section_title_technicalcomponents", "2. Systemkomponenten"),
+                "CostDetails": _t("pdf_section_title_costdetails", "3. Kostenaufstellung"),
+                "Economics": _t("pdf_section_title_economics", "4. Wirtschaftlichkeit"),
+                "SimulationDetails": _t("pdf_section_title_simulationdetails", "5. Simulation"),
+                "CO2Savings": _t("pdf_section_title_co2savings", "6. CO₂-Einsparung"),
+                "Visualizations": _t("pdf_section_title_visualizations", "7. Grafiken"),
+                "FutureAspects": _t("pdf_section_title_futureaspects", "8. Zukunftsaspekte")
             }
-            temp_selected_main_sections_ui_col2 = []
-            current_selected_in_state_col2 = st.session_state.get("pdf_selected_main_sections", list(default_pdf_sections_map.keys()))
-            for section_key, section_label_from_map in default_pdf_sections_map.items():
-                is_section_checked_by_default_col2 = section_key in current_selected_in_state_col2
-                if st.checkbox(section_label_from_map, value=is_section_checked_by_default_col2, key=f"pdf_section_cb_{section_key}_v12_form"):
-                    if section_key not in temp_selected_main_sections_ui_col2: temp_selected_main_sections_ui_col2.append(section_key)
-            st.session_state.pdf_selected_main_sections = temp_selected_main_sections_ui_col2
-
-        with col_pdf_content3:
-            st.markdown("**" + get_text_pdf_ui(texts, "pdf_options_column_charts", "Diagramme & Visualisierungen") + "**")
-            selected_chart_keys_for_pdf_ui_col3 = []
+            current_selected_in_state_col2 = st.session_state.get("pdf_selected_main_sections", tuple(default_pdf_sections_map))
+            selected_sections_set_col2 = set(st.multiselect(
+                _t("pdf_select_main_sections", "Sektionen auswählen"), options=list(default_pdf_sections_map),
+                default=[k for k in current_selected_in_state_col2 if k in default_pdf_sections_map],
+                format_func=lambda k: default_pdf_sections_map.get(k, k), key="pdf_sections_multiselect_v13_form"
+            ))
+            # Unveränderliches Tupel in Anzeigereihenfolge (unabhängig von der Klickreihenfolge) -> beim Absenden keine Kopie nötig
+            selected_sections_col2 = tuple(k for k in default_pdf_sections_map if k in selected_sections_set_col2)
+
+        with tab_pdf_charts:
+            selected_chart_keys_for_pdf_ui_col3: tuple = ()
             if analysis_results and isinstance(analysis_results, dict):
-                chart_key_to_friendly_name_map = {
-                    'monthly_prod_cons_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_monthly_compare", "Monatl. Produktion/Verbrauch (2D)"),
-                    'cost_projection_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_cost_projection", "Stromkosten-Hochrechnung (2D)"),
-                    'cumulative_cashflow_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_cum_cashflow", "Kumulierter Cashflow (2D)"),
-                    'consumption_coverage_pie_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_consum_coverage_pie", "Verbrauchsdeckung (Kreis)"),
-                    'pv_usage_pie_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_pv_usage_pie", "PV-Nutzung (Kreis)"),
-                    'daily_production_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_daily_3d", "Tagesproduktion (3D)"),
-                    'weekly_production_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_weekly_3d", "Wochenproduktion (3D)"),
-                    'yearly_production_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_yearly_3d_bar", "Jahresproduktion (3D-Balken)"),
-                    'project_roi_matrix_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_roi_matrix_3d", "Projektrendite-Matrix (3D)"),
-                    'feed_in_revenue_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_feedin_3d", "Einspeisevergütung (3D)"),
-                    'prod_vs_cons_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_prodcons_3d", "Verbr. vs. Prod. (3D)"),
-                    'tariff_cube_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_tariffcube_3d", "Tarifvergleich (3D)"),
-                    'co2_savings_value_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_co2value_3d", "CO2-Ersparnis vs. Wert (3D)"),
-                    'investment_value_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_investval_3D", "Investitionsnutzwert (3D)"),
-                    'storage_effect_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_storageeff_3d", "Speicherwirkung (3D)"),
-                    'selfuse_stack_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_selfusestack_3d", "Eigenverbr. vs. Einspeis. (3D)"),
-                    'cost_growth_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_costgrowth_3d", "Stromkostensteigerung (3D)"),
-                    'selfuse_ratio_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_selfuseratio_3d", "Eigenverbrauchsgrad (3D)"),
-                    'roi_comparison_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_roicompare_3d", "ROI-Vergleich (3D)"),
-                    'scenario_comparison_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_scenariocomp_3d", "Szenarienvergleich (3D)"),
-                    'tariff_comparison_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_tariffcomp_3d", "Vorher/Nachher Stromkosten (3D)"),
-                    'income_projection_switcher_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_incomeproj_3d", "Einnahmenprognose (3D)"),
-                    'yearly_production_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_pvvis_yearly", "PV Visuals: Jahresproduktion"),
-                    'break_even_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_pvvis_breakeven", "PV Visuals: Break-Even"),
-                    'amortisation_chart_bytes': get_text_pdf_ui(texts, "pdf_chart_label_pvvis_amort", "PV Visuals: Amortisation"),
-                }
+                chart_key_to_friendly_name_map = {chart_key: get_text_pdf_ui(texts, text_key, fallback) for chart_key, text_key, fallback in _CHART_KEY_TO_TEXT_KEY}
                 available_chart_keys = [k for k in analysis_results.keys() if k.endswith('_chart_bytes') and analysis_results[k] is not None]
-                ordered_display_keys = [k_map for k_map in chart_key_to_friendly_name_map.keys() if k_map in available_chart_keys]
-                for k_avail in available_chart_keys:
-                    if k_avail not in ordered_display_keys: ordered_display_keys.append(k_avail)
-
-                current_selected_charts_in_state = st.session_state.pdf_inclusion_options.get("selected_charts_for_pdf", [])
-                for chart_key in ordered_display_keys:
-                    friendly_name = chart_key_to_friendly_name_map.get(chart_key, chart_key.replace('_chart_bytes', '').replace('_', ' ').title())
-                    is_selected_by_default = chart_key in current_selected_charts_in_state
-                    if st.checkbox(friendly_name, value=is_selected_by_default, key=f"pdf_include_chart_{chart_key}_v12_form"):
-                        if chart_key not in selected_chart_keys_for_pdf_ui_col3: selected_chart_keys_for_pdf_ui_col3.append(chart_key)
+                # Vorgemerkte PV-Visuals-Diagramme sind auswählbar; exportiert werden sie erst beim Absenden
+                available_chart_keys.extend(k for k in (analysis_results.get(_PV_VIZ_PENDING_KEY) or {}) if k not in analysis_results)
+                # Bekannte Diagramme in Kartenreihenfolge, danach unbekannte in Ergebnisreihenfolge (Set-Lookups statt Listensuche)
+                available_chart_keys_set = set(available_chart_keys)
+                ordered_display_keys = [k_map for k_map in chart_key_to_friendly_name_map if k_map in available_chart_keys_set]
+                ordered_display_keys.extend(k_avail for k_avail in available_chart_keys if k_avail not in chart_key_to_friendly_name_map)
+
+                current_selected_charts_in_state = inclusion_opts_state.get("selected_charts_for_pdf", [])
+                # Ein Auswahl-Widget statt bis zu ~25 Checkboxen (je ein eigener Widget-State)
+                selected_charts_set_col3 = set(st.multiselect(
+                    _t("pdf_select_charts", "Diagramme auswählen"), options=ordered_display_keys,
+                    default=[k for k in current_selected_charts_in_state if k in available_chart_keys_set],
+                    format_func=lambda k: chart_key_to_friendly_name_map.get(k, k.replace('_chart_bytes', '').replace('_', ' ').title()),
+                    key="pdf_charts_multiselect_v13_form"
+                ))
+                # Diagramme erscheinen im PDF in Anzeigereihenfolge
+                selected_chart_keys_for_pdf_ui_col3 = tuple(k for k in ordered_display_keys if k in selected_charts_set_col3)
             else:
-                st.caption(get_text_pdf_ui(texts, "pdf_no_charts_to_select", "Keine Diagrammdaten für PDF-Auswahl."))
-            st.session_state.pdf_inclusion_options["selected_charts_for_pdf"] = selected_chart_keys_for_pdf_ui_col3
+                st.caption(_t("pdf_no_charts_to_select", "Keine Diagrammdaten für PDF-Auswahl."))
 
         st.markdown("---")
         submitted_generate_pdf = st.form_submit_button(
-            f"**{get_text_pdf_ui(texts, 'pdf_generate_button', 'Angebots-PDF erstellen')}**",
+            f"**{_t('pdf_generate_button', 'Angebots-PDF erstellen')}**",
             type="primary",
             disabled=submit_button_disabled
         )
 
     if submitted_generate_pdf and not st.session_state.pdf_generating_lock_v1:
         st.session_state.pdf_generating_lock_v1 = True 
+        # Ein atomarer Schreibvorgang für alle Optionen statt einzelner Session-State-Zuweisungen bei jedem Rerun
+        st.session_state.pdf_inclusion_options = {
+            "include_company_logo": inc_logo,
+            "include_product_images": inc_prod_img,
+            "include_all_documents": inc_all_docs,
+            "company_document_ids_to_include": list(selected_doc_ids_col1),
+            "selected_charts_for_pdf": selected_chart_keys_for_pdf_ui_col3,
+            "include_optional_component_details": inc_opt_details
+        }
+        st.session_state.pdf_selected_main_sections = selected_sections_col2
         pdf_bytes = None 
         try:
-            with st.spinner(get_text_pdf_ui(texts, 'pdf_generation_spinner', 'PDF wird generiert, bitte warten...')):
-                final_inclusion_options_to_pass = st.session_state.pdf_inclusion_options.copy()
-                final_sections_to_include_to_pass = st.session_state.pdf_selected_main_sections[:]
+            with st.spinner(_t('pdf_generation_spinner', 'PDF wird generiert, bitte warten...')):
+                if analysis_results and isinstance(analysis_results, dict) and analysis_results.get(_PV_VIZ_PENDING_KEY):
+                    _export_pending_pv_visuals_charts_safe(analysis_results)
+                final_inclusion_options_to_pass = st.session_state.pdf_inclusion_options # gerade neu aufgebaut, keine Kopie nötig
+                final_sections_to_include_to_pass = st.session_state.pdf_selected_main_sections # Tupel, keine Kopie nötig
+                selected_title_image_data = _template_field(title_image_templates, title_image_index, st.session_state.selected_title_image_name_doc_output, 'data')
+                if isinstance(selected_title_image_data, str): selected_title_image_data = _decode_title_image(selected_title_image_data) or selected_title_image_data
                 pdf_bytes = _generate_offer_pdf_safe(
                     project_data=project_data, analysis_results=analysis_results,
                     company_info=company_info_for_pdf, company_logo_base64=company_logo_b64_for_pdf,
-                    selected_title_image_b64=st.session_state.selected_title_image_b64_data_doc_output,
-                    selected_offer_title_text=st.session_state.selected_offer_title_text_content_doc_output,
-                    selected_cover_letter_text=st.session_state.selected_cover_letter_text_content_doc_output,
+                    # Bereits dekodierte Bytes übergeben (generate_offer_pdf akzeptiert str oder bytes)
+                    selected_title_image_b64=selected_title_image_data,
+                    selected_title_image_digest=_template_field(title_image_templates, title_image_index, st.session_state.selected_title_image_name_doc_output, '_sha'),
+                    selected_offer_title_text=(_template_field(offer_title_templates, offer_title_index, st.session_state.selected_offer_title_name_doc_output, 'content') if offer_title_index else "Standard Angebotstitel") or "",
+                    selected_cover_letter_text=(_template_field(cover_letter_templates, cover_letter_index, st.session_state.selected_cover_letter_name_doc_output, 'content') if cover_letter_index else "Standard Anschreiben") or "",
                     sections_to_include=final_sections_to_include_to_pass,
                     inclusion_options=final_inclusion_options_to_pass,
                     load_admin_setting_func=load_admin_setting_func, save_admin_setting_func=save_admin_setting_func,
@@ -279,33 +377,40 @@ def render_pdf_ui(
                     db_list_company_documents_func=db_list_company_documents_func,
                     active_company_id=active_company_id_for_docs, texts=texts
                 )
-            st.session_state.generated_pdf_bytes_for_download_v1 = pdf_bytes
+            # Nur den Pfad im Session-State halten statt der kompletten PDF-Bytes
+            st.session_state.generated_pdf_path_for_download_v1 = _write_pdf_download_file(pdf_bytes) if pdf_bytes and isinstance(pdf_bytes, bytes) else None
         except Exception as e_gen_final_outer:
-            st.error(f"{get_text_pdf_ui(texts, 'pdf_generation_exception_outer', 'Kritischer Fehler im PDF-Prozess (pdf_ui.py):')} {e_gen_final_outer}")
-            st.text_area("Traceback PDF Erstellung (pdf_ui.py):", traceback.format_exc(), height=250)
-            st.session_state.generated_pdf_bytes_for_download_v1 = None
+            st.error(f"{_t('pdf_generation_exception_outer', 'Kritischer Fehler im PDF-Prozess (pdf_ui.py):')} {e_gen_final_outer}")
+            # Traceback nur im Debug-Modus (Admin-Einstellung oder DANGEL_DEBUG) anzeigen, sonst nur ins Log
+            try: app_debug_mode_pdf_ui = load_admin_setting_func('app_debug_mode_enabled', False) is True
+            except Exception: app_debug_mode_pdf_ui = False
+            if app_debug_mode_pdf_ui or st.session_state.get('debug_mode') or os.environ.get('DANGEL_DEBUG'):
+                st.text_area("Traceback PDF Erstellung (pdf_ui.py):", traceback.format_exc(), height=250)
+            else: logging.getLogger(__name__).exception("PDF-Erstellung fehlgeschlagen")
+            st.session_state.generated_pdf_path_for_download_v1 = None
         finally:
             st.session_state.pdf_generating_lock_v1 = False 
             st.session_state.selected_page_key_sui = "doc_output" # KORREKTUR: Sicherstellen, dass Seite erhalten bleibt
-            st.rerun() 
+            # Kein st.rerun(): der Download-Block unten liest das Ergebnis noch im selben Skriptlauf
 
-    if 'generated_pdf_bytes_for_download_v1' in st.session_state:
-        pdf_bytes_to_download = st.session_state.pop('generated_pdf_bytes_for_download_v1') 
-        if pdf_bytes_to_download and isinstance(pdf_bytes_to_download, bytes):
+    if 'generated_pdf_path_for_download_v1' in st.session_state:
+        pdf_path_to_download = st.session_state.pop('generated_pdf_path_for_download_v1') 
+        if pdf_path_to_download and os.path.isfile(pdf_path_to_download):
             customer_name_for_file = customer_data_pdf.get('last_name', 'Angebot')
             if not customer_name_for_file or not str(customer_name_for_file).strip(): customer_name_for_file = "Photovoltaik_Angebot"
-            timestamp_file = base64.b32encode(os.urandom(5)).decode('utf-8').lower() 
+            timestamp_file = secrets.token_hex(4) # 8 Hex-Zeichen, eindeutig genug für Dateiname und Button-Key
             file_name = f"Angebot_{str(customer_name_for_file).replace(' ', '_')}_{timestamp_file}.pdf"
-            st.success(get_text_pdf_ui(texts, "pdf_generation_success", "PDF erfolgreich erstellt!"))
-            st.download_button(
-                label=get_text_pdf_ui(texts, "pdf_download_button", "PDF herunterladen"),
-                data=pdf_bytes_to_download,
-                file_name=file_name,
-                mime="application/pdf",
-                key=f"pdf_download_btn_final_{timestamp_file}" 
-            )
-        elif pdf_bytes_to_download is None and st.session_state.get('pdf_generating_lock_v1', True) is False : 
-             st.error(get_text_pdf_ui(texts, "pdf_generation_failed_no_bytes_after_rerun", "PDF-Generierung fehlgeschlagen (keine Daten nach Rerun)."))
+            st.success(_t("pdf_generation_success", "PDF erfolgreich erstellt!"))
+            with open(pdf_path_to_download, 'rb') as pdf_download_file:
+                st.download_button(
+                    label=_t("pdf_download_button", "PDF herunterladen"),
+                    data=pdf_download_file,
+                    file_name=file_name,
+                    mime="application/pdf",
+                    key=f"pdf_download_btn_final_{timestamp_file}" 
+                )
+        elif pdf_path_to_download is None and st.session_state.get('pdf_generating_lock_v1', True) is False : 
+             st.error(_t("pdf_generation_failed_no_bytes_after_rerun", "PDF-Generierung fehlgeschlagen (keine Daten nach Rerun)."))
 
 # Änderungshistorie
 # ... (vorherige Einträge)
@@ -5,9 +5,17 @@ from datetime import datetime
 import sqlite3
 import pandas as pd
 import json
-from typing import Dict, List, Optional, Any, Tuple, Union
+from typing import Dict, FrozenSet, Iterator, List, Optional, Any, Tuple, Union
 import traceback
 import os
+import queue
+import threading
+import warnings
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
+_LOG = logging.getLogger("product_db") # Lazy %-Formatierung; Erfolgsmeldungen pro Zeile nur auf DEBUG
 
 # Datenbankverbindung und Verfügbarkeitsstatus
 DB_AVAILABLE = False
@@ -15,22 +23,191 @@ get_db_connection_safe_pd = None
 
 try:
     from database import get_db_connection, init_db # init_db wird hier nicht direkt verwendet, aber Import ist ok
+    import database as _database_module_pd # Für den aktuellen DB_PATH des Verbindungspools
     get_db_connection_safe_pd = get_db_connection
     DB_AVAILABLE = True
 except ImportError as e:
     def _dummy_get_db_connection_ie(): # type: ignore
-        print(f"product_db.py: Importfehler für database.py: {e}. Dummy DB-Verbindung genutzt.")
+        _LOG.warning("product_db.py: Importfehler für database.py: %s. Dummy DB-Verbindung genutzt.", e)
         return None
     get_db_connection_safe_pd = _dummy_get_db_connection_ie
-    print(f"product_db.py: Importfehler für database.py: {e}. Dummy DB Funktionen werden genutzt.")
+    _LOG.warning("product_db.py: Importfehler für database.py: %s. Dummy DB Funktionen werden genutzt.", e)
 except Exception as e:
     def _dummy_get_db_connection_ex(): # type: ignore
-        print(f"product_db.py: Fehler beim Laden von database.py: {e}. Dummy DB-Verbindung genutzt.")
+        _LOG.warning("product_db.py: Fehler beim Laden von database.py: %s. Dummy DB-Verbindung genutzt.", e)
         return None
     get_db_connection_safe_pd = _dummy_get_db_connection_ex
-    print(f"product_db.py: Fehler beim Laden von database.py: {e}. Dummy DB Funktionen werden genutzt.")
+    _LOG.warning("product_db.py: Fehler beim Laden von database.py: %s. Dummy DB Funktionen werden genutzt.", e)
+
+# Schema-Prüfung (CREATE + Migration) nur einmal pro Prozess statt bei jedem API-Aufruf
+_SCHEMA_READY: bool = False
+_SCHEMA_LOCK = threading.Lock()
+_DB_COLUMNS: FrozenSet[str] = frozenset() # Tatsächliche Spalten von 'products', einmalig von _migrate_product_table_columns gesetzt
+
+# Kategorienliste ändert sich nur durch Schreibzugriffe; Cache wird von add/update/delete invalidiert
+_CATEGORY_CACHE: Optional[List[str]] = None
+_CATEGORY_CACHE_GENERATION = 0 # Verhindert, dass eine während einer Invalidierung laufende Abfrage veraltete Daten cached
+_CATEGORY_CACHE_LOCK = threading.Lock()
+
+def _invalidate_category_cache():
+    global _CATEGORY_CACHE, _CATEGORY_CACHE_GENERATION
+    with _CATEGORY_CACHE_LOCK:
+        _CATEGORY_CACHE = None
+        _CATEGORY_CACHE_GENERATION += 1
+
+# Einmal pro Verbindung beim Öffnen: WAL statt Rollback-Journal (Leser blockieren Schreiber nicht, fsync gebündelt),
+# NORMAL-Sync ist mit WAL sicher. WAL legt neben der DB die Dateien '<db>-wal' und '<db>-shm' an.
+# foreign_keys bleibt aus, da 'products' keine Fremdschlüssel hat.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+)
+
+class _ConnectionPool:
+    """Wiederverwendbare SQLite-Verbindungen statt open/close pro Aufruf: eine Schreibverbindung (per Lock serialisiert) und bis zu max_readers Leseverbindungen."""
+    def __init__(self, max_readers: int = 4):
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=max_readers)
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._path_lock = threading.Lock()
+        self._db_path: Optional[str] = None
+
+    def _current_db_path(self) -> Optional[str]:
+        global _SCHEMA_READY
+        if not DB_AVAILABLE: return None
+        db_path = getattr(_database_module_pd, 'DB_PATH', None)
+        if db_path != self._db_path: # DB_PATH wurde umgestellt (z.B. Testlauf): alte Verbindungen verwerfen
+            with self._path_lock:
+                if db_path != self._db_path:
+                    self.close_all()
+                    self._db_path = db_path
+                    _SCHEMA_READY = False
+                    _invalidate_category_cache()
+        return db_path
+
+    def _connect(self, read_only: bool = False) -> Optional[sqlite3.Connection]:
+        db_path = self._current_db_path()
+        if db_path is None: return get_db_connection_safe_pd() # Dummy-Verbindung (None), falls database.py fehlt
+        try:
+            conn = None
+            if read_only: # Leser ohne Schreibsperren/Journal-Zugriff; die DB-Datei existiert nach dem Schema-Warm-up
+                try: conn = sqlite3.connect(Path(db_path).absolute().as_uri() + "?mode=ro", uri=True, check_same_thread=False, cached_statements=256, isolation_level=None)
+                except sqlite3.OperationalError as e_ro: _LOG.warning("product_db._ConnectionPool: Read-only-Verbindung nicht möglich (%s), nutze Lese/Schreib-Verbindung.", e_ro)
+            if conn is None:
+                db_dir = os.path.dirname(db_path)
+                if db_dir: os.makedirs(db_dir, exist_ok=True)
+                conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256, isolation_level=None) # Wird threadübergreifend wiederverwendet, Zugriff aber exklusiv
+            # isolation_level=None: Autocommit ohne implizite BEGINs; Einzelstatements sind atomar,
+            # mehrteilige Schreibvorgänge (Migration, Batch-INSERT) öffnen ihre Transaktion explizit
+            conn.row_factory = sqlite3.Row
+            for pragma_stmt in _CONNECTION_PRAGMAS:
+                if read_only and pragma_stmt.startswith("PRAGMA journal_mode"): continue # Journal-Modus setzt der Schreiber
+                try: conn.execute(pragma_stmt)
+                except sqlite3.OperationalError as e_pragma: _LOG.error("product_db._ConnectionPool: '%s' fehlgeschlagen: %s", pragma_stmt, e_pragma)
+            return conn
+        except sqlite3.Error as e:
+            _LOG.exception("product_db._ConnectionPool: Fehler beim Öffnen der DB '%s': %s", db_path, e)
+            return None
+
+    @staticmethod
+    def _reset(conn: sqlite3.Connection) -> bool:
+        try:
+            if conn.in_transaction: conn.rollback() # Keine offene Transaktion an den nächsten Aufrufer weitergeben
+            return True
+        except sqlite3.Error:
+            try: conn.close()
+            except sqlite3.Error: pass
+            return False
+
+    @contextmanager
+    def reader(self):
+        self._current_db_path()
+        try: conn = self._readers.get_nowait()
+        except queue.Empty: conn = self._connect(read_only=True)
+        try:
+            yield conn
+        finally:
+            if conn is not None and self._reset(conn):
+                try: self._readers.put_nowait(conn)
+                except queue.Full: conn.close()
+
+    @contextmanager
+    def writer(self):
+        with self._writer_lock:
+            self._current_db_path()
+            if self._writer is None: self._writer = self._connect()
+            conn = self._writer
+            try:
+                yield conn
+            finally:
+                if conn is not None and not self._reset(conn): self._writer = None
+
+    def close_all(self):
+        while True:
+            try: self._readers.get_nowait().close()
+            except queue.Empty: break
+            except sqlite3.Error: pass
+        with self._writer_lock: # Wartet, bis eine laufende Schreiboperation fertig ist
+            if self._writer is not None:
+                try: self._writer.close()
+                except sqlite3.Error: pass
+                self._writer = None
+
+_pool = _ConnectionPool()
+
+def close_connection_pool() -> None:
+    """Schließt alle gepoolten Verbindungen, damit die DB-Datei (samt -wal/-shm) kopiert, ersetzt oder gelöscht werden kann."""
+    global _SCHEMA_READY
+    _pool.close_all()
+    _SCHEMA_READY = False # Nach Restore/Reset Schema beim nächsten Zugriff erneut prüfen
+    _invalidate_category_cache()
+
+# Feste Spaltenreihenfolge für INSERTs (ohne 'id', das per AUTOINCREMENT vergeben wird)
+_INSERT_COLS: Tuple[str, ...] = (
+    "category", "model_name", "brand", "price_euro", "capacity_w", "storage_power_kw",
+    "power_kw", "max_cycles", "warranty_years", "length_m", "width_m", "weight_kg",
+    "efficiency_percent", "origin_country", "description", "pros", "cons", "rating",
+    "image_base64", "created_at", "updated_at", "datasheet_link_db_path", "additional_cost_netto"
+)
+_INSERT_SQL = f"INSERT OR IGNORE INTO products ({', '.join(_INSERT_COLS)}) VALUES ({', '.join('?' * len(_INSERT_COLS))})" # Konstanter Text -> Treffer im Statement-Cache
+# Listen-Projektion ohne image_base64 (kann hunderte KB pro Zeile groß sein); Bild bei Bedarf über get_product_image
+_LIST_COLS: Tuple[str, ...] = ("id",) + tuple(c for c in _INSERT_COLS if c != "image_base64")
+# Defaults fehlender Felder beim INSERT, einmal vorberechnet; _NOW_DEFAULT wird pro Aufruf durch den Zeitstempel ersetzt
+_NOW_DEFAULT = object()
+_COL_DEFAULTS: Dict[str, Any] = {
+    **{c: 0.0 for c in ("price_euro", "capacity_w", "storage_power_kw", "power_kw", "length_m", "width_m", "weight_kg", "efficiency_percent", "rating", "additional_cost_netto")},
+    **{c: 0 for c in ("max_cycles", "warranty_years")},
+    "created_at": _NOW_DEFAULT, "updated_at": _NOW_DEFAULT,
+}
+_INSERT_DEFAULTS: Tuple[Any, ...] = tuple(_COL_DEFAULTS.get(c) for c in _INSERT_COLS) # TEXT/BLOB-Spalten: None
+
+def _product_insert_row(product_data: Dict[str, Any], now_iso: str) -> Tuple[Any, ...]:
+    """Produkt-Dict in ein Tupel in _INSERT_COLS-Reihenfolge umwandeln, fehlende Felder mit den Defaults von add_product."""
+    get = product_data.get
+    return tuple(now_iso if v is _NOW_DEFAULT else v for v in (get(c, d) for c, d in zip(_INSERT_COLS, _INSERT_DEFAULTS)))
+
+def _coerce_product_id(product_id: Any) -> int:
+    """Übergangsweise für Aufrufer, die noch float/numpy-IDs übergeben: einmalige Umwandlung an der API-Grenze."""
+    warnings.warn(f"product_db: product_id sollte int sein, erhalten: {type(product_id).__name__}", DeprecationWarning, stacklevel=3)
+    return int(product_id)
+
+def _ensure_product_schema():
+    """Schema einmalig über die Schreibverbindung anlegen/migrieren; danach reiner Flag-Check ohne Verbindung."""
+    if _SCHEMA_READY: return
+    with _pool.writer() as conn:
+        if conn is not None: create_product_table(conn)
 
 def create_product_table(conn: sqlite3.Connection):
+    global _SCHEMA_READY
+    if _SCHEMA_READY: return
+    with _SCHEMA_LOCK:
+        if _SCHEMA_READY: return
+        _create_product_table_uncached(conn)
+        _SCHEMA_READY = True
+
+def _create_product_table_uncached(conn: sqlite3.Connection):
     cursor = conn.cursor()
     # Spalte 'added_date' wurde zu 'created_at' geändert für Konsistenz mit Anforderung A.
     # 'last_updated' bleibt für die letzte Modifikation.
@@ -62,15 +239,14 @@ def create_product_table(conn: sqlite3.Connection):
             additional_cost_netto REAL DEFAULT 0.0 
         )
     """)
-    conn.commit()
+    # UNIQUE(model_name) liefert nur einen BINARY-Index; für die NOCASE-Suche und Kategorie-Filter/-Listen eigene Indizes
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_model_name_nocase ON products(model_name COLLATE NOCASE)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_category ON products(category COLLATE NOCASE)")
     _migrate_product_table_columns(conn) # Stellt sicher, dass alle Spalten existieren
 
 def _migrate_product_table_columns(conn: sqlite3.Connection):
+    global _DB_COLUMNS
     cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(products)")
-    existing_columns_info = {row[1]: row for row in cursor.fetchall()}
-    existing_columns = list(existing_columns_info.keys())
-
     # Reihenfolge und Typen gemäß Anforderung A und DB-Schema
     # 'last_updated' wird intern für 'updated_at' verwendet.
     expected_columns_and_types = {
@@ -87,32 +263,44 @@ def _migrate_product_table_columns(conn: sqlite3.Connection):
         # Die alte 'added_date' Spalte wird durch 'created_at' abgedeckt/ersetzt.
     }
 
+    cursor.execute("PRAGMA table_info(products)")
+    existing_columns_info = {row[1]: row for row in cursor.fetchall()}
+    if all(col_name in existing_columns_info for col_name in expected_columns_and_types):
+        # Schema bereits aktuell (Normalfall): ohne Schreibsperre, Transaktion und ALTER-Versuche zurück
+        _DB_COLUMNS = frozenset(existing_columns_info)
+        return
+
+    # Gesamte Migration in einer Transaktion: ein fsync statt einem pro Spalte.
+    # Fehlschlagende ALTERs rollen nur ihr eigenes Statement zurück, die Transaktion bleibt offen.
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute("PRAGMA table_info(products)") # Unter der Sperre erneut lesen, falls parallel migriert wurde
+    existing_columns_info = {row[1]: row for row in cursor.fetchall()}
+    existing_columns = list(existing_columns_info.keys())
+
     # Umbenennung von 'added_date' zu 'created_at', falls nötig
     if 'added_date' in existing_columns and 'created_at' not in existing_columns:
         try:
             # Temporär NOT NULL entfernen, falls es existiert und Probleme macht
             # Dies ist komplex, da SQLite ALTER TABLE eingeschränkt ist. Besser, neue Tabelle erstellen und Daten kopieren.
             # Für diese Korrektur versuchen wir ein einfaches RENAME.
-            print("product_db.py: Alte Spalte 'added_date' gefunden, versuche Umbenennung zu 'created_at'.")
+            _LOG.info("product_db.py: Alte Spalte 'added_date' gefunden, versuche Umbenennung zu 'created_at'.")
             cursor.execute("ALTER TABLE products RENAME COLUMN added_date TO created_at;")
-            conn.commit()
             existing_columns.remove('added_date')
             existing_columns.append('created_at')
-            print("product_db.py: Spalte 'added_date' zu 'created_at' umbenannt.")
+            _LOG.info("product_db.py: Spalte 'added_date' zu 'created_at' umbenannt.")
         except sqlite3.OperationalError as e_rename:
-            print(f"product_db.py: Fehler beim Umbenennen von 'added_date' zu 'created_at': {e_rename}. Manuelle Migration könnte nötig sein.")
+            _LOG.error("product_db.py: Fehler beim Umbenennen von 'added_date' zu 'created_at': %s. Manuelle Migration könnte nötig sein.", e_rename)
 
     # Umbenennung von 'last_updated' zu 'updated_at', falls nötig und 'updated_at' noch nicht existiert
     if 'last_updated' in existing_columns and 'updated_at' not in existing_columns:
         try:
-            print("product_db.py: Alte Spalte 'last_updated' gefunden, versuche Umbenennung zu 'updated_at'.")
+            _LOG.info("product_db.py: Alte Spalte 'last_updated' gefunden, versuche Umbenennung zu 'updated_at'.")
             cursor.execute("ALTER TABLE products RENAME COLUMN last_updated TO updated_at;")
-            conn.commit()
             existing_columns.remove('last_updated')
             existing_columns.append('updated_at')
-            print("product_db.py: Spalte 'last_updated' zu 'updated_at' umbenannt.")
+            _LOG.info("product_db.py: Spalte 'last_updated' zu 'updated_at' umbenannt.")
         except sqlite3.OperationalError as e_rename_lu:
-            print(f"product_db.py: Fehler beim Umbenennen von 'last_updated' zu 'updated_at': {e_rename_lu}.")
+            _LOG.error("product_db.py: Fehler beim Umbenennen von 'last_updated' zu 'updated_at': %s.", e_rename_lu)
 
 
     for col_name, col_type in expected_columns_and_types.items():
@@ -136,266 +324,351 @@ def _migrate_product_table_columns(conn: sqlite3.Connection):
                      elif col_type == "REAL": default_suffix = " DEFAULT 0.0"
 
                 cursor.execute(f"ALTER TABLE products ADD COLUMN {col_name} {alter_col_type}{not_null_stmt}{default_suffix}")
-                conn.commit()
-                print(f"product_db.py: Spalte '{col_name}' ({alter_col_type}{not_null_stmt}{default_suffix}) zur Tabelle 'products' hinzugefügt.")
+                existing_columns.append(col_name)
+                _LOG.info("product_db.py: Spalte '%s' (%s%s%s) zur Tabelle 'products' hinzugefügt.", col_name, alter_col_type, not_null_stmt, default_suffix)
             except sqlite3.OperationalError as e:
                 if "duplicate column name" in str(e).lower():
-                    pass # Spalte existiert bereits, was ok ist.
+                    existing_columns.append(col_name) # Spalte existiert bereits, was ok ist.
                 else:
-                    print(f"product_db.py: Fehler beim Hinzufügen von Spalte '{col_name}': {e}")
-                    traceback.print_exc()
+                    _LOG.exception("product_db.py: Fehler beim Hinzufügen von Spalte '%s': %s", col_name, e)
             except Exception as e_general_add:
-                print(f"product_db.py: Allgemeiner Fehler beim Hinzufügen der Spalte '{col_name}': {e_general_add}")
-                traceback.print_exc()
-    conn.commit()
+                _LOG.exception("product_db.py: Allgemeiner Fehler beim Hinzufügen der Spalte '%s': %s", col_name, e_general_add)
+    cursor.execute("COMMIT") # Einziger Commit der Migration
+    _DB_COLUMNS = frozenset(existing_columns)
 
 
 def add_product(product_data: Dict[str, Any]) -> Optional[int]:
-    conn = get_db_connection_safe_pd()
-    if conn is None:
-        print("product_db.add_product: DB nicht verfügbar.")
-        return None
+    with _pool.writer() as conn:
+        if conn is None:
+            _LOG.warning("product_db.add_product: DB nicht verfügbar.")
+            return None
+
+        create_product_table(conn)
+        cursor = conn.cursor()
+
+        # Pflichtfelder prüfen
+        if not product_data.get('category'):
+            _LOG.error("product_db.add_product: FEHLER - 'category' ist Pflicht. Produkt: %s", product_data.get('model_name', 'N/A'))
+            return None
+        if not product_data.get('model_name'):
+            _LOG.error("product_db.add_product: FEHLER - 'model_name' ist Pflicht. Daten: %s", product_data)
+            return None
+
+        # Positionsgebundenes Tupel in fester Spaltenreihenfolge, fehlende Felder mit Defaults
+        insert_row = _product_insert_row(product_data, datetime.now().isoformat())
+        model_name = product_data['model_name']
+        
+        try:
+            # Duplikatprüfung über den UNIQUE-Constraint statt vorgeschaltetem SELECT
+            cursor.execute(_INSERT_SQL, insert_row) # Autocommit
+            if cursor.rowcount == 0:
+                _LOG.warning("product_db.add_product: Fehler - Produkt mit Modellname '%s' existiert bereits.", model_name)
+                return None
+            product_id = cursor.lastrowid
+            _invalidate_category_cache()
+            _LOG.debug("product_db.add_product: Produkt '%s' erfolgreich mit ID %s hinzugefügt.", model_name, product_id)
+            return product_id
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.add_product: SQLite Fehler bei INSERT von '%s': %s", model_name, e)
+            conn.rollback()
+            return None
+
+
+def add_products_bulk(rows: List[Dict[str, Any]]) -> int:
+    """Viele Produkte in einer Transaktion per executemany einfügen (z.B. Katalogimport).
+    Zeilen ohne 'category'/'model_name' sowie bereits vorhandene oder doppelte Modellnamen werden übersprungen.
+    Gibt die Anzahl eingefügter Produkte zurück."""
+    if not rows: return 0
+    with _pool.writer() as conn:
+        if conn is None:
+            _LOG.warning("product_db.add_products_bulk: DB nicht verfügbar.")
+            return 0
+        create_product_table(conn)
+        cursor = conn.cursor()
+        now_iso = datetime.now().isoformat()
+        try:
+            cursor.execute("SELECT model_name FROM products")
+            seen_model_names = {r[0] for r in cursor.fetchall()} # Einmalige Duplikatprüfung statt SELECT pro Zeile
+            insert_rows: List[Tuple[Any, ...]] = []
+            skipped_count = 0
+            for product_data in rows:
+                model_name = product_data.get('model_name')
+                if not product_data.get('category') or not model_name or model_name in seen_model_names:
+                    skipped_count += 1
+                    continue
+                seen_model_names.add(model_name)
+                insert_rows.append(_product_insert_row(product_data, now_iso))
+            if not insert_rows:
+                _LOG.info("product_db.add_products_bulk: Keine neuen Produkte (%s übersprungen).", skipped_count)
+                return 0
+            cursor.execute("BEGIN")
+            changes_before = conn.total_changes # cursor.rowcount von executemany ist im Autocommit-Modus nicht verlässlich
+            cursor.executemany(_INSERT_SQL, insert_rows)
+            inserted_count = conn.total_changes - changes_before # Zwischenzeitlich von anderer Seite angelegte Modellnamen ignoriert OR IGNORE
+            cursor.execute("COMMIT") # Ein Commit für den gesamten Batch
+            if inserted_count: _invalidate_category_cache()
+            _LOG.info("product_db.add_products_bulk: %s Produkte hinzugefügt, %s übersprungen.", inserted_count, skipped_count + len(insert_rows) - inserted_count)
+            return inserted_count
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.add_products_bulk: SQLite Fehler beim Batch-INSERT: %s", e)
+            conn.rollback()
+            return 0
+
+
+def update_product(product_id: int, product_data: Dict[str, Any]) -> bool:
+    if type(product_id) is not int: product_id = _coerce_product_id(product_id)
+    with _pool.writer() as conn:
+        if conn is None:
+            _LOG.warning("product_db.update_product: DB nicht verfügbar.")
+            return False
 
-    create_product_table(conn)
-    cursor = conn.cursor()
-    now_iso = datetime.now().isoformat()
-
-    # Sicherstellen, dass alle Spalten aus expected_columns_and_types in product_data sind oder Defaults haben
-    all_db_columns = {
-        "id", "category", "model_name", "brand", "price_euro", "capacity_w", "storage_power_kw",
-        "power_kw", "max_cycles", "warranty_years", "length_m", "width_m", "weight_kg",
-        "efficiency_percent", "origin_country", "description", "pros", "cons", "rating",
-        "image_base64", "created_at", "updated_at", "datasheet_link_db_path", "additional_cost_netto"
-    }
-    
-    insert_data: Dict[str, Any] = {}
-
-    # Pflichtfelder prüfen
-    if not product_data.get('category'):
-        print(f"product_db.add_product: FEHLER - 'category' ist Pflicht. Produkt: {product_data.get('model_name', 'N/A')}")
-        if conn: conn.close(); return None
-    if not product_data.get('model_name'):
-        print(f"product_db.add_product: FEHLER - 'model_name' ist Pflicht. Daten: {product_data}")
-        if conn: conn.close(); return None
-
-    # Vorhandensein in DB-Schema prüfen und Daten vorbereiten
-    for col_name in all_db_columns:
-        if col_name == 'id': continue # ID ist auto-increment
-
-        if col_name in product_data:
-            insert_data[col_name] = product_data[col_name]
-        else:
-            # Defaults für optionale Felder, falls nicht vorhanden
-            if col_name == 'created_at' or col_name == 'updated_at':
-                insert_data[col_name] = now_iso
-            elif col_name in ["price_euro", "capacity_w", "storage_power_kw", "power_kw", "length_m", "width_m", "weight_kg", "efficiency_percent", "rating", "additional_cost_netto"]:
-                insert_data[col_name] = 0.0
-            elif col_name in ["max_cycles", "warranty_years"]:
-                insert_data[col_name] = 0
-            else: # TEXT oder BLOB (image_base64, datasheet_link_db_path)
-                insert_data[col_name] = None # Lässt SQLite den Default greifen oder bleibt NULL
-
-    # Duplikatprüfung für model_name
-    cursor.execute("SELECT id FROM products WHERE model_name = ?", (insert_data['model_name'],))
-    if cursor.fetchone():
-        print(f"product_db.add_product: Fehler - Produkt mit Modellname '{insert_data['model_name']}' existiert bereits.")
-        if conn: conn.close(); return None
-
-    fields = ', '.join(insert_data.keys())
-    placeholders = ', '.join(['?'] * len(insert_data))
-    
-    try:
-        cursor.execute(f"INSERT INTO products ({fields}) VALUES ({placeholders})", list(insert_data.values()))
-        conn.commit()
-        product_id = cursor.lastrowid
-        print(f"product_db.add_product: Produkt '{insert_data['model_name']}' erfolgreich mit ID {product_id} hinzugefügt.")
-        return product_id
-    except sqlite3.Error as e:
-        print(f"product_db.add_product: SQLite Fehler bei INSERT von '{insert_data.get('model_name', 'N/A')}': {e}")
-        traceback.print_exc()
-        if conn: conn.rollback()
-        return None
-    finally:
-        if conn: conn.close()
+        create_product_table(conn)
+        cursor = conn.cursor()
+        now_iso = datetime.now().isoformat()
+        
+        # Spalte 'last_updated' in den Daten durch 'updated_at' ersetzen, falls vorhanden
+        if 'last_updated' in product_data:
+            product_data['updated_at'] = product_data.pop('last_updated')
+        
+        product_data['updated_at'] = now_iso # Immer das aktuelle Datum für die Änderung
+
+        # Validierung für Pflichtfelder
+        if 'category' in product_data and not product_data['category']:
+            _LOG.error("product_db.update_product: FEHLER - 'category' darf nicht leer sein für ID %s.", product_id)
+            return False
+        if 'model_name' in product_data and not product_data['model_name']:
+            _LOG.error("product_db.update_product: FEHLER - 'model_name' darf nicht leer sein für ID %s.", product_id)
+            return False
 
+        update_data = {k: v for k, v in product_data.items() if k in _DB_COLUMNS and k != 'id'}
 
-def update_product(product_id: Union[int, float], product_data: Dict[str, Any]) -> bool:
-    conn = get_db_connection_safe_pd()
-    if conn is None:
-        print("product_db.update_product: DB nicht verfügbar.")
-        return False
+        if not update_data:
+            _LOG.info("product_db.update_product: Keine gültigen Felder zum Aktualisieren für ID %s.", product_id)
+            return False # Keine Änderungen, aber kein Fehler
 
-    create_product_table(conn)
-    cursor = conn.cursor()
-    now_iso = datetime.now().isoformat()
-    
-    # Spalte 'last_updated' in den Daten durch 'updated_at' ersetzen, falls vorhanden
-    if 'last_updated' in product_data:
-        product_data['updated_at'] = product_data.pop('last_updated')
-    
-    product_data['updated_at'] = now_iso # Immer das aktuelle Datum für die Änderung
-
-    # Alle Spalten aus der DB holen
-    cursor.execute("PRAGMA table_info(products)")
-    db_columns = [col_info[1] for col_info in cursor.fetchall()]
-
-    # Validierung für Pflichtfelder
-    if 'category' in product_data and not product_data['category']:
-        print(f"product_db.update_product: FEHLER - 'category' darf nicht leer sein für ID {product_id}.")
-        if conn: conn.close(); return False
-    if 'model_name' in product_data and not product_data['model_name']:
-        print(f"product_db.update_product: FEHLER - 'model_name' darf nicht leer sein für ID {product_id}.")
-        if conn: conn.close(); return False
-
-    # Duplikatprüfung, falls model_name geändert wird
-    if 'model_name' in product_data:
-        cursor.execute("SELECT id FROM products WHERE model_name = ? AND id != ?", (product_data['model_name'], int(product_id)))
-        if cursor.fetchone():
-            print(f"product_db.update_product: Fehler - Modellname '{product_data['model_name']}' existiert bereits für anderes Produkt.")
-            if conn: conn.close(); return False
-
-    update_data = {k: v for k, v in product_data.items() if k in db_columns and k != 'id'}
-
-    if not update_data:
-        print(f"product_db.update_product: Keine gültigen Felder zum Aktualisieren für ID {product_id}.")
-        if conn: conn.close(); return False # Keine Änderungen, aber kein Fehler
-
-    fields_to_set = [f"{k}=?" for k in update_data.keys()]
-    values = list(update_data.values())
-    values.append(int(product_id))
-    
-    try:
-        cursor.execute(f"UPDATE products SET {', '.join(fields_to_set)} WHERE id=?", values)
-        conn.commit()
-        if cursor.rowcount > 0:
-            print(f"product_db.update_product: Produkt ID {product_id} erfolgreich aktualisiert.")
-            return True
-        else: # Produkt-ID nicht gefunden
-            print(f"product_db.update_product: Produkt ID {product_id} nicht gefunden.")
+        set_cols = sorted(update_data) # Kanonische Reihenfolge: gleicher SQL-Text für gleiche Feldmenge -> Statement-Cache
+        fields_to_set = [f"{k}=?" for k in set_cols]
+        values = [update_data[k] for k in set_cols]
+        values.append(product_id)
+        
+        try:
+            # Ein Roundtrip: Duplikat-Modellname meldet der UNIQUE-Constraint, unbekannte ID zeigt rowcount == 0
+            cursor.execute(f"UPDATE products SET {', '.join(fields_to_set)} WHERE id=?", values) # Autocommit
+            if cursor.rowcount > 0:
+                if 'category' in update_data: _invalidate_category_cache()
+                _LOG.debug("product_db.update_product: Produkt ID %s erfolgreich aktualisiert.", product_id)
+                return True
+            else: # Produkt-ID nicht gefunden
+                _LOG.info("product_db.update_product: Produkt ID %s nicht gefunden.", product_id)
+                return False
+        except sqlite3.IntegrityError as e_integrity:
+            conn.rollback()
+            if 'model_name' in update_data and "unique" in str(e_integrity).lower():
+                _LOG.warning("product_db.update_product: Fehler - Modellname '%s' existiert bereits für anderes Produkt.", update_data['model_name'])
+            else:
+                _LOG.error("product_db.update_product: Integritätsfehler für ID %s: %s", product_id, e_integrity)
+            return False
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.update_product: SQLite Fehler für ID %s: %s", product_id, e)
+            conn.rollback()
             return False
-    except sqlite3.Error as e:
-        print(f"product_db.update_product: SQLite Fehler für ID {product_id}: {e}")
-        traceback.print_exc()
-        if conn: conn.rollback()
-        return False
-    finally:
-        if conn: conn.close()
 
 
-def delete_product(product_id: Union[int, float]) -> bool:
-    conn = get_db_connection_safe_pd()
-    if conn is None:
-        print("product_db.delete_product: DB nicht verfügbar.")
-        return False
-    create_product_table(conn) # Stellt Tabellenexistenz sicher
-    cursor = conn.cursor()
-    try:
-        cursor.execute("DELETE FROM products WHERE id=?", (int(product_id),))
-        conn.commit()
-        deleted_count = cursor.rowcount
-        if deleted_count > 0:
-            print(f"product_db.delete_product: Produkt ID {product_id} erfolgreich gelöscht.")
-        else:
-            print(f"product_db.delete_product: Produkt ID {product_id} nicht gefunden, nichts gelöscht.")
-        return deleted_count > 0
-    except sqlite3.Error as e:
-        print(f"product_db.delete_product: SQLite Fehler für ID {product_id}: {e}")
-        traceback.print_exc()
-        if conn: conn.rollback()
-        return False
-    finally:
-        if conn: conn.close()
-
-def list_products(category: Optional[str] = None) -> List[Dict[str, Any]]:
-    conn = get_db_connection_safe_pd()
-    if conn is None:
-        print("product_db.list_products: DB nicht verfügbar.")
-        return []
-    create_product_table(conn) # Stellt Tabellenexistenz sicher
-    cursor = conn.cursor()
-    query = "SELECT * FROM products"
+def delete_product(product_id: int) -> bool:
+    if type(product_id) is not int: product_id = _coerce_product_id(product_id)
+    with _pool.writer() as conn:
+        if conn is None:
+            _LOG.warning("product_db.delete_product: DB nicht verfügbar.")
+            return False
+        create_product_table(conn) # Stellt Tabellenexistenz sicher
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM products WHERE id=?", (product_id,)) # Autocommit
+            deleted_count = cursor.rowcount
+            if deleted_count > 0:
+                _invalidate_category_cache()
+                _LOG.debug("product_db.delete_product: Produkt ID %s erfolgreich gelöscht.", product_id)
+            else:
+                _LOG.info("product_db.delete_product: Produkt ID %s nicht gefunden, nichts gelöscht.", product_id)
+            return deleted_count > 0
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.delete_product: SQLite Fehler für ID %s: %s", product_id, e)
+            conn.rollback()
+            return False
+
+def _list_products_query(category: Optional[str], include_image: bool = False) -> Tuple[str, List[Any]]:
+    query = "SELECT * FROM products" if include_image else f"SELECT {', '.join(_LIST_COLS)} FROM products"
     params: List[Any] = [] # Explizit typisieren
     if category:
-        query += " WHERE category = ?"
+        query += " WHERE category = ? COLLATE NOCASE" # Nutzt idx_products_category
         params.append(category)
     query += " ORDER BY model_name COLLATE NOCASE" # Sortierung für Konsistenz
-    try:
-        cursor.execute(query, params)
-        # Sicherstellen, dass das Ergebnis von cursor.fetchall() korrekt als dict interpretiert wird
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows] if rows else []
-    except sqlite3.Error as e:
-        print(f"product_db.list_products: SQLite Fehler: {e}")
-        traceback.print_exc()
-        return []
-    finally:
-        if conn: conn.close()
-
-
-def get_product_by_id(product_id: Union[int, float]) -> Optional[Dict[str, Any]]:
-    conn = get_db_connection_safe_pd()
-    if conn is None:
-        print("product_db.get_product_by_id: DB nicht verfügbar.")
-        return None
-    create_product_table(conn) # Stellt Tabellenexistenz sicher
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT * FROM products WHERE id=?", (int(product_id),))
-        row = cursor.fetchone()
-        return dict(row) if row else None
-    except sqlite3.Error as e:
-        print(f"product_db.get_product_by_id: SQLite Fehler für ID {product_id}: {e}")
-        traceback.print_exc()
-        return None
-    finally:
-        if conn: conn.close()
+    return query, params
+
+def list_products(category: Optional[str] = None, include_image: bool = False) -> List[Dict[str, Any]]:
+    """Produkte (optional nach Kategorie) sortiert nach Modellname. 'image_base64' nur mit include_image=True."""
+    _ensure_product_schema() # Leser sind read-only und können das Schema nicht selbst anlegen
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.list_products: DB nicht verfügbar.")
+            return []
+        cursor = conn.cursor()
+        cursor.row_factory = None # Plain-Tupel; Spaltennamen einmal aus cursor.description statt dict(sqlite3.Row) pro Zeile
+        query, params = _list_products_query(category, include_image)
+        try:
+            cursor.execute(query, params)
+            col_names = [d[0] for d in cursor.description]
+            return [dict(zip(col_names, row)) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.list_products: SQLite Fehler: %s", e)
+            return []
+
+def iter_products(category: Optional[str] = None, chunksize: int = 500, include_image: bool = False) -> Iterator[Dict[str, Any]]:
+    """Wie list_products, liefert die Produkte aber blockweise per fetchmany (Speicher O(chunksize) statt O(N)).
+    Die Leseverbindung bleibt bis zum Ende (oder close()) des Generators belegt."""
+    _ensure_product_schema() # Leser sind read-only und können das Schema nicht selbst anlegen
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.iter_products: DB nicht verfügbar.")
+            return
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        query, params = _list_products_query(category, include_image)
+        try:
+            cursor.execute(query, params)
+            col_names = [d[0] for d in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows: break
+                for row in rows: yield dict(zip(col_names, row))
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.iter_products: SQLite Fehler: %s", e)
+        finally:
+            cursor.close() # Offenes SELECT beenden, bevor die Verbindung in den Pool zurückgeht
+
+def list_products_df(category: Optional[str] = None, chunksize: Optional[int] = None, include_image: bool = False) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """Produkte direkt als DataFrame per pd.read_sql_query, ohne Umweg über eine Liste von Dicts.
+    Mit chunksize wird ein Iterator über DataFrame-Blöcke geliefert (Speicher begrenzt); die Leseverbindung bleibt bis zu dessen Ende belegt."""
+    if chunksize: return _iter_products_df(category, chunksize, include_image)
+    _ensure_product_schema()
+    query, params = _list_products_query(category, include_image)
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.list_products_df: DB nicht verfügbar.")
+            return pd.DataFrame(columns=list(_LIST_COLS))
+        try:
+            return pd.read_sql_query(query, conn, params=params or None)
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            _LOG.exception("product_db.list_products_df: SQLite Fehler: %s", e)
+            return pd.DataFrame(columns=list(_LIST_COLS))
+
+def _iter_products_df(category: Optional[str], chunksize: int, include_image: bool) -> Iterator[pd.DataFrame]:
+    _ensure_product_schema()
+    query, params = _list_products_query(category, include_image)
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.list_products_df: DB nicht verfügbar.")
+            return
+        try:
+            yield from pd.read_sql_query(query, conn, params=params or None, chunksize=chunksize)
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            _LOG.exception("product_db.list_products_df: SQLite Fehler: %s", e)
+
+
+def get_product_by_id(product_id: int) -> Optional[Dict[str, Any]]:
+    if type(product_id) is not int: product_id = _coerce_product_id(product_id)
+    _ensure_product_schema() # Leser sind read-only und können das Schema nicht selbst anlegen
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.get_product_by_id: DB nicht verfügbar.")
+            return None
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT * FROM products WHERE id=?", (product_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.get_product_by_id: SQLite Fehler für ID %s: %s", product_id, e)
+            return None
 
 def get_product_by_model_name(model_name: str) -> Optional[Dict[str, Any]]:
     if not model_name or not model_name.strip(): # Zusätzliche Prüfung
-        print("product_db.get_product_by_model_name: Modellname darf nicht leer sein.")
+        _LOG.info("product_db.get_product_by_model_name: Modellname darf nicht leer sein.")
         return None
-    conn = get_db_connection_safe_pd()
-    if conn is None:
-        print("product_db.get_product_by_model_name: DB nicht verfügbar.")
-        return None
-    create_product_table(conn) # Stellt Tabellenexistenz sicher
-    cursor = conn.cursor()
-    try:
-        # Case-insensitive Suche für Modellnamen kann sinnvoll sein, abhängig von Anforderungen
-        cursor.execute("SELECT * FROM products WHERE model_name=? COLLATE NOCASE", (model_name.strip(),))
-        row = cursor.fetchone()
-        return dict(row) if row else None
-    except sqlite3.Error as e:
-        print(f"product_db.get_product_by_model_name: SQLite Fehler für Modell '{model_name}': {e}")
-        traceback.print_exc()
-        return None
-    finally:
-        if conn: conn.close()
-
-
-def update_product_image(product_id: Union[int, float], image_base64: Optional[str]) -> bool:
-    return update_product(int(product_id), {"image_base64": image_base64})
+    _ensure_product_schema() # Leser sind read-only und können das Schema nicht selbst anlegen
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.get_product_by_model_name: DB nicht verfügbar.")
+            return None
+        cursor = conn.cursor()
+        try:
+            # Case-insensitive Suche für Modellnamen kann sinnvoll sein, abhängig von Anforderungen
+            cursor.execute("SELECT * FROM products WHERE model_name=? COLLATE NOCASE", (model_name.strip(),))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.get_product_by_model_name: SQLite Fehler für Modell '%s': %s", model_name, e)
+            return None
+
+
+def get_product_image(product_id: int) -> Optional[str]:
+    """Nur die Base64-Bildspalte eines Produkts laden (list_products liefert sie standardmäßig nicht mit)."""
+    if type(product_id) is not int: product_id = _coerce_product_id(product_id)
+    _ensure_product_schema()
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.get_product_image: DB nicht verfügbar.")
+            return None
+        try:
+            row = conn.execute("SELECT image_base64 FROM products WHERE id=?", (product_id,)).fetchone()
+            return row[0] if row and row[0] else None
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.get_product_image: SQLite Fehler für ID %s: %s", product_id, e)
+            return None
+
+
+def update_product_image(product_id: int, image_base64: Optional[str]) -> bool:
+    """Nur das Produktbild setzen: ein festes Einspalten-UPDATE statt des generischen update_product-Pfads."""
+    if type(product_id) is not int: product_id = _coerce_product_id(product_id)
+    with _pool.writer() as conn:
+        if conn is None:
+            _LOG.warning("product_db.update_product_image: DB nicht verfügbar.")
+            return False
+        create_product_table(conn)
+        try:
+            cursor = conn.execute("UPDATE products SET image_base64=?, updated_at=? WHERE id=?", (image_base64, datetime.now().isoformat(), product_id)) # Autocommit
+            if cursor.rowcount == 0: _LOG.info("product_db.update_product_image: Produkt ID %s nicht gefunden.", product_id)
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.update_product_image: SQLite Fehler für ID %s: %s", product_id, e)
+            conn.rollback()
+            return False
 
 
 def list_product_categories() -> List[str]:
-    conn = get_db_connection_safe_pd()
-    if conn is None:
-        print("product_db.list_product_categories: DB nicht verfügbar.")
-        return []
-    create_product_table(conn) # Stellt Tabellenexistenz sicher
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL AND category != '' ORDER BY category COLLATE NOCASE")
-        rows = cursor.fetchall()
-        return [row['category'] for row in rows] # Direkter Zugriff, da sqlite.Row wie ein Dict ist
-    except sqlite3.Error as e:
-        print(f"product_db.list_product_categories: SQLite Fehler: {e}")
-        traceback.print_exc()
-        return []
-    finally:
-        if conn: conn.close()
+    global _CATEGORY_CACHE
+    _ensure_product_schema() # Leser sind read-only und können das Schema nicht selbst anlegen
+    with _CATEGORY_CACHE_LOCK:
+        if _CATEGORY_CACHE is not None: return list(_CATEGORY_CACHE) # Kopie, Cache bleibt unverändert
+        cache_generation = _CATEGORY_CACHE_GENERATION
+    with _pool.reader() as conn:
+        if conn is None:
+            _LOG.warning("product_db.list_product_categories: DB nicht verfügbar.")
+            return []
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT DISTINCT category FROM products WHERE category IS NOT NULL AND category != '' ORDER BY category COLLATE NOCASE")
+            rows = cursor.fetchall()
+            categories = [row['category'] for row in rows] # Direkter Zugriff, da sqlite.Row wie ein Dict ist
+        except sqlite3.Error as e:
+            _LOG.exception("product_db.list_product_categories: SQLite Fehler: %s", e)
+            return []
+    with _CATEGORY_CACHE_LOCK:
+        if cache_generation == _CATEGORY_CACHE_GENERATION: _CATEGORY_CACHE = categories
+    return list(categories)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(levelname)s %(message)s") # Meldungen der DB-Funktionen im Testlauf anzeigen
     print("--- Testlauf für product_db.py ---")
     # Temporäre In-Memory-Datenbank für den Test
     _original_db_path_pdb = None # Sicherstellen, dass es definiert ist
@@ -409,6 +682,7 @@ if __name__ == "__main__":
         _original_db_path_pdb = database.DB_PATH # Greife auf die Variable im Modul zu
         test_db_file = "test_product_db_run.db"
         database.DB_PATH = test_db_file # Ändere den Pfad im Modul
+        _SCHEMA_READY = False # Neue DB-Datei: Schema-Cache zurücksetzen
         if os.path.exists(test_db_file):
             os.remove(test_db_file)
         print(f"INFO: Verwende temporäre DB für Test: {test_db_file}")
@@ -9,8 +9,59 @@ import streamlit as st
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from typing import Dict, Any, Optional
-import math # <--- KORREKTUR: Fehlender Import hinzugefügt
+import plotly.io as pio
+from typing import Dict, Any, Optional, Tuple
+import io
+import colorsys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Schnellere JSON-Serialisierung der Figuren (st.plotly_chart / Export), falls orjson installiert ist
+_ORJSON_AVAILABLE = False
+try:
+    import orjson # noqa: F401
+    pio.json.config.default_engine = "orjson"
+    _ORJSON_AVAILABLE = True
+except Exception:
+    pass
+
+# ScriptRunContext an Export-Threads weitergeben (st.cache_data warnt sonst "missing ScriptRunContext")
+_ST_SCRIPT_RUN_CTX_AVAILABLE = False
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    _ST_SCRIPT_RUN_CTX_AVAILABLE = True
+except Exception:
+    pass
+
+_PIL_AVAILABLE = False
+try:
+    from PIL import Image as PILImage, ImageDraw as PILImageDraw, ImageFont as PILImageFont
+    _PIL_AVAILABLE = True
+except ImportError:
+    pass
+
+# Matplotlib (Agg, ohne pyplot/globales Backend) als schneller PNG-Renderer für den PDF-Export; Kaleido bleibt Fallback
+_MATPLOTLIB_AVAILABLE = False
+try:
+    from matplotlib.figure import Figure as MplFigure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as MplFigureCanvasAgg
+    from matplotlib.ticker import MaxNLocator as MplMaxNLocator
+    _MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    pass
+
+# Exportvorgaben einmalig beim Import setzen, damit alle PNG-Exporte denselben (warmen) Kaleido-Renderer
+# mit identischen Parametern nutzen. Kaleido >= 1.0: `pio.defaults`, ältere Versionen: `pio.kaleido.scope`.
+try:
+    _pio_export_defaults = getattr(pio, "defaults", None) or pio.kaleido.scope
+    _pio_export_defaults.default_format = "png"
+    _pio_export_defaults.default_width = 900
+    _pio_export_defaults.default_height = 550
+    _pio_export_defaults.default_scale = 2 # Höhere Skalierung für bessere Qualität im PDF
+    _pio_export_defaults.mathjax = None # Keine Formeln in den Diagrammen -> MathJax nicht laden
+except Exception:
+    pass
 
 # Hilfsfunktion für Texte innerhalb dieses Moduls
 def get_text_pv_viz(texts: Dict[str, str], key: str, fallback_text: Optional[str] = None) -> str:
@@ -30,6 +81,57 @@ def get_text_pv_viz(texts: Dict[str, str], key: str, fallback_text: Optional[str
         fallback_text = key.replace("_", " ").title() + " (PV Viz Text fehlt)"
     return texts.get(key, fallback_text)
 
+_DEFAULT_MONTH_LABELS_PV_VIZ: Tuple[str, ...] = ("Jan", "Feb", "Mrz", "Apr", "Mai", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dez")
+_MONTH_LABELS_CACHE: Dict[str, Tuple[str, ...]] = {}
+# Monatsfarben (Farbkreis 0-300°) einmalig beim Import; als Farbskala über den Monatsindex 0..11
+_MONTH_HSL_LIGHT: Tuple[str, ...] = tuple(f'hsl({(i/12*300)}, 70%, 60%)' for i in range(12))
+_MONTH_COLORSCALE = tuple((i / 11, color) for i, color in enumerate(_MONTH_HSL_LIGHT))
+_MONTH_RGB_LIGHT = tuple(colorsys.hls_to_rgb(i / 12 * 300 / 360, 0.6, 0.7) for i in range(12)) # dieselben Farben für matplotlib
+
+def _get_month_labels_pv_viz(month_labels_str: str) -> Tuple[str, ...]:
+    """
+    Liefert die 12 kurzen Monatsnamen aus dem kommaseparierten Text `month_names_short_list`.
+    Memoisiert auf den Rohstring statt auf id(texts): ids freigegebener Dicts können wiederverwendet werden.
+    """
+    month_labels = _MONTH_LABELS_CACHE.get(month_labels_str)
+    if month_labels is None:
+        month_labels = tuple(month_labels_str.split(','))
+        if len(month_labels) != 12: # Fallback
+            month_labels = _DEFAULT_MONTH_LABELS_PV_VIZ
+        _MONTH_LABELS_CACHE[month_labels_str] = month_labels
+    return month_labels
+
+def _sanitize_float_array(values: Any) -> np.ndarray:
+    """Wandelt Rohwerte in ein float64-Array um; NaN/Inf und alle Einträge, die kein int/float sind (auch Zahl-Strings), werden zu 0.0."""
+    # Fremdtypen vorab auf NaN abbilden (np.asarray würde z.B. '5' zu 5.0 parsen), dann in einem Schritt bereinigen
+    arr = np.fromiter((v if isinstance(v, (int, float)) else np.nan for v in values), dtype=np.float64, count=len(values))
+    return np.nan_to_num(arr, nan=0.0, posinf=0.0, neginf=0.0)
+
+def _resolve_labels_pv_viz(texts: Dict[str, str], label_spec: Tuple[Tuple[str, str], ...]) -> Dict[str, str]:
+    """Löst alle (Schlüssel, Fallback)-Paare einer Render-Funktion auf einmal auf."""
+    return {key: texts.get(key, fallback) for key, fallback in label_spec}
+
+# Eingabeprüfung je Diagramm in einem Schritt: (gültig, bereinigtes Array bzw. None)
+def _validate_monthly(production_data: Any) -> Tuple[bool, Optional[np.ndarray]]:
+    """Erwartet eine Liste mit 12 Monatswerten."""
+    if not isinstance(production_data, list) or len(production_data) != 12:
+        return False, None
+    return True, _sanitize_float_array(production_data)
+
+def _validate_cashflow(cashflow_data_raw: Any, simulation_years: Any) -> Tuple[bool, Optional[np.ndarray]]:
+    """Erwartet N > 0 Simulationsjahre und eine Liste mit N+1 kumulierten Cashflows (inkl. Jahr 0)."""
+    if not isinstance(simulation_years, int) or simulation_years <= 0 or \
+       not isinstance(cashflow_data_raw, list) or len(cashflow_data_raw) != simulation_years + 1:
+        return False, None
+    return True, _sanitize_float_array(cashflow_data_raw)
+
+def _validate_benefits(annual_benefits_raw: Any, simulation_years: Any) -> Tuple[bool, Optional[np.ndarray]]:
+    """Erwartet N > 0 Simulationsjahre und eine Liste mit N jährlichen Vorteilen."""
+    if not isinstance(simulation_years, int) or simulation_years <= 0 or \
+       not isinstance(annual_benefits_raw, list) or len(annual_benefits_raw) != simulation_years:
+        return False, None
+    return True, _sanitize_float_array(annual_benefits_raw)
+
 # Hilfsfunktion für den Export von Plotly-Figuren
 def _export_plotly_fig_to_bytes_pv_viz(fig: Optional[go.Figure], texts: Dict[str, str]) -> Optional[bytes]:
     """
@@ -45,8 +147,9 @@ def _export_plotly_fig_to_bytes_pv_viz(fig: Optional[go.Figure], texts: Dict[str
     if fig is None:
         return None
     try:
-        # Erhöhe die Skalierung und definiere eine Standardgröße für bessere Qualität im PDF
-        img_bytes = fig.to_image(format="png", scale=2, width=900, height=550)
+        # Format, Größe und Skalierung kommen aus den Exportvorgaben (siehe Modulanfang);
+        # validate=False überspringt die erneute Schema-Prüfung der bereits validierten Figur
+        img_bytes = pio.to_image(fig, validate=False)
         return img_bytes
     except Exception as e:
         # Fehlerbehandlung wurde aus der Originaldatei übernommen
@@ -59,7 +162,340 @@ def _export_plotly_fig_to_bytes_pv_viz(fig: Optional[go.Figure], texts: Dict[str
         # Der Nutzer wird den Fehler durch ein fehlendes Bild im PDF bemerken.
         return None
 
-def render_yearly_production_pv_data(analysis_results: Dict[str, Any], texts: Dict[str, str]):
+_UMLAUT_TRANSLIT = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "Ä": "Ae", "Ö": "Oe", "Ü": "Ue", "ß": "ss"})
+
+@lru_cache(maxsize=8)
+def _render_placeholder_png(title: str) -> Optional[bytes]:
+    """
+    Erzeugt ein schlichtes 900x550-PNG mit zentriertem `title` für fehlende Daten (ohne Kaleido).
+    Pro Titel nur einmal berechnet; None, wenn PIL fehlt oder das Zeichnen scheitert.
+    """
+    if not _PIL_AVAILABLE:
+        return None
+    try:
+        img = PILImage.new("RGB", (900, 550), "white")
+        draw = PILImageDraw.Draw(img)
+        font = None
+        for font_name in ("DejaVuSans.ttf", "arial.ttf"): # Systemschriften mit Umlauten (Linux / Windows)
+            try:
+                font = PILImageFont.truetype(font_name, 32); break
+            except Exception:
+                continue
+        if font is None: # Eingebaute Pillow-Schrift hat keine Umlaut-Glyphen -> umschreiben
+            title = title.translate(_UMLAUT_TRANSLIT)
+            try:
+                font = PILImageFont.load_default(size=32) # Pillow >= 10.1
+            except TypeError:
+                font = PILImageFont.load_default()
+        left, top, right, bottom = draw.textbbox((0, 0), title, font=font)
+        draw.text(((900 - (right - left)) / 2, (550 - (bottom - top)) / 2), title, fill=(90, 90, 90), font=font)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+    except Exception:
+        return None
+
+_FALLBACK_PNG: Optional[bytes] = _render_placeholder_png("Daten nicht verfügbar")
+
+def _fallback_png_bytes_pv_viz(fig_fallback: go.Figure, title: str, texts: Dict[str, str]) -> Optional[bytes]:
+    """PNG für den \"Daten nicht verfügbar\"-Fall: statischer Platzhalter, Kaleido-Export nur ohne PIL."""
+    placeholder = _FALLBACK_PNG if title == "Daten nicht verfügbar" else _render_placeholder_png(title)
+    return placeholder if placeholder is not None else _export_plotly_fig_to_bytes_pv_viz(fig_fallback, texts)
+
+# "mpl": flache Matplotlib-Diagramme (schnell, wenig Speicher); "kaleido": exakte Plotly-Optik (Chromium)
+PNG_EXPORT_BACKEND_PV_VIZ = "mpl" if _MATPLOTLIB_AVAILABLE else "kaleido"
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _png_from_payload(kind: str, payload: Tuple[Any, ...], backend: str = "kaleido") -> bytes:
+    """
+    Baut die Figur `kind` aus dem unveränderlichen `payload` neu auf und exportiert sie als PNG.
+    Gecacht über den Hash von (kind, payload, backend): bei unveränderten Daten entfällt der teure Export
+    bei jedem Streamlit-Rerun. Fehler werden nicht abgefangen, damit sie nicht im Cache landen.
+    `backend="mpl"` rendert per Matplotlib und fällt bei einem Fehler auf Kaleido zurück.
+    """
+    if backend == "mpl" and _MATPLOTLIB_AVAILABLE:
+        try:
+            return _export_mpl_png_pv_viz(kind, payload)
+        except Exception:
+            pass # Fallback: Kaleido
+    fig = _FIG_BUILDERS_PV_VIZ[kind](*payload)
+    return pio.to_image(fig, validate=False)
+
+def _export_payload_to_bytes_pv_viz(kind: str, payload: Tuple[Any, ...], backend: Optional[str] = None) -> Optional[bytes]:
+    """Wie `_export_plotly_fig_to_bytes_pv_viz`, aber über den PNG-Cache; None bei einem Fehler."""
+    try:
+        return _png_from_payload(kind, payload, backend or PNG_EXPORT_BACKEND_PV_VIZ)
+    except Exception:
+        return None
+
+# Wiederverwendete Stilangaben der Diagramme auf Modulebene. Plotly übernimmt sie bei der Validierung in eigene
+# Objekte, die Konstanten selbst werden dabei nicht verändert -> direkt übergeben, nie in place anpassen.
+_LINE_CASHFLOW = {"color": "green", "width": 4}
+_LINE_BREAK_EVEN = {"color": "red", "width": 2, "dash": "dash"}
+_LINE_COST = {"color": "red", "width": 3}
+_LINE_CUMULATIVE_RETURN = {"color": "blue", "width": 4}
+_MARKER_4 = {"size": 4}
+_MARGIN_YEARLY = {"l": 10, "r": 10, "t": 50, "b": 10}
+_MARGIN_LINES = {"l": 0, "r": 0, "b": 0, "t": 50}
+
+def _build_yearly_production_fig(prod_values: Tuple[float, ...], month_labels: Tuple[str, ...], title: str, month_axis_label: str, kwh_axis_label: str) -> go.Figure:
+    """Baut das 3D-Monatsbalkendiagramm aus bereits bereinigten Werten."""
+    # Alle 12 Monatsbalken als EIN Trace: je Monat ein Segment (0 -> Wert), getrennt durch NaN-Punkte
+    month_idx = np.repeat(np.arange(12), 3)
+    # FP32 reicht für die Diagrammauflösung und halbiert die serialisierten Bytes
+    zs = np.empty(36, dtype=np.float32); zs[0::3] = 0.0; zs[1::3] = prod_values; zs[2::3] = np.nan
+    bar_hover_texts = [f"{month_labels[i]}: {p_val:.0f} kWh" for i, p_val in enumerate(prod_values)]
+    fig_dict = {
+        "data": [{
+            "type": "scatter3d", "x": month_idx.astype(np.float32), "y": np.zeros(36, dtype=np.float32), "z": zs,
+            "mode": "lines",
+            # Farbe je Punkt über den Monatsindex; Farbskala mit den bisherigen HSL-Monatsfarben
+            "line": {"width": 20, "color": month_idx, "colorscale": _MONTH_COLORSCALE, "cmin": 0, "cmax": 11},
+            "name": kwh_axis_label,
+            "hoverinfo": "text", "text": np.repeat(bar_hover_texts, 3),
+        }],
+        "layout": {
+            "title": {"text": title},
+            "scene": {
+                "xaxis": {"title": {"text": month_axis_label}, "tickvals": list(range(12)), "ticktext": list(month_labels)},
+                "yaxis": {"title": {"text": ""}, "showticklabels": False, "range": [-1, 1]},
+                "zaxis": {"title": {"text": kwh_axis_label}},
+            },
+            "margin": _MARGIN_YEARLY, "showlegend": False, # Monatsnamen stehen an der X-Achse
+        },
+    }
+    return go.Figure(fig_dict, skip_invalid=True)
+
+def _build_break_even_fig(cashflow_data: Tuple[float, ...], title: str, cashflow_label: str, year_axis_label: str, eur_axis_label: str) -> go.Figure:
+    """Baut das 3D-Kapitalflussdiagramm (N+1 Jahreswerte) inkl. Break-Even-Linie."""
+    # Spaltenweise NumPy-Arrays statt Python-Listen -> Serialisierung direkt über den Array-Puffer
+    # (FP32/int16 genügen der Diagrammauflösung und halbieren die serialisierten Bytes)
+    cashflow_values = np.asarray(cashflow_data, dtype=np.float32)
+    years_axis = np.arange(cashflow_values.size, dtype=np.int16)
+    fig_dict = {
+        "data": [
+            {"type": "scatter3d", "x": years_axis, "y": np.zeros_like(years_axis, dtype=np.float32), "z": cashflow_values, "mode": "lines+markers",
+             "name": cashflow_label, "line": _LINE_CASHFLOW, "marker": _MARKER_4},
+            {"type": "scatter3d", "x": years_axis[[0, -1]], "y": np.zeros(2, dtype=np.float32), "z": np.zeros(2, dtype=np.float32), "mode": "lines",
+             "name": "Break-Even Linie", "line": _LINE_BREAK_EVEN},
+        ],
+        "layout": {
+            "title": {"text": title},
+            "scene": {
+                "xaxis": {"title": {"text": year_axis_label}},
+                "yaxis": {"title": {"text": ""}, "showticklabels": False, "range": [-1, 1]},
+                "zaxis": {"title": {"text": eur_axis_label}},
+            },
+            "margin": _MARGIN_LINES,
+        },
+    }
+    return go.Figure(fig_dict, skip_invalid=True)
+
+def _build_amortisation_fig(total_investment: float, annual_benefits: Tuple[float, ...], title: str, cost_label: str, cumulative_return_label: str, year_axis_label: str, eur_axis_label: str) -> go.Figure:
+    """Baut das 3D-Amortisationsdiagramm (Investition vs. kumulierte Rückflüsse über N Jahre)."""
+    simulation_years = len(annual_benefits)
+    years_axis = np.arange(simulation_years + 1, dtype=np.int16) # FP32/int16: siehe _build_break_even_fig
+    kosten_linie = np.full(simulation_years + 1, total_investment, dtype=np.float32)
+
+    kumulierte_rueckfluesse = np.empty(simulation_years + 1)
+    kumulierte_rueckfluesse[0] = 0.0
+    np.cumsum(np.asarray(annual_benefits, dtype=np.float64), out=kumulierte_rueckfluesse[1:])
+
+    fig_dict = {
+        "data": [
+            {"type": "scatter3d", "x": years_axis, "y": np.zeros_like(years_axis, dtype=np.float32), "z": kosten_linie, "mode": "lines",
+             "name": cost_label, "line": _LINE_COST},
+            {"type": "scatter3d", "x": years_axis, "y": np.full(years_axis.size, 0.1, dtype=np.float32), "z": kumulierte_rueckfluesse.astype(np.float32), "mode": "lines+markers",
+             "name": cumulative_return_label, "line": _LINE_CUMULATIVE_RETURN, "marker": _MARKER_4},
+        ],
+        "layout": {
+            "title": {"text": title},
+            "scene": {
+                "xaxis": {"title": {"text": year_axis_label}},
+                "yaxis": {"title": {"text": ""}, "showticklabels": False, "range": [-0.5, 0.5]},
+                "zaxis": {"title": {"text": eur_axis_label}},
+            },
+            "margin": _MARGIN_LINES,
+        },
+    }
+    return go.Figure(fig_dict, skip_invalid=True)
+
+# 2D-Varianten (use_3d=False): gleiche Payloads, aber SVG-Traces statt WebGL-Szene -> schnelleres Rendern im Browser und in Kaleido
+def _build_yearly_production_fig_2d(prod_values: Tuple[float, ...], month_labels: Tuple[str, ...], title: str, month_axis_label: str, kwh_axis_label: str) -> go.Figure:
+    """Baut das Monatsbalkendiagramm als 2D-Balken."""
+    fig_dict = {
+        "data": [{
+            "type": "bar", "x": list(month_labels), "y": np.asarray(prod_values, dtype=np.float32),
+            "marker": {"color": list(_MONTH_HSL_LIGHT)}, "name": kwh_axis_label,
+            "hovertemplate": "%{x}: %{y:.0f} kWh<extra></extra>",
+        }],
+        "layout": {
+            "title": {"text": title},
+            "xaxis": {"title": {"text": month_axis_label}}, "yaxis": {"title": {"text": kwh_axis_label}},
+            "margin": _MARGIN_YEARLY, "showlegend": False,
+        },
+    }
+    return go.Figure(fig_dict, skip_invalid=True)
+
+def _build_break_even_fig_2d(cashflow_data: Tuple[float, ...], title: str, cashflow_label: str, year_axis_label: str, eur_axis_label: str) -> go.Figure:
+    """Baut das Kapitalflussdiagramm als 2D-Linie inkl. gestrichelter Break-Even-Linie."""
+    cashflow_values = np.asarray(cashflow_data, dtype=np.float32)
+    years_axis = np.arange(cashflow_values.size, dtype=np.int16)
+    fig_dict = {
+        "data": [
+            {"type": "scatter", "x": years_axis, "y": cashflow_values, "mode": "lines+markers",
+             "name": cashflow_label, "line": _LINE_CASHFLOW, "marker": _MARKER_4},
+            {"type": "scatter", "x": years_axis[[0, -1]], "y": np.zeros(2, dtype=np.float32), "mode": "lines",
+             "name": "Break-Even Linie", "line": _LINE_BREAK_EVEN},
+        ],
+        "layout": {
+            "title": {"text": title},
+            "xaxis": {"title": {"text": year_axis_label}}, "yaxis": {"title": {"text": eur_axis_label}},
+            "margin": _MARGIN_LINES,
+        },
+    }
+    return go.Figure(fig_dict, skip_invalid=True)
+
+def _build_amortisation_fig_2d(total_investment: float, annual_benefits: Tuple[float, ...], title: str, cost_label: str, cumulative_return_label: str, year_axis_label: str, eur_axis_label: str) -> go.Figure:
+    """Baut das Amortisationsdiagramm als zwei 2D-Linien (Investition vs. kumulierte Rückflüsse)."""
+    simulation_years = len(annual_benefits)
+    years_axis = np.arange(simulation_years + 1, dtype=np.int16)
+    kumulierte_rueckfluesse = np.empty(simulation_years + 1)
+    kumulierte_rueckfluesse[0] = 0.0
+    np.cumsum(np.asarray(annual_benefits, dtype=np.float64), out=kumulierte_rueckfluesse[1:])
+    fig_dict = {
+        "data": [
+            {"type": "scatter", "x": years_axis, "y": np.full(simulation_years + 1, total_investment, dtype=np.float32), "mode": "lines",
+             "name": cost_label, "line": _LINE_COST},
+            {"type": "scatter", "x": years_axis, "y": kumulierte_rueckfluesse.astype(np.float32), "mode": "lines+markers",
+             "name": cumulative_return_label, "line": _LINE_CUMULATIVE_RETURN, "marker": _MARKER_4},
+        ],
+        "layout": {
+            "title": {"text": title},
+            "xaxis": {"title": {"text": year_axis_label}}, "yaxis": {"title": {"text": eur_axis_label}},
+            "margin": _MARGIN_LINES,
+        },
+    }
+    return go.Figure(fig_dict, skip_invalid=True)
+
+# Zuordnung Diagrammart -> Builder für den gecachten PNG-Export
+_FIG_BUILDERS_PV_VIZ = {
+    "yearly_production": _build_yearly_production_fig,
+    "break_even": _build_break_even_fig,
+    "amortisation": _build_amortisation_fig,
+    "yearly_production_2d": _build_yearly_production_fig_2d,
+    "break_even_2d": _build_break_even_fig_2d,
+    "amortisation_2d": _build_amortisation_fig_2d,
+}
+
+# Matplotlib-Export: eine beim Import angelegte Figur (900x550 bei dpi 100, Export mit dpi 200 = Kaleido-Auflösung
+# 1800x1100), die je Export nur geleert wird statt Figure/Axes neu anzulegen. Streamlit-Sessions laufen in Threads -> Lock.
+_MPL_EXPORT_LOCK = threading.Lock()
+if _MATPLOTLIB_AVAILABLE:
+    _MPL_FIG = MplFigure(figsize=(9, 5.5), dpi=100)
+    MplFigureCanvasAgg(_MPL_FIG)
+    _MPL_AX = _MPL_FIG.add_subplot()
+
+def _draw_yearly_production_mpl(ax, prod_values, month_labels, title, month_axis_label, kwh_axis_label) -> None:
+    ax.bar(range(12), prod_values, color=_MONTH_RGB_LIGHT)
+    ax.set_xticks(range(12), labels=list(month_labels))
+    ax.set_title(title); ax.set_xlabel(month_axis_label); ax.set_ylabel(kwh_axis_label)
+
+def _draw_break_even_mpl(ax, cashflow_data, title, cashflow_label, year_axis_label, eur_axis_label) -> None:
+    ax.plot(range(len(cashflow_data)), cashflow_data, color="green", linewidth=2.5, marker="o", markersize=3, label=cashflow_label)
+    ax.axhline(0.0, color="red", linewidth=1.2, linestyle="--", label="Break-Even Linie")
+    ax.set_title(title); ax.set_xlabel(year_axis_label); ax.set_ylabel(eur_axis_label); ax.legend()
+    ax.xaxis.set_major_locator(MplMaxNLocator(integer=True)) # nur ganze Jahre
+
+def _draw_amortisation_mpl(ax, total_investment, annual_benefits, title, cost_label, cumulative_return_label, year_axis_label, eur_axis_label) -> None:
+    kumulierte_rueckfluesse = np.concatenate(([0.0], np.cumsum(np.asarray(annual_benefits, dtype=np.float64))))
+    years_axis = np.arange(kumulierte_rueckfluesse.size)
+    ax.plot(years_axis, np.full(years_axis.size, total_investment), color="red", linewidth=2, label=cost_label)
+    ax.plot(years_axis, kumulierte_rueckfluesse, color="blue", linewidth=2.5, marker="o", markersize=3, label=cumulative_return_label)
+    ax.set_title(title); ax.set_xlabel(year_axis_label); ax.set_ylabel(eur_axis_label); ax.legend()
+    ax.xaxis.set_major_locator(MplMaxNLocator(integer=True)) # nur ganze Jahre
+
+_MPL_DRAWERS_PV_VIZ = {
+    "yearly_production": _draw_yearly_production_mpl,
+    "break_even": _draw_break_even_mpl,
+    "amortisation": _draw_amortisation_mpl,
+}
+
+def _export_mpl_png_pv_viz(kind: str, payload: Tuple[Any, ...]) -> bytes:
+    """Rendert `kind` (3D- und 2D-Variante gleich, flach) per Matplotlib/Agg in die persistente Figur und liefert PNG-Bytes."""
+    drawer = _MPL_DRAWERS_PV_VIZ[kind[:-3] if kind.endswith("_2d") else kind]
+    with _MPL_EXPORT_LOCK:
+        _MPL_AX.clear()
+        drawer(_MPL_AX, *payload)
+        _MPL_AX.grid(True, alpha=0.3)
+        buf = io.BytesIO()
+        _MPL_FIG.savefig(buf, format="png", dpi=200, facecolor="white")
+        return buf.getvalue()
+
+def _figure_for_chart_pv_viz(chart_key: str, kind: str, payload: Tuple[Any, ...]) -> go.Figure:
+    """
+    Liefert die Figur für `st.plotly_chart(key=chart_key)`: bei unverändertem (kind, payload) die Figur des letzten
+    Laufs aus dem Session-State statt eines Neuaufbaus. Das Diagramm selbst muss bei jedem Rerun ausgegeben werden
+    (nicht erneut ausgegebene Elemente entfernt Streamlit am Laufende); mit derselben Figur ist die Ausgabe identisch.
+    """
+    state_key = f"_pv_visuals_fig_{chart_key}"
+    last = st.session_state.get(state_key)
+    if last is not None and last[0] == (kind, payload):
+        return last[1]
+    fig = _FIG_BUILDERS_PV_VIZ[kind](*payload)
+    st.session_state[state_key] = ((kind, payload), fig)
+    return fig
+
+# Noch nicht exportierte Diagramme in analysis_results: {bytes_key: (kind, payload)}
+PENDING_EXPORTS_KEY_PV_VIZ = "pv_visuals_pending_chart_exports"
+
+def _store_chart_bytes_pv_viz(analysis_results: Dict[str, Any], bytes_key: str, kind: str, payload: Tuple[Any, ...]) -> None:
+    """
+    Merkt den Payload für den PNG-Export nur vor; `export_pending_pv_visuals_charts` holt den Export bei der
+    PDF-Erstellung (pdf_ui) gesammelt nach. Interaktive Reruns kosten so nur das Browser-Rendering, nicht Kaleido.
+    """
+    pending = analysis_results.get(PENDING_EXPORTS_KEY_PV_VIZ)
+    analysis_results.pop(bytes_key, None) # Keine veralteten Bytes eines früheren Datenstands stehen lassen
+    if pending is None:
+        pending = analysis_results[PENDING_EXPORTS_KEY_PV_VIZ] = {}
+    pending[bytes_key] = (kind, payload)
+
+def export_pending_pv_visuals_charts(analysis_results: Dict[str, Any]) -> int:
+    """
+    Exportiert alle vorgemerkten PV-Visuals-Diagramme (siehe `_store_chart_bytes_pv_viz`) nach `analysis_results`.
+    Dank des PNG-Caches läuft der Export je Datenstand höchstens einmal. Nur mit Kaleido laufen die Exporte parallel
+    in Threads (Kaleido wartet außerhalb des GIL auf Chromium; die Figuren werden je Thread aus dem unveränderlichen
+    Payload neu gebaut). Matplotlib rendert in eine gemeinsame, per Lock geschützte Figur -> dort seriell.
+
+    Returns:
+        int: Anzahl erfolgreich exportierter Diagramme.
+    """
+    pending = analysis_results.pop(PENDING_EXPORTS_KEY_PV_VIZ, None) if isinstance(analysis_results, dict) else None
+    if not pending:
+        return 0
+    if PNG_EXPORT_BACKEND_PV_VIZ != "kaleido" or len(pending) == 1:
+        results = [_export_payload_to_bytes_pv_viz(kind, payload) for kind, payload in pending.values()]
+    else:
+        script_run_ctx = get_script_run_ctx() if _ST_SCRIPT_RUN_CTX_AVAILABLE else None
+        thread_init = (lambda: add_script_run_ctx(threading.current_thread(), script_run_ctx)) if script_run_ctx is not None else None
+        with ThreadPoolExecutor(max_workers=min(3, len(pending)), thread_name_prefix="pv_visuals_export", initializer=thread_init) as executor:
+            results = list(executor.map(lambda item: _export_payload_to_bytes_pv_viz(*item), pending.values()))
+    analysis_results.update(zip(pending.keys(), results))
+    return sum(result is not None for result in results)
+
+# (Schlüssel, Fallback)-Paare der Texte je Render-Funktion, aufgelöst einmal pro Aufruf via _resolve_labels_pv_viz
+_YEARLY_PROD_LABELS_PV_VIZ = (
+    ("viz_yearly_prod_3d_subheader", "Jahresproduktion – 3D-Monatsbalken"),
+    ("viz_yearly_prod_2d_subheader", "Jahresproduktion – Monatsbalken"),
+    ("month_names_short_list", "Jan,Feb,Mrz,Apr,Mai,Jun,Jul,Aug,Sep,Okt,Nov,Dez"),
+    ("viz_data_missing_monthly_prod", "Monatliche Produktionsdaten für 3D-Jahresdiagramm nicht verfügbar oder unvollständig."),
+    ("viz_data_unavailable_title", "Daten nicht verfügbar"),
+    ("viz_yearly_prod_3d_title", "Jährliche PV-Produktion nach Monaten"),
+    ("viz_month_axis_label", "Monat"),
+    ("viz_kwh_axis_label", "Produktion (kWh)"),
+)
+
+def render_yearly_production_pv_data(analysis_results: Dict[str, Any], texts: Dict[str, str], use_3d: bool = True):
     """
     Rendert ein 3D-Balkendiagramm der monatlichen PV-Produktion für das erste Jahr.
     Die Visualisierung wird mit Plotly erstellt und in Streamlit angezeigt.
@@ -70,54 +506,46 @@ def render_yearly_production_pv_data(analysis_results: Dict[str, Any], texts: Di
                                            erwartet `monthly_productions_sim` (Liste von 12 Floats).
                                            Wird modifiziert, um `yearly_production_chart_bytes` hinzuzufügen.
         texts (Dict[str, str]): Dictionary für die Lokalisierung von Titeln und Beschriftungen.
+        use_3d (bool): 3D-Darstellung (Standard). False zeichnet eine schnellere 2D-Variante mit denselben Daten.
     """
-    st.subheader(get_text_pv_viz(texts, "viz_yearly_prod_3d_subheader", "Jahresproduktion – 3D-Monatsbalken"))
+    labels = _resolve_labels_pv_viz(texts, _YEARLY_PROD_LABELS_PV_VIZ)
+    st.subheader(labels["viz_yearly_prod_3d_subheader"] if use_3d else labels["viz_yearly_prod_2d_subheader"])
 
-    month_labels_str = get_text_pv_viz(texts, "month_names_short_list", "Jan,Feb,Mrz,Apr,Mai,Jun,Jul,Aug,Sep,Okt,Nov,Dez")
-    month_labels = month_labels_str.split(',')
-    if len(month_labels) != 12: # Fallback
-        month_labels = ["Jan", "Feb", "Mrz", "Apr", "Mai", "Jun", "Jul", "Aug", "Sep", "Okt", "Nov", "Dez"]
+    month_labels = _get_month_labels_pv_viz(labels["month_names_short_list"])
 
-    production_data = analysis_results.get('monthly_productions_sim')
-
-    if not production_data or not isinstance(production_data, list) or len(production_data) != 12:
-        st.warning(get_text_pv_viz(texts, "viz_data_missing_monthly_prod", "Monatliche Produktionsdaten für 3D-Jahresdiagramm nicht verfügbar oder unvollständig."))
-        fig_fallback_yearly = go.Figure()
-        fig_fallback_yearly.update_layout(title=get_text_pv_viz(texts, "viz_data_unavailable_title", "Daten nicht verfügbar"))
+    data_ok, prod_values = _validate_monthly(analysis_results.get('monthly_productions_sim'))
+    if not data_ok:
+        st.warning(labels["viz_data_missing_monthly_prod"])
+        fig_fallback_yearly = go.Figure(layout={"title": {"text": labels["viz_data_unavailable_title"]}})
         st.plotly_chart(fig_fallback_yearly, use_container_width=True, key="pv_visuals_yearly_prod_fallback")
-        analysis_results['yearly_production_chart_bytes'] = _export_plotly_fig_to_bytes_pv_viz(fig_fallback_yearly, texts)
+        analysis_results['yearly_production_chart_bytes'] = _fallback_png_bytes_pv_viz(fig_fallback_yearly, labels["viz_data_unavailable_title"], texts)
+        analysis_results.get(PENDING_EXPORTS_KEY_PV_VIZ, {}).pop('yearly_production_chart_bytes', None)
         return
 
-    fig_yearly_prod = go.Figure()
-    for i, p_val_raw in enumerate(production_data):
-        p_val = float(p_val_raw) if isinstance(p_val_raw, (int, float)) and not (math.isnan(p_val_raw) or math.isinf(p_val_raw)) else 0.0
-        fig_yearly_prod.add_trace(go.Scatter3d(
-            x=[i, i], y=[0, 0], z=[0, p_val],
-            mode='lines',
-            line=dict(width=20, color=f'hsl({(i/12*300)}, 70%, 60%)'),
-            name=month_labels[i],
-            hoverinfo='text', text=f"{month_labels[i]}: {p_val:.0f} kWh"
-        ))
-        fig_yearly_prod.add_trace(go.Scatter3d(
-            x=[i], y=[0], z=[p_val], mode='markers',
-            marker=dict(size=3, color=f'hsl({(i/12*300)}, 70%, 40%)'),
-            hoverinfo='skip'
-        ))
-
-    fig_yearly_prod.update_layout(
-        title=get_text_pv_viz(texts, "viz_yearly_prod_3d_title", "Jährliche PV-Produktion nach Monaten"),
-        scene=dict(
-            xaxis=dict(title=get_text_pv_viz(texts, "viz_month_axis_label", "Monat"), tickvals=list(range(12)), ticktext=month_labels),
-            yaxis=dict(title='', showticklabels=False, range=[-1, 1]),
-            zaxis=dict(title=get_text_pv_viz(texts, "viz_kwh_axis_label", "Produktion (kWh)"))
-        ),
-        margin=dict(l=10, r=10, t=50, b=10), showlegend=True
+    payload = (
+        tuple(prod_values.tolist()), month_labels,
+        labels["viz_yearly_prod_3d_title"],
+        labels["viz_month_axis_label"],
+        labels["viz_kwh_axis_label"],
     )
+    kind = "yearly_production" if use_3d else "yearly_production_2d"
+    fig_yearly_prod = _figure_for_chart_pv_viz("pv_visuals_yearly_prod", kind, payload)
     st.plotly_chart(fig_yearly_prod, use_container_width=True, key="pv_visuals_yearly_prod")
-    analysis_results['yearly_production_chart_bytes'] = _export_plotly_fig_to_bytes_pv_viz(fig_yearly_prod, texts)
+    _store_chart_bytes_pv_viz(analysis_results, 'yearly_production_chart_bytes', kind, payload)
+
 
+_BREAK_EVEN_LABELS_PV_VIZ = (
+    ("viz_break_even_3d_subheader", "Break-Even Punkt – Kapitalfluss in 3D"),
+    ("viz_break_even_2d_subheader", "Break-Even Punkt – Kapitalfluss"),
+    ("viz_data_missing_cashflow", "Kumulierte Cashflow-Daten für Break-Even-Diagramm nicht verfügbar oder unvollständig."),
+    ("viz_data_unavailable_title", "Daten nicht verfügbar"),
+    ("viz_break_even_3d_title", "Kumulierter Kapitalfluss über die Laufzeit"),
+    ("viz_cashflow_label", "Kumulierter Kapitalfluss"),
+    ("viz_year_axis_label", "Jahr"),
+    ("viz_eur_axis_label", "Kapitalfluss (€)"),
+)
 
-def render_break_even_pv_data(analysis_results: Dict[str, Any], texts: Dict[str, str]):
+def render_break_even_pv_data(analysis_results: Dict[str, Any], texts: Dict[str, str], use_3d: bool = True):
     """
     Rendert ein 3D-Liniendiagramm des kumulierten Kapitalflusses, um den Break-Even-Punkt zu visualisieren.
     Die Visualisierung wird mit Plotly erstellt und in Streamlit angezeigt.
@@ -129,46 +557,44 @@ def render_break_even_pv_data(analysis_results: Dict[str, Any], texts: Dict[str,
                                            `cumulative_cash_flows_sim` (Liste von Floats, Länge N+1).
                                            Wird modifiziert, um `break_even_chart_bytes` hinzuzufügen.
         texts (Dict[str, str]): Dictionary für die Lokalisierung von Titeln und Beschriftungen.
+        use_3d (bool): 3D-Darstellung (Standard). False zeichnet eine schnellere 2D-Variante mit denselben Daten.
     """
-    st.subheader(get_text_pv_viz(texts, "viz_break_even_3d_subheader", "Break-Even Punkt – Kapitalfluss in 3D"))
-    simulation_years = analysis_results.get('simulation_period_years_effective', 0)
-    cashflow_data_raw = analysis_results.get('cumulative_cash_flows_sim')
-
-    if not isinstance(simulation_years, int) or simulation_years <= 0 or \
-       not cashflow_data_raw or not isinstance(cashflow_data_raw, list) or len(cashflow_data_raw) != (simulation_years + 1):
-        st.warning(get_text_pv_viz(texts, "viz_data_missing_cashflow", "Kumulierte Cashflow-Daten für Break-Even-Diagramm nicht verfügbar oder unvollständig."))
-        fig_fallback_break_even = go.Figure()
-        fig_fallback_break_even.update_layout(title=get_text_pv_viz(texts, "viz_data_unavailable_title", "Daten nicht verfügbar"))
+    labels = _resolve_labels_pv_viz(texts, _BREAK_EVEN_LABELS_PV_VIZ)
+    st.subheader(labels["viz_break_even_3d_subheader"] if use_3d else labels["viz_break_even_2d_subheader"])
+    data_ok, cashflow_data = _validate_cashflow(analysis_results.get('cumulative_cash_flows_sim'), analysis_results.get('simulation_period_years_effective', 0))
+    if not data_ok:
+        st.warning(labels["viz_data_missing_cashflow"])
+        fig_fallback_break_even = go.Figure(layout={"title": {"text": labels["viz_data_unavailable_title"]}})
         st.plotly_chart(fig_fallback_break_even, use_container_width=True, key="pv_visuals_break_even_fallback")
-        analysis_results['break_even_chart_bytes'] = _export_plotly_fig_to_bytes_pv_viz(fig_fallback_break_even, texts)
+        analysis_results['break_even_chart_bytes'] = _fallback_png_bytes_pv_viz(fig_fallback_break_even, labels["viz_data_unavailable_title"], texts)
+        analysis_results.get(PENDING_EXPORTS_KEY_PV_VIZ, {}).pop('break_even_chart_bytes', None)
         return
 
-    cashflow_data = [float(cf) if isinstance(cf, (int,float)) and not (math.isnan(cf) or math.isinf(cf)) else 0.0 for cf in cashflow_data_raw]
-    years_axis = list(range(simulation_years + 1))
-
-    fig_break_even = go.Figure()
-    fig_break_even.add_trace(go.Scatter3d(
-        x=years_axis, y=[0]*len(years_axis), z=cashflow_data, mode='lines+markers',
-        name=get_text_pv_viz(texts, "viz_cashflow_label", "Kumulierter Kapitalfluss"),
-        line=dict(color='green', width=4), marker=dict(size=4)
-    ))
-    fig_break_even.add_trace(go.Scatter3d(
-        x=[years_axis[0], years_axis[-1]], y=[0,0], z=[0,0], mode='lines',
-        name='Break-Even Linie', line=dict(color='red', width=2, dash='dash')
-    ))
-    fig_break_even.update_layout(
-        title=get_text_pv_viz(texts, "viz_break_even_3d_title", "Kumulierter Kapitalfluss über die Laufzeit"),
-        scene=dict(
-            xaxis_title=get_text_pv_viz(texts, "viz_year_axis_label", "Jahr"),
-            yaxis_title='', yaxis=dict(showticklabels=False, range=[-1,1]),
-            zaxis_title=get_text_pv_viz(texts, "viz_eur_axis_label", "Kapitalfluss (€)")
-        ),
-        margin=dict(l=0, r=0, b=0, t=50)
+    payload = (
+        tuple(cashflow_data.tolist()),
+        labels["viz_break_even_3d_title"],
+        labels["viz_cashflow_label"],
+        labels["viz_year_axis_label"],
+        labels["viz_eur_axis_label"],
     )
+    kind = "break_even" if use_3d else "break_even_2d"
+    fig_break_even = _figure_for_chart_pv_viz("pv_visuals_break_even", kind, payload)
     st.plotly_chart(fig_break_even, use_container_width=True, key="pv_visuals_break_even")
-    analysis_results['break_even_chart_bytes'] = _export_plotly_fig_to_bytes_pv_viz(fig_break_even, texts)
+    _store_chart_bytes_pv_viz(analysis_results, 'break_even_chart_bytes', kind, payload)
 
-def render_amortisation_pv_data(analysis_results: Dict[str, Any], texts: Dict[str, str]):
+_AMORTISATION_LABELS_PV_VIZ = (
+    ("viz_amortisation_3d_subheader", "Amortisation – Rückflusskurve in 3D"),
+    ("viz_amortisation_2d_subheader", "Amortisation – Rückflusskurve"),
+    ("viz_data_missing_amortisation", "Daten für Amortisationsdiagramm (Investition, jährl. Vorteile) nicht verfügbar oder unvollständig."),
+    ("viz_data_unavailable_title", "Daten nicht verfügbar"),
+    ("viz_amortisation_3d_title", "Amortisationsverlauf: Investition vs. Kumulierter Rückfluss"),
+    ("viz_cost_label", "Investitionskosten (Netto)"),
+    ("viz_cumulative_return_label", "Kumulierter Rückfluss"),
+    ("viz_year_axis_label", "Jahr"),
+    ("viz_eur_axis_label", "Betrag (€)"),
+)
+
+def render_amortisation_pv_data(analysis_results: Dict[str, Any], texts: Dict[str, str], use_3d: bool = True):
     """
     Rendert ein 3D-Liniendiagramm des Amortisationsverlaufs (Investition vs. kumulierte Rückflüsse).
     Die Visualisierung wird mit Plotly erstellt und in Streamlit angezeigt.
@@ -181,56 +607,48 @@ def render_amortisation_pv_data(analysis_results: Dict[str, Any], texts: Dict[st
                                            `annual_benefits_sim` (Liste von Floats, Länge N).
                                            Wird modifiziert, um `amortisation_chart_bytes` hinzuzufügen.
         texts (Dict[str, str]): Dictionary für die Lokalisierung von Titeln und Beschriftungen.
+        use_3d (bool): 3D-Darstellung (Standard). False zeichnet eine schnellere 2D-Variante mit denselben Daten.
     """
-    st.subheader(get_text_pv_viz(texts, "viz_amortisation_3d_subheader", "Amortisation – Rückflusskurve in 3D"))
-    simulation_years = analysis_results.get('simulation_period_years_effective', 0)
+    labels = _resolve_labels_pv_viz(texts, _AMORTISATION_LABELS_PV_VIZ)
+    st.subheader(labels["viz_amortisation_3d_subheader"] if use_3d else labels["viz_amortisation_2d_subheader"])
     total_investment_raw = analysis_results.get('total_investment_netto', 0)
-    annual_benefits_raw = analysis_results.get('annual_benefits_sim', [])
-
-    total_investment = float(total_investment_raw) if isinstance(total_investment_raw, (int, float)) and not (math.isnan(total_investment_raw) or math.isinf(total_investment_raw)) else 0.0
+    total_investment = float(total_investment_raw) if isinstance(total_investment_raw, (int, float)) and -float('inf') < total_investment_raw < float('inf') else 0.0 # NaN: Vergleich immer False
+    data_ok, annual_benefits = _validate_benefits(analysis_results.get('annual_benefits_sim'), analysis_results.get('simulation_period_years_effective', 0))
 
-    if not isinstance(simulation_years, int) or simulation_years <= 0 or \
-       total_investment <= 0 or \
-       not annual_benefits_raw or not isinstance(annual_benefits_raw, list) or len(annual_benefits_raw) != simulation_years:
-        st.warning(get_text_pv_viz(texts, "viz_data_missing_amortisation", "Daten für Amortisationsdiagramm (Investition, jährl. Vorteile) nicht verfügbar oder unvollständig."))
-        fig_fallback_amort = go.Figure()
-        fig_fallback_amort.update_layout(title=get_text_pv_viz(texts, "viz_data_unavailable_title", "Daten nicht verfügbar"))
+    if not data_ok or total_investment <= 0:
+        st.warning(labels["viz_data_missing_amortisation"])
+        fig_fallback_amort = go.Figure(layout={"title": {"text": labels["viz_data_unavailable_title"]}})
         st.plotly_chart(fig_fallback_amort, use_container_width=True, key="pv_visuals_amortisation_fallback")
-        analysis_results['amortisation_chart_bytes'] = _export_plotly_fig_to_bytes_pv_viz(fig_fallback_amort, texts)
+        analysis_results['amortisation_chart_bytes'] = _fallback_png_bytes_pv_viz(fig_fallback_amort, labels["viz_data_unavailable_title"], texts)
+        analysis_results.get(PENDING_EXPORTS_KEY_PV_VIZ, {}).pop('amortisation_chart_bytes', None)
         return
 
-    annual_benefits = [float(b) if isinstance(b, (int, float)) and not (math.isnan(b) or math.isinf(b)) else 0.0 for b in annual_benefits_raw]
-    years_axis = list(range(simulation_years + 1))
-    kosten_linie = [total_investment] * (simulation_years + 1)
-
-    kumulierte_rueckfluesse = [0.0]
-    current_sum_rueckfluss = 0.0
-    for benefit_val in annual_benefits:
-        current_sum_rueckfluss += benefit_val
-        kumulierte_rueckfluesse.append(current_sum_rueckfluss)
-
-    fig_amort = go.Figure()
-    fig_amort.add_trace(go.Scatter3d(
-        x=years_axis, y=[0]*len(years_axis), z=kosten_linie, mode='lines',
-        name=get_text_pv_viz(texts, "viz_cost_label", "Investitionskosten (Netto)"),
-        line=dict(color='red', width=3)
-    ))
-    fig_amort.add_trace(go.Scatter3d(
-        x=years_axis, y=[0.1]*len(years_axis), z=kumulierte_rueckfluesse, mode='lines+markers',
-        name=get_text_pv_viz(texts, "viz_cumulative_return_label", "Kumulierter Rückfluss"),
-        line=dict(color='blue', width=4), marker=dict(size=4)
-    ))
-    fig_amort.update_layout(
-        title=get_text_pv_viz(texts, "viz_amortisation_3d_title", "Amortisationsverlauf: Investition vs. Kumulierter Rückfluss"),
-        scene=dict(
-            xaxis_title=get_text_pv_viz(texts, "viz_year_axis_label", "Jahr"),
-            yaxis_title='', yaxis=dict(showticklabels=False, range=[-0.5, 0.5]),
-            zaxis_title=get_text_pv_viz(texts, "viz_eur_axis_label", "Betrag (€)")
-        ),
-        margin=dict(l=0, r=0, b=0, t=50)
+    payload = (
+        total_investment, tuple(annual_benefits.tolist()),
+        labels["viz_amortisation_3d_title"],
+        labels["viz_cost_label"],
+        labels["viz_cumulative_return_label"],
+        labels["viz_year_axis_label"],
+        labels["viz_eur_axis_label"],
     )
+    kind = "amortisation" if use_3d else "amortisation_2d"
+    fig_amort = _figure_for_chart_pv_viz("pv_visuals_amortisation", kind, payload)
     st.plotly_chart(fig_amort, use_container_width=True, key="pv_visuals_amortisation")
-    analysis_results['amortisation_chart_bytes'] = _export_plotly_fig_to_bytes_pv_viz(fig_amort, texts)
+    _store_chart_bytes_pv_viz(analysis_results, 'amortisation_chart_bytes', kind, payload)
+
+def render_all_pv_visuals(analysis_results: Dict[str, Any], texts: Dict[str, str], use_3d: bool = True):
+    """
+    Rendert alle drei PV-Visuals-Diagramme nacheinander (jeweils mit Trennlinie). Die PNGs werden nur vorgemerkt
+    und bei der PDF-Erstellung per `export_pending_pv_visuals_charts` gesammelt und parallel exportiert.
+
+    Args:
+        analysis_results (Dict[str, Any]): Analyseergebnisse (siehe die einzelnen Render-Funktionen); erhält die vorgemerkten Exporte.
+        texts (Dict[str, str]): Dictionary für die Lokalisierung von Titeln und Beschriftungen.
+        use_3d (bool): 3D-Darstellung (Standard) oder schnellere 2D-Variante.
+    """
+    render_yearly_production_pv_data(analysis_results, texts, use_3d=use_3d); st.markdown("---")
+    render_break_even_pv_data(analysis_results, texts, use_3d=use_3d); st.markdown("---")
+    render_amortisation_pv_data(analysis_results, texts, use_3d=use_3d); st.markdown("---")
 
 # Änderungshistorie
 # 2025-06-02, Gemini Ultra: Modul bereinigt, redundanten Code aus analysis.py entfernt. Fokus auf Kernfunktionen von pv_visuals.py.